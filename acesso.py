@@ -0,0 +1,47 @@
+from collections import namedtuple
+from flask import g, session
+from models import db, Usuario
+from referencias import referencias
+
+Principal = namedtuple("Principal", "id usuario tipo regioes_ids")
+
+
+def _gravar_na_sessao(usuario, versao):
+    session["usuario"] = usuario.usuario
+    session["tipo"] = usuario.tipo
+    session["usuario_id"] = usuario.id
+    session["regioes_ids"] = sorted(r.id for r in usuario.regioes)
+    # versão das regiões e cobradores (referencias) de quando os dados acima foram lidos
+    session["versao_acesso"] = versao
+
+
+def entrar(usuario):
+    """Grava o usuário do login na sessão (assinada), já com as suas regiões."""
+    _gravar_na_sessao(usuario, referencias().versao)
+    g.pop("principal", None)
+
+
+def usuario_logado():
+    """
+    Quem está logado (id, usuário, tipo e ids das regiões), lido da sessão sem
+    consultar o usuário nem as regiões. A sessão guarda a versão de referencias
+    do login; quando um admin altera regiões ou cobradores a versão muda, e só
+    então o usuário é relido do banco. Retorna None sem login ou se o usuário
+    foi excluído (a sessão é limpa).
+    """
+    if "principal" in g:
+        return g.principal
+    if "usuario_id" not in session:
+        return None
+
+    # a versão é lida antes do usuário: no pior caso relemos de novo na próxima requisição
+    versao = referencias().versao
+    if session.get("versao_acesso") != versao:
+        usuario = db.session.get(Usuario, session["usuario_id"])
+        if usuario is None:
+            session.clear()
+            return None
+        _gravar_na_sessao(usuario, versao)
+
+    g.principal = Principal(session["usuario_id"], session["usuario"], session["tipo"], tuple(session["regioes_ids"]))
+    return g.principal
@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+from sqlalchemy import insert, select, update, delete
+from sqlalchemy.exc import IntegrityError
+from models import db, Cliente, Emprestimo, Parcela, AgendaDia, AgendaParcela
+
+COLUNAS_AGENDA = [
+    "data", "parcela_id", "cliente_id", "regiao_id", "cobrador_id", "cliente_nome",
+    "numero_parcela", "valor", "valor_pago", "status",
+]
+
+
+def _colunas_agenda():
+    return select(
+        Parcela.data_vencimento,
+        Parcela.id, Cliente.id, Cliente.regiao_id, Cliente.cobrador_id, Cliente.nome,
+        Parcela.numero_parcela, Parcela.valor, Parcela.valor_pago, Parcela.status,
+    ).select_from(Parcela).join(
+        Emprestimo, Parcela.emprestimo_id == Emprestimo.id
+    ).join(
+        Cliente, Emprestimo.cliente_id == Cliente.id
+    )
+
+
+def montar_agenda(dia):
+    """
+    Monta (ou remonta) a agenda de um dia com um único INSERT ... SELECT, dentro da
+    transação corrente. É o único lugar que junta Parcela, Emprestimo e Cliente
+    para o dia; depois disso os pagamentos só atualizam a linha da parcela.
+    """
+    db.session.execute(delete(AgendaParcela).where(AgendaParcela.data == dia))
+    db.session.execute(delete(AgendaDia).where(AgendaDia.data == dia))
+
+    resultado = db.session.execute(insert(AgendaParcela).from_select(
+        COLUNAS_AGENDA, _colunas_agenda().where(Parcela.data_vencimento == dia)
+    ))
+    db.session.add(AgendaDia(data=dia))
+    db.session.flush()
+    return resultado.rowcount
+
+
+def garantir_agenda(dia):
+    """Monta a agenda do dia no primeiro acesso. Outro processo pode montá-la ao mesmo tempo."""
+    if db.session.get(AgendaDia, dia):
+        return
+    try:
+        montar_agenda(dia)
+        db.session.commit()
+    except IntegrityError:
+        # outro worker gravou o mesmo dia primeiro; a agenda dele vale
+        db.session.rollback()
+
+
+def agenda_do_dia(dia, regioes_ids, cobrador_id=None):
+    """Itens da agenda do dia para as regiões informadas (mesmo filtro de consulta_parcelas_do_dia)."""
+    garantir_agenda(dia)
+
+    query = AgendaParcela.query.filter(
+        AgendaParcela.data == dia,
+        AgendaParcela.regiao_id.in_(regioes_ids),
+    )
+    if cobrador_id:
+        query = query.filter(AgendaParcela.cobrador_id == cobrador_id)
+
+    return query.order_by(AgendaParcela.parcela_id).all()
+
+
+def incluir_na_agenda(emprestimos_ids):
+    """
+    Copia as parcelas dos empréstimos (novos ou com parcelas regeradas) para as
+    agendas já montadas dos seus vencimentos. Dias ainda sem agenda ficam como
+    estão: a montagem do primeiro acesso já as encontra.
+    """
+    if not emprestimos_ids:
+        return
+    db.session.execute(insert(AgendaParcela).from_select(
+        COLUNAS_AGENDA,
+        _colunas_agenda().where(
+            Parcela.emprestimo_id.in_(emprestimos_ids),
+            Parcela.data_vencimento.in_(select(AgendaDia.data)),
+        )
+    ))
+
+
+def remover_da_agenda(parcelas_ids):
+    """Tira das agendas montadas as parcelas excluídas (ou que vão ser regeradas)."""
+    if parcelas_ids:
+        db.session.execute(delete(AgendaParcela).where(AgendaParcela.parcela_id.in_(parcelas_ids)))
+
+
+def remover_cliente_da_agenda(cliente_id):
+    db.session.execute(delete(AgendaParcela).where(AgendaParcela.cliente_id == cliente_id))
+
+
+def renomear_na_agenda(cliente_id, nome):
+    """A agenda guarda o nome do cliente; a edição do cliente só precisa atualizá-lo."""
+    db.session.execute(
+        update(AgendaParcela).where(AgendaParcela.cliente_id == cliente_id).values(cliente_nome=nome)
+    )
+
+
+def invalidar_agenda():
+    """
+    Descarta todas as agendas montadas, remontadas no próximo acesso. Só para
+    cargas em massa (dados sintéticos); as rotas usam incluir_na_agenda e
+    remover_da_agenda, que mexem só nas parcelas afetadas.
+    """
+    db.session.execute(delete(AgendaParcela))
+    db.session.execute(delete(AgendaDia))
+
+
+def gerar_agendas(inicio=None, dias=1):
+    """Remonta a agenda de `dias` dias a partir de `inicio` e descarta as de dias anteriores."""
+    inicio = inicio or date.today()
+    db.session.execute(delete(AgendaParcela).where(AgendaParcela.data < inicio))
+    db.session.execute(delete(AgendaDia).where(AgendaDia.data < inicio))
+
+    itens = {}
+    for i in range(dias):
+        dia = inicio + timedelta(days=i)
+        itens[dia] = montar_agenda(dia)
+    db.session.commit()
+    return itens
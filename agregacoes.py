@@ -0,0 +1,201 @@
+from sqlalchemy import func, case, update, literal
+from dinheiro import Centavos, ZERO
+from models import db, Cliente, Emprestimo, Parcela
+
+# zero tipado como dinheiro: num CASE, o tipo do primeiro ramo define o do resultado
+ZERO_SQL = literal(ZERO, Centavos)
+
+# parcela ainda não paga; "atrasado" vem dos pagamentos e do job atualizar-status
+STATUS_EM_ABERTO = ("pendente", "parcialmente_paga", "atrasado")
+
+
+def em_atraso(hoje):
+    """
+    Parcela vencida antes de `hoje` e não paga. Com o status numa lista (em vez de
+    status != "pago") o filtro usa o índice (status, data_vencimento); a data continua
+    no filtro para valer mesmo antes do job marcar as que venceram ontem.
+    """
+    return Parcela.status.in_(STATUS_EM_ABERTO) & (Parcela.data_vencimento < hoje)
+
+
+def _totais_vazios():
+    return {
+        "total": ZERO,
+        "recebido": ZERO,
+        "nao_recebido": ZERO,
+        "pendente": ZERO,
+        "atrasado": ZERO,
+    }
+
+
+def consulta_parcelas_do_dia(hoje, regioes_ids, cobrador_id=None):
+    """Pares (Parcela, Cliente) com vencimento no dia, para as regiões informadas."""
+    query = (
+        db.session.query(Parcela, Cliente)
+        .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+        .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        .filter(Parcela.data_vencimento == hoje)
+        .filter(Cliente.regiao_id.in_(regioes_ids))
+    )
+
+    if cobrador_id:
+        query = query.filter(Cliente.cobrador_id == cobrador_id)
+
+    # sem ordem explícita o resultado mudaria conforme o índice escolhido
+    return query.order_by(Parcela.id)
+
+
+def consulta_totais_por_cliente(regioes_ids, hoje, cobrador_id=None):
+    valor_pago = func.coalesce(Parcela.valor_pago, 0)
+
+    query = (
+        db.session.query(
+            Emprestimo.cliente_id,
+            func.sum(Parcela.valor).label("total"),
+            func.sum(case((Parcela.status == "pago", Parcela.valor), else_=valor_pago)).label("recebido"),
+            func.sum(case((Parcela.status == "pago", ZERO_SQL), else_=Parcela.valor - valor_pago)).label("nao_recebido"),
+            # mesma semântica do antigo func.sum(...).filter(status != "pago"): NULL fica de fora
+            func.sum(case((Parcela.status != "pago", Parcela.valor - Parcela.valor_pago))).label("pendente"),
+            func.sum(case((em_atraso(hoje), Parcela.valor - Parcela.valor_pago))).label("atrasado"),
+        )
+        .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+        .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        .filter(Cliente.regiao_id.in_(regioes_ids))
+    )
+
+    if cobrador_id:
+        query = query.filter(Cliente.cobrador_id == cobrador_id)
+
+    return query.group_by(Emprestimo.cliente_id)
+
+
+def totais_por_cliente(regioes_ids, hoje, cobrador_id=None):
+    """
+    Calcula, em uma única consulta agrupada, os totais de cada cliente das regiões
+    informadas: total das parcelas, valor recebido, valor não recebido, pendente e atrasado.
+
+    Retorna um dicionário {cliente_id: {...}}. Clientes sem parcelas não aparecem
+    no resultado; use `totais_do_cliente` para obter os totais zerados nesse caso.
+    """
+    if not regioes_ids:
+        return {}
+
+    totais = {}
+    for linha in consulta_totais_por_cliente(regioes_ids, hoje, cobrador_id):
+        totais[linha.cliente_id] = {
+            "total": linha.total or ZERO,
+            "recebido": linha.recebido or ZERO,
+            "nao_recebido": linha.nao_recebido or ZERO,
+            "pendente": linha.pendente or ZERO,
+            "atrasado": linha.atrasado or ZERO,
+        }
+
+    return totais
+
+
+def totais_do_cliente(totais, cliente_id):
+    return totais.get(cliente_id) or _totais_vazios()
+
+
+def indicadores_carteira(hoje, regiao_id=None, cobrador_id=None):
+    """
+    Total recebido, a receber e atrasado de toda a carteira filtrada (não só da página).
+    Recebido e a receber vêm dos totais acumulados em Cliente; o atrasado depende
+    da data e é somado direto nas parcelas vencidas. São duas consultas no total.
+    """
+    filtros = []
+    if regiao_id:
+        filtros.append(Cliente.regiao_id == regiao_id)
+    if cobrador_id:
+        filtros.append(Cliente.cobrador_id == cobrador_id)
+
+    recebido, a_receber = db.session.query(
+        func.coalesce(func.sum(Cliente.total_pago), ZERO_SQL),
+        func.coalesce(func.sum(Cliente.total_pendente), ZERO_SQL),
+    ).filter(*filtros).one()
+
+    query_atrasado = (
+        db.session.query(func.coalesce(func.sum(Parcela.valor - func.coalesce(Parcela.valor_pago, 0)), ZERO_SQL))
+        .filter(em_atraso(hoje))
+    )
+    if filtros:
+        query_atrasado = (
+            query_atrasado
+            .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+            .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+            .filter(*filtros)
+        )
+
+    return {
+        "total_recebido": recebido,
+        "total_a_receber": a_receber,
+        "total_atrasado": query_atrasado.scalar(),
+    }
+
+
+def reconstruir_totais(corrigir=True):
+    """
+    Recalcula a partir das parcelas os totais acumulados de Emprestimo e Cliente
+    (total_pago, total_pendente e saldo) e compara com o que está gravado.
+    As somas por empréstimo e por cliente são feitas no banco, em centavos.
+
+    Retorna a lista de divergências encontradas. Com `corrigir=True` os valores
+    gravados são substituídos pelos recalculados (sem fazer commit).
+    """
+    valor_pago = func.coalesce(Parcela.valor_pago, 0)
+    pendente = case((Parcela.status == "pago", ZERO_SQL), else_=Parcela.valor - valor_pago)
+
+    por_emprestimo = dict(
+        (linha.emprestimo_id, (linha.pago, linha.pendente))
+        for linha in db.session.query(
+            Parcela.emprestimo_id,
+            func.sum(valor_pago).label("pago"),
+            func.sum(pendente).label("pendente"),
+        ).group_by(Parcela.emprestimo_id)
+    )
+    por_cliente = dict(
+        (linha.cliente_id, (linha.pago, linha.pendente))
+        for linha in db.session.query(
+            Emprestimo.cliente_id,
+            func.sum(valor_pago).label("pago"),
+            func.sum(pendente).label("pendente"),
+        ).join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id).group_by(Emprestimo.cliente_id)
+    )
+
+    divergencias = []
+    emprestimos_corrigidos = []
+
+    for emprestimo in db.session.query(
+        Emprestimo.id, Emprestimo.valor_total,
+        Emprestimo.saldo, Emprestimo.total_pago, Emprestimo.total_pendente, Emprestimo.versao
+    ):
+        pago, pendente_calc = por_emprestimo.get(emprestimo.id, (ZERO, ZERO))
+        saldo = max(ZERO, emprestimo.valor_total - pago)
+
+        gravado = (emprestimo.total_pago, emprestimo.total_pendente, emprestimo.saldo)
+        if gravado != (pago, pendente_calc, saldo):
+            divergencias.append(("emprestimo", emprestimo.id, gravado, (pago, pendente_calc, saldo)))
+            emprestimos_corrigidos.append({
+                "id": emprestimo.id, "total_pago": pago, "total_pendente": pendente_calc, "saldo": saldo,
+                # a versão lida vai junto: se um pagamento gravar antes, a correção falha em vez de desfazê-lo
+                "versao": emprestimo.versao,
+            })
+
+    clientes_corrigidos = []
+    for cliente in db.session.query(Cliente.id, Cliente.total_pago, Cliente.total_pendente, Cliente.versao):
+        pago, pendente_calc = por_cliente.get(cliente.id, (ZERO, ZERO))
+
+        gravado = (cliente.total_pago, cliente.total_pendente)
+        if gravado != (pago, pendente_calc):
+            divergencias.append(("cliente", cliente.id, gravado, (pago, pendente_calc)))
+            clientes_corrigidos.append({
+                "id": cliente.id, "total_pago": pago, "total_pendente": pendente_calc, "versao": cliente.versao
+            })
+
+    if corrigir:
+        if emprestimos_corrigidos:
+            db.session.execute(update(Emprestimo), emprestimos_corrigidos)
+        if clientes_corrigidos:
+            db.session.execute(update(Cliente), clientes_corrigidos)
+
+    return divergencias
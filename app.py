@@ -1,782 +1,1472 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, or_
-from sqlalchemy.orm import joinedload
-from models import db, Cliente, Usuario, Emprestimo, Pagamento, Parcela, Regiao
-from datetime import datetime, timedelta, date
-import os
-
-app = Flask(__name__)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sistema.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.secret_key = os.environ.get('SESSION_SECRET', 'uma_chave_secreta_aqui')
-
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-    if not Usuario.query.filter_by(usuario="admin").first():
-        admin = Usuario(usuario="admin", senha="123", tipo="admin")
-        db.session.add(admin)
-        db.session.commit()
-        print("Usuário admin criado -> login: admin | senha: 123")
-
-
-@app.template_filter("moeda")
-def moeda(valor):
-    if valor is None:
-        return "R$ 0,00"
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-
-@app.route("/")
-def index():
-    return redirect(url_for("login"))
-
-
-@app.route("/login", methods=["GET", "POST"])
-def login():
-    if request.method == "POST":
-        usuario = request.form.get("usuario").strip()
-        senha = request.form.get("senha").strip()
-
-        user = Usuario.query.filter_by(usuario=usuario, senha=senha).first()
-
-        if user and user.senha:
-            session["usuario"] = user.usuario
-            session["tipo"] = user.tipo
-            session["usuario_id"] = user.id
-
-            if user.tipo.lower() == "admin":
-                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
-                return redirect(url_for("dashboard_admin"))
-            elif user.tipo.lower() == "cobrador":
-                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
-                return redirect(url_for("dashboard_cobrador"))
-            else:
-                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
-                return redirect(url_for("dashboard_admin"))
-        else:
-            flash("Usuário ou senha incorretos!", "danger")
-            return render_template("login.html")
-
-    return render_template("login.html")
-
-
-@app.route("/adicionar_emprestimo", methods=["GET", "POST"])
-def adicionar_emprestimo():
-    clientes = Cliente.query.all()
-
-    if request.method == "POST":
-        try:
-            cliente_id = int(request.form.get("cliente_id"))
-            valor = float(request.form.get("valor"))
-            porcentagem = float(request.form.get("porcentagem"))
-            frequencia = request.form.get("frequencia")
-            data_str = request.form.get("data_emprestimo")
-            data_emprestimo = datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else datetime.utcnow().date()
-            qtd_parcelas = request.form.get("qtd_parcelas")
-
-            #cria o emprestimo
-            emprestimo = Emprestimo(
-                cliente_id=int(cliente_id),
-                valor=valor,
-                porcentagem=porcentagem,
-                frequencia=frequencia,
-                data_emprestimo=data_emprestimo
-            )
-
-            db.session.add(emprestimo)
-            db.session.commit()
-
-            #gera parcelas automáticas
-            parcelas = emprestimo.gerar_parcelas(qtd_parcelas)
-
-            if parcelas:
-                for parcela in parcelas:
-                    parcela.emprestimo_id = emprestimo.id
-                    db.session.add(parcela)
-                db.session.commit()
-
-            cliente = Cliente.query.get(cliente_id)
-            flash(f"Empréstimo de (R$ {valor:.2f} - {frequencia}) registrado para {cliente.nome}!", "success")
-            return redirect(url_for("dashboard_admin"))
-
-        except Exception as e:
-            db.session.rollback()
-            flash(f"Erro ao registrar empréstimo: {e}", "danger")
-            return redirect(url_for("adicionar_emprestimo"))
-
-    return render_template("adicionar_emprestimo.html", clientes=clientes)
-
-
-@app.route("/cadastrar_regiao", methods=["GET", "POST"])
-def cadastrar_regiao():
-    if request.method == "POST":
-        nome = request.form["nome"]
-        cobradores_ids = request.form.getlist("cobradores")
-
-        if not nome:
-            flash("Nome da região é obrigatório!", "danger")
-            return redirect(url_for("cadastrar_regiao"))
-
-        regiao = Regiao(nome=nome)
-
-        if cobradores_ids:
-            cobradores = Usuario.query.filter(Usuario.id.in_(cobradores_ids), Usuario.tipo=="cobrador").all()
-            regiao.cobradores.extend(cobradores)
-
-        db.session.add(regiao)
-        db.session.commit()
-        flash("Região cadastrada com sucesso!", "success")
-        return redirect(url_for("cadastrar_regiao"))
-
-    cobradores = Usuario.query.filter_by(tipo="cobrador").all()
-    return render_template("cadastrar_regiao.html", cobradores=cobradores)
-
-
-@app.route("/regioes")
-def listar_regioes():
-    regioes = Regiao.query.all()
-    return render_template("regioes.html", regioes=regioes)
-
-
-@app.route("/dashboard_admin")
-def dashboard_admin():
-    if "usuario" not in session or session["tipo"] != "admin":
-        flash("Acesso Negado!", "danger")
-        return redirect(url_for("login"))
-
-    db.session.expire_all()
-
-    regiao_id = request.args.get("regiao_id", type=int)
-    cobrador_id = request.args.get("cobrador_id", type=int)
-
-    page = request.args.get("page", 1, type=int)
-    per_page = 10
-
-    regioes = Regiao.query.all()
-    cobradores = Usuario.query.filter_by(tipo="cobrador").all()
-
-    clientes_query = Cliente.query.order_by(Cliente.nome.asc())
-
-    if regiao_id:
-        cobradores = Usuario.query.filter_by(regiao_id=regiao_id).all()
-        clientes_query = clientes_query.filter_by(regiao_id=regiao_id)
-
-    if cobrador_id:
-        clientes_query = clientes_query.filter_by(cobrador_id=cobrador_id)
-
-    clientes = clientes_query.paginate(page=page, per_page=per_page)
-
-    total_recebido = 0
-    total_a_receber = 0
-    total_atrasado = 0
-    now = datetime.now().date()
-
-    todos_emprestimos = []
-
-    for cliente in clientes:
-        for emprestimo in cliente.emprestimos:
-            todos_emprestimos.append(emprestimo)
-
-            valor_pago_emprestimo = sum([p.valor_pago for p in emprestimo.parcelas if p.status in ["pago", "parcialmente_paga"]])
-            valor_pendente_emprestimo = sum([p.valor - p.valor_pago for p in emprestimo.parcelas if p.status != "pago"])
-
-            total_recebido += valor_pago_emprestimo
-            total_a_receber += valor_pendente_emprestimo
-
-            total_atrasado += sum([p.valor - p.valor_pago for p in emprestimo.parcelas if p.status != "pago" and p.data_vencimento < now])
-
-            emprestimo.total_pago = valor_pago_emprestimo
-            emprestimo.total_pendente = valor_pendente_emprestimo
-
-    return render_template(
-        "dashboard_admin.html",
-        clientes=clientes.items,
-        pagination=clientes,
-        regiao_selecionada=regiao_id,
-        cobrador_selecionado=cobrador_id,
-        regioes=regioes,
-        cobradores=cobradores,
-        todos_emprestimos=todos_emprestimos,
-        total_a_receber=total_a_receber,
-        total_recebido=total_recebido,
-        total_atrasado=total_atrasado,
-        now=now
-    )
-
-
-@app.route("/dashboard_cobrador")
-def dashboard_cobrador():
-    if "usuario" not in session:
-        flash("Faça login para continuar!", "danger")
-        return redirect(url_for("login"))
-
-    usuario_id = session.get("usuario_id")
-    usuario = Usuario.query.get(usuario_id)
-    now = datetime.now().date()
-
-    if not usuario or usuario.tipo not in ["cobrador", "admin"]:
-        flash("Acesso negado!", "danger")
-        return redirect(url_for("login"))
-
-    # --- Filtros da URL ---
-    data_filtro = request.args.get("data_filtro")
-    regiao_id_filtro = request.args.get("regiao_id", type=int)
-    cobrador_id_filtro = request.args.get("cobrador_id", type=int)
-
-    # --- Data ---
-    if data_filtro:
-        try:
-            hoje = datetime.strptime(data_filtro, "%Y-%m-%d").date()
-        except:
-            hoje = date.today()
-    else:
-        hoje = date.today()
-
-    # --- Caso seja cobrador ---
-    if usuario.tipo == "cobrador":
-        regioes_ids = [r.id for r in usuario.regioes]
-    else:
-        # Admin pode ver tudo (ou filtrar)
-        if regiao_id_filtro:
-            regioes_ids = [regiao_id_filtro]
-        else:
-            regioes_ids = [r.id for r in Regiao.query.all()]
-
-    # --- Nenhuma região ---
-    if not regioes_ids:
-        flash("Nenhuma região encontrada!", "warning")
-        return render_template(
-            "dashboard_cobrador.html",
-            dashboard=[],
-            parcelas_hoje=[],
-            total_a_receber=0,
-            total_pago_hoje=0,
-            total_nao_recebido=0,
-            totais_pendentes={},
-            totais_atrasados={},
-            hoje=hoje.strftime("%d/%m/%Y"),
-            data_filtro_value=hoje.strftime("%Y-%m-%d"),
-            regioes=Regiao.query.all(),
-            cobradores=Usuario.query.filter_by(tipo="cobrador").all(),
-            regiao_id_filtro=regiao_id_filtro,
-            cobrador_id_filtro=cobrador_id_filtro
-        )
-
-    # --- Filtro de parcelas do dia ---
-    query_parcelas = (
-        db.session.query(Parcela, Cliente)
-        .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
-        .join(Cliente, Emprestimo.cliente_id == Cliente.id)
-        .filter(Parcela.data_vencimento == hoje)
-        .filter(Cliente.regiao_id.in_(regioes_ids))
-    )
-
-    if cobrador_id_filtro:
-        query_parcelas = query_parcelas.filter(Cliente.cobrador_id == cobrador_id_filtro)
-
-    parcelas_hoje = query_parcelas.all()
-
-    total_pago_hoje = sum(parcela.valor_pago for parcela, _ in parcelas_hoje if parcela.status in ["pago", "parcialmente_paga"])
-    total_a_receber = sum(parcela.valor for parcela, _ in parcelas_hoje)
-    total_nao_recebido = total_a_receber - total_pago_hoje
-
-    # --- Clientes filtrados ---
-    query_clientes = Cliente.query.filter(Cliente.regiao_id.in_(regioes_ids))
-    if cobrador_id_filtro:
-        query_clientes = query_clientes.filter(Cliente.cobrador_id == cobrador_id_filtro)
-    clientes = query_clientes.all()
-
-    dashboard = []
-    totais_pendentes = {}
-    totais_atrasados = {}
-
-    for cliente in clientes:
-        cliente_total = 0.0
-        cliente_recebido = 0.0
-        cliente_nao_recebido = 0.0
-        parcelas_info = []
-        emprestimos = Emprestimo.query.filter_by(cliente_id=cliente.id).all()
-
-        for emprestimo in emprestimos:
-            for parcela in emprestimo.parcelas:
-                valor = float(parcela.valor or 0)
-                valor_pago = float(parcela.valor_pago or 0)
-                cliente_total += valor
-
-                if parcela.status == "pago":
-                    cliente_recebido += valor
-                else:
-                    cliente_recebido += valor_pago
-                    cliente_nao_recebido += (valor - valor_pago)
-
-                parcelas_info.append({
-                    "id": parcela.id,
-                    "numero_parcela": parcela.numero_parcela,
-                    "valor": valor,
-                    "valor_pago": valor_pago,
-                    "data_vencimento": parcela.data_vencimento,
-                    "status": parcela.status
-                })
-
-        total_pendente = (
-            db.session.query(func.sum(Parcela.valor - Parcela.valor_pago))
-            .join(Emprestimo)
-            .filter(Emprestimo.cliente_id == cliente.id, Parcela.status != "pago")
-            .scalar() or 0.0
-        )
-
-        total_atrasado = (
-            db.session.query(func.sum(Parcela.valor - Parcela.valor_pago))
-            .join(Emprestimo)
-            .filter(
-                Emprestimo.cliente_id == cliente.id,
-                Parcela.status != "pago",
-                Parcela.data_vencimento < hoje
-            )
-            .scalar() or 0.0
-        )
-
-        totais_pendentes[cliente.id] = round(total_pendente, 2)
-        totais_atrasados[cliente.id] = round(total_atrasado, 2)
-
-        dashboard.append({
-            "cliente": cliente,
-            "emprestimos": emprestimos,
-            "parcelas": parcelas_info,
-            "total_cliente": cliente_total,
-            "recebido_cliente": cliente_recebido,
-            "nao_recebido_cliente": cliente_nao_recebido
-        })
-
-    return render_template(
-        "dashboard_cobrador.html",
-        dashboard=dashboard,
-        parcelas_hoje=parcelas_hoje,
-        total_a_receber=total_a_receber,
-        total_pago_hoje=total_pago_hoje,
-        total_nao_recebido=total_nao_recebido,
-        now=now,
-        totais_pendentes=totais_pendentes,
-        totais_atrasados=totais_atrasados,
-        hoje=hoje.strftime("%d/%m/%Y"),
-        data_filtro_value=hoje.strftime("%Y-%m-%d"),
-        regioes=Regiao.query.all(),
-        cobradores=Usuario.query.filter_by(tipo="cobrador").all(),
-        regiao_id_filtro=regiao_id_filtro,
-        cobrador_id_filtro=cobrador_id_filtro
-    )
-
-
-@app.route("/receber_pagamento/<int:parcela_id>", methods=["POST"])
-def receber_pagamento(parcela_id):
-    if "usuario" not in session:
-        flash("Faça login primeiro!", "danger")
-        return redirect(url_for("login"))
-
-    parcela = Parcela.query.get_or_404(parcela_id)
-    valor_pago = float(request.form.get("valor_pago", 0))
-
-    if valor_pago <= 0:
-        flash("Valor inválido!", "danger")
-        return redirect(url_for("dashboard_cobrador"))
-
-    valor_restante = parcela.valor - parcela.valor_pago
-
-    if valor_pago >= valor_restante:
-        parcela.valor_pago = parcela.valor
-        parcela.status = "pago"
-        flash(f"Parcela {parcela.numero_parcela} paga completamente!", "success")
-    else:
-        parcela.valor_pago += valor_pago
-        parcela.status = "parcialmente_paga"
-        flash(f"Pagamento parcial de R$ {valor_pago:.2f} registrado para parcela {parcela.numero_parcela}!", "success")
-
-    pagamento = Pagamento(
-        emprestimo_id=parcela.emprestimo_id,
-        parcela_id=parcela.id,
-        valor=valor_pago,
-        data_pagamento=datetime.now()
-    )
-
-    db.session.add(pagamento)
-
-     #atualiza o total pago e status do empréstimo
-    emprestimo = parcela.emprestimo
-    emprestimo.total_pago = sum(p.valor_pago for p in emprestimo.parcelas)
-
-    if emprestimo.total_pago >= emprestimo.valor_total:
-        emprestimo.status = "quitado"
-    else:
-        emprestimo.status = "em aberto"
-
-    db.session.commit()
-
-    if session["tipo"] == "admin":
-        return redirect(url_for("dashboard_admin"))
-    else:
-        return redirect(url_for("dashboard_cobrador"))
-
-
-@app.route("/editar_pagamento/<int:pagamento_id>", methods=["POST"])
-def editar_pagamento(pagamento_id):
-    if "usuario" not in session:
-        flash("Faça login primeiro!", "danger")
-        return redirect(url_for("login"))
-
-    pagamento = Pagamento.query.get_or_404(pagamento_id)
-    parcela = Parcela.query.get(pagamento.parcela_id)
-
-    if not parcela:
-        flash("Parcela não encontrada!", "danger")
-        return redirect(url_for("dashboard_cobrador"))
-
-    novo_valor = float(request.form.get("novo_valor", 0))
-
-    if novo_valor <= 0:
-        flash("Valor inválido!", "danger")
-        return redirect(url_for("dashboard_cobrador"))
-
-    diferenca = novo_valor - pagamento.valor
-
-    parcela.valor_pago += diferenca
-    pagamento.valor = novo_valor
-
-    if parcela.valor_pago >= parcela.valor:
-        parcela.valor_pago = parcela.valor
-        parcela.status = "pago"
-    elif parcela.valor_pago > 0:
-        parcela.status = "parcialmente_paga"
-    else:
-        parcela.valor_pago = 0
-        parcela.status = "pendente"
-
-    db.session.commit()
-    flash("Pagamento editado com sucesso!", "success")
-
-    if session["tipo"] == "admin":
-        return redirect(url_for("dashboard_admin"))
-    else:
-        return redirect(url_for("dashboard_cobrador"))
-
-
-@app.route("/cancelar_pagamento/<int:pagamento_id>", methods=["POST"])
-def cancelar_pagamento(pagamento_id):
-    if "usuario" not in session:
-        flash("Faça login primeiro!", "danger")
-        return redirect(url_for("login"))
-
-    pagamento = Pagamento.query.get_or_404(pagamento_id)
-    parcela = Parcela.query.get(pagamento.parcela_id)
-
-    if parcela:
-        parcela.valor_pago -= pagamento.valor
-
-        if parcela.valor_pago <= 0:
-            parcela.valor_pago = 0
-            parcela.status = "pendente"
-        elif parcela.valor_pago < parcela.valor:
-            parcela.status = "parcialmente_paga"
-
-    db.session.delete(pagamento)
-    db.session.commit()
-
-    flash(f"Pagamento cancelado! Valor de R$ {pagamento.valor:.2f} devolvido à parcela.", "warning")
-
-    if session["tipo"] == "admin":
-        return redirect(url_for("dashboard_admin"))
-    else:
-        return redirect(url_for("dashboard_cobrador"))
-
-
-@app.route("/cadastro_cliente", methods=["GET", "POST"])
-def cadastro_cliente():
-    cobradores = Usuario.query.filter_by(tipo="cobrador").all()
-
-    if request.method == "POST":
-        nome = request.form["nome"]
-        telefone = request.form["telefone"]
-        endereco = request.form["endereco"]
-        regiao_id = request.form["regiao_id"]
-        cobrador_id = request.form["cobrador_id"]
-
-        novo_cliente = Cliente(
-            nome=nome,
-            telefone=telefone,
-            endereco=endereco,
-            regiao_id=regiao_id,
-            cobrador_id=cobrador_id
-        )
-        db.session.add(novo_cliente)
-        db.session.commit()
-
-        flash("Cliente cadastrado com sucesso!", "success")
-        return redirect(url_for("dashboard_admin"))
-    #aqui busca todas as regiões
-    regioes_objs = Regiao.query.all()
-
-    #aqui faz a conversão antes de renderizar para o template
-    regioes = []
-    for r in regioes_objs:
-        regioes.append({
-            "id": r.id,
-            "nome": r.nome,
-            "cobradores": [{"id": c.id, "usuario": c.usuario} for c in r.cobradores]
-        })
-
-    return render_template("cadastro_cliente.html", regioes=regioes, cobradores=cobradores)
-
-
-@app.route("/cadastrar_cobrador", methods=["GET", "POST"])
-def cadastrar_cobrador():
-    if "usuario" not in session or session["tipo"] != "admin":
-        flash("Acesso negado.", "danger")
-        return redirect(url_for("login"))
-
-    regioes = Regiao.query.all()
-
-    if request.method == "POST":
-        usuario_nome = request.form.get("usuario")
-        senha = request.form.get("senha")
-        tipo = request.form.get("tipo") #admin ou cobrador
-        regiao_id = request.form.get("regiao_id", type=int)
-
-        novo_cobrador = Usuario(usuario=usuario_nome, senha=senha, tipo=tipo)
-
-        if tipo == "cobrador" and regiao_id:
-            regiao = Regiao.query.get(int(regiao_id))
-            if regiao:
-                novo_cobrador.regioes.append(regiao)
-
-        db.session.add(novo_cobrador)
-        db.session.commit()
-
-        flash(f"{tipo.capitalize()} cadastrado com sucesso!", "success")
-        return redirect(url_for("dashboard_admin"))
-
-    return render_template("cadastrar_cobrador.html", regioes=regioes)
-
-
-@app.route("/trocar_usuario")
-def trocar_usuario():
-    session.clear()
-    flash("Você saiu do sistema. Faça login novamente", "success")
-    return redirect(url_for("login"))
-
-
-@app.route("/listar_clientes")
-def listar_clientes():
-    if session.get("tipo") != "admin":
-        flash("Acesso negado!", "danger")
-        return redirect(url_for("login"))
-
-    page = request.args.get("page", 1, type=int)
-    per_page = 10 #mostra 10 clientes a cada pagina 
-
-    clientes = Cliente.query.paginate(page=page, per_page=per_page)
-    qtd_clientes = Cliente.query.count()
-    return render_template("listar_clientes.html", clientes=clientes, qtd_clientes=qtd_clientes, pagination=clientes)
-
-@app.route("/resumo_clientes")
-def resumo_clientes():
-    if "usuario" not in session:
-        flash("Faça login primeiro!", "danger")
-        return redirect(url_for("login"))
-
-    usuario = Usuario.query.get(session.get("usuario_id"))
-
-    if not usuario or usuario.tipo not in ["admin", "cobrador"]:
-        flash("Acesso negado", "danger")
-        return redirect(url_for("login"))
-
-    hoje = datetime.now().date()
-    regioes_ids = [r.id for r in usuario.regioes]
-
-    #carregar clientes das regioes
-    clientes = Cliente.query.filter(Cliente.regiao_id.in_(regioes_ids)).order_by(Cliente.nome.asc()).all()
-    dashboard = []
-    totais_pendentes = {}
-    totais_atrasados = {}
-
-    for cliente in clientes:
-        emprestimos = Emprestimo.query.filter_by(cliente_id=cliente.id).all()
-
-        total_pendente = (
-            db.session.query(func.sum(Parcela.valor - Parcela.valor_pago))
-            .join(Emprestimo)
-            .filter(Emprestimo.cliente_id == cliente.id, Parcela.status != "pago")
-            .scalar() or 0.0
-            )
-
-        total_atrasado = (
-            db.session.query(func.sum(Parcela.valor - Parcela.valor_pago))
-            .join(Emprestimo)
-            .filter(
-                Emprestimo.cliente_id == cliente.id,
-                Parcela.status != "pago",
-                Parcela.data_vencimento < hoje
-                )
-            .scalar() or 0.0
-            )
-
-        totais_pendentes[cliente.id] = round(total_pendente, 2)
-        totais_atrasados[cliente.id] = round(total_atrasado, 2)
-
-        dashboard.append({
-            "cliente": cliente,
-            "emprestimos": emprestimos
-            })
-
-    return render_template(
-        "resumo_clientes.html",
-        dashboard=dashboard,
-        hoje=hoje,
-        totais_pendentes=totais_pendentes,
-        totais_atrasados=totais_atrasados
-        )
-
-
-@app.route("/excluir_clientes/<int:id>", methods=["POST"])
-def excluir_clientes(id):
-    cliente = Cliente.query.get_or_404(id)
-
-    db.session.delete(cliente)
-    db.session.commit()
-    flash(f"Cliente {cliente.nome} excluído com sucesso!", "success")
-    return redirect(url_for("listar_clientes"))
-
-@app.route("/listar_cobradores")
-def listar_cobradores():
-    if session.get("tipo") != "admin":
-        flash("Acesso negado!", "danger")
-        return redirect(url_for("login"))
-
-    usuario = Usuario.query.all()
-    return render_template("listar_cobradores.html", usuario=usuario)
-
-
-@app.route("/excluir_cobrador/<int:id>", methods=["POST"])
-def excluir_cobrador(id):
-    cobrador = Usuario.query.get_or_404(id)
-
-    if cobrador.tipo != "cobrador":
-        flash("Não é possível excluir este usuário", "danger")
-        return redirect(url_for("listar_cobradores"))
-
-    db.session.delete(cobrador)
-    db.session.commit()
-    flash(f"Cobrador {cobrador.usuario} excluído com sucesso!", "success")
-    return redirect(url_for("listar_cobradores"))
-
-
-@app.route("/editar_cliente/<int:id>", methods=["POST", "GET"])
-def editar_cliente(id):
-    if "usuario" not in session:
-        flash("Faça login primeiro!", "danger")
-        return redirect(url_for("login"))
-
-    cliente = Cliente.query.get_or_404(id)
-
-    nome = request.form.get("nome")
-    telefone = request.form.get("telefone")
-    endereco = request.form.get("endereco")
-
-    cliente.nome = nome
-    cliente.telefone = telefone
-    cliente.endereco = endereco
-
-    db.session.commit()
-
-    flash(f"Cliente {cliente.nome} atualizado com sucesso!", "success")
-    return redirect(url_for("listar_clientes"))
-
-
-@app.route("/excluir_cliente/<int:id>", methods=["POST", "GET"])
-def excluir_cliente(id):
-    cliente = Cliente.query.get_or_404(id)
-
-    for emprestimo in cliente.emprestimos:
-        for parcela in emprestimo.parcelas:
-            db.session.delete(parcela)
-        db.session.delete(emprestimo)
-    db.session.delete(cliente)
-    db.session.commit()
-
-    flash("Cliente e todos os empréstimos excluídos com sucesso!", "danger")
-    return redirect(url_for("listar_clientes"))
-
-
-@app.route("/editar_emprestimo/<int:id>", methods=["POST", "GET"])
-def editar_emprestimo(id):
-    emprestimo = Emprestimo.query.get_or_404(id)
-
-    # Atualiza os campos do empréstimo
-    emprestimo.valor = float(request.form.get("valor", emprestimo.valor))
-    emprestimo.porcentagem = float(request.form.get("porcentagem", emprestimo.porcentagem))
-    emprestimo.frequencia = request.form.get("frequencia", emprestimo.frequencia)
-
-    # Tratar qtd_parcelas para não dar erro se estiver vazio
-    qtd_parcelas_str = request.form.get("qtd_parcelas")
-    if qtd_parcelas_str and qtd_parcelas_str.isdigit():
-        emprestimo.qtd_parcelas = int(qtd_parcelas_str)
-    else:
-        emprestimo.qtd_parcelas = len(emprestimo.parcelas)
-
-    # Data do empréstimo
-    data_str = request.form.get("data_emprestimo")
-    if data_str:
-        emprestimo.data_emprestimo = datetime.strptime(data_str, "%Y-%m-%d").date()
-
-    # Calcula valor total atualizado
-    emprestimo.valor_total = emprestimo.valor + (emprestimo.valor * (emprestimo.porcentagem / 100))
-
-    # Remove parcelas antigas
-    for p in list(emprestimo.parcelas):
-        db.session.delete(p)
-    db.session.flush()
-
-    # Gera novas parcelas
-    parcelas = emprestimo.gerar_parcelas()
-    for parcela in parcelas:
-        parcela.emprestimo_id = emprestimo.id
-        db.session.add(parcela)
-
-    # Atualiza total_pago e status do empréstimo
-    emprestimo.total_pago = sum(p.valor_pago or 0 for p in parcelas)
-    emprestimo.status = "quitado" if emprestimo.total_pago >= emprestimo.valor_total else "em aberto"
-
-    db.session.commit()
-    flash("Empréstimo e parcelas atualizadas com sucesso!", "success")
-    return redirect(url_for("dashboard_admin"))
-
-
-
-
-@app.route("/excluir_emprestimo/<int:id>")
-def excluir_emprestimo(id):
-    emprestimo = Emprestimo.query.get_or_404(id)
-
-    nome_cliente = emprestimo.cliente.nome
-    frequencia = emprestimo.frequencia
-
-    for parcela in emprestimo.parcelas:
-        db.session.delete(parcela)
-    db.session.delete(emprestimo)
-    db.session.commit()
-    flash(f"Empréstimo ({frequencia.capitalize()}) de {nome_cliente} excluído!", "danger")
-    return redirect(url_for("dashboard_admin"))
-
-
-@app.route("/logout")
-def logout():
-    session.clear()
-    flash("Você saiu com sucesso!", "success")
-    return redirect(url_for("login"))
-
-
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
-
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import or_, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Cliente, Usuario, Emprestimo, Pagamento, Parcela, Regiao, ParcelaJaPaga, valor_total_com_juros
+from dinheiro import dinheiro, ZERO
+from agregacoes import (
+    totais_por_cliente, totais_do_cliente, indicadores_carteira, reconstruir_totais
+)
+from flask_migrate import Migrate, upgrade, stamp
+from planos import verificar_planos
+from emprestimos_lote import criar_emprestimos_em_lote, ErroLote
+from importacao import importar_csv, TIPOS_IMPORTACAO
+from exportacao import exportar, ENTIDADES, FORMATOS
+from paginacao import PaginaCursor
+from agenda import (
+    agenda_do_dia, gerar_agendas, incluir_na_agenda, remover_da_agenda,
+    remover_cliente_da_agenda, renomear_na_agenda
+)
+from referencias import referencias, invalidar_referencias
+from acesso import entrar, usuario_logado
+from sincronizacao import dados_para_sincronizar, calcular_etag, limpar_registros_excluidos
+from pagamentos_lote import registrar_pagamentos_em_lote, MAX_ITENS_LOTE
+from banco import configurar_banco, com_retentativas
+from estresse import medir_escrita, martelar_parcela
+from relatorios import relatorio_atraso as calcular_atraso, atraso_csv, FAIXAS_ATRASO, AGRUPAMENTOS
+from previsao import previsao_recebimentos, previsao_json, HORIZONTE_PADRAO, HORIZONTE_MAXIMO
+from manutencao import atualizar_status
+from metricas import instalar_metricas, texto_metricas
+from dados_sinteticos import gerar_dados_sinteticos
+from desempenho import medir_endpoints, comparar_com_base, ler_base, salvar_base, TOLERANCIA
+from busca import buscar_clientes, criar_indice_busca, LIMITE_PADRAO, LIMITE_MAXIMO
+from rotas import rota_da_agenda, rota_json, ler_coordenadas
+from datetime import datetime, timedelta, date
+import os
+import io
+import hmac
+import csv
+import json
+import time
+import click
+
+app = Flask(__name__)
+
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.secret_key = os.environ.get('SESSION_SECRET', 'uma_chave_secreta_aqui')
+
+configurar_banco(app)
+with app.app_context():
+    instalar_metricas(app, db.engine)
+migrate = Migrate(app, db, directory=os.path.join(app.root_path, "migrations"), render_as_batch=True)
+
+# revisão que corresponde às tabelas criadas antes das migrações (db.create_all)
+REVISAO_INICIAL = "fc8230ff599d"
+
+
+def inicializar_banco():
+    tabelas = inspect(db.engine).get_table_names()
+
+    if "alembic_version" not in tabelas:
+        if "usuario" in tabelas:
+            # banco antigo, criado pelo db.create_all: marca o esquema inicial e migra
+            stamp(revision=REVISAO_INICIAL)
+        else:
+            # banco novo: cria direto no esquema atual
+            db.create_all()
+            stamp()
+
+    upgrade()
+
+
+with app.app_context():
+    inicializar_banco()
+    if not Usuario.query.filter_by(usuario="admin").first():
+        admin = Usuario(usuario="admin", senha="123", tipo="admin")
+        db.session.add(admin)
+        db.session.commit()
+        print("Usuário admin criado -> login: admin | senha: 123")
+
+
+@app.errorhandler(StaleDataError)
+def conflito_de_gravacao(erro):
+    # outra transação alterou o mesmo registro entre a leitura e a gravação
+    # (e, nas rotas de pagamento, continuou ganhando depois das novas tentativas)
+    db.session.rollback()
+    mensagem = "Os dados foram alterados por outra pessoa ao mesmo tempo. Confira e tente novamente."
+    if request.is_json:
+        return jsonify({"erro": mensagem}), 409
+    flash(mensagem, "warning")
+    return redirect(request.referrer or url_for("index"))
+
+
+@app.template_filter("moeda")
+def moeda(valor):
+    if valor is None:
+        return "R$ 0,00"
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+@app.route("/")
+def index():
+    return redirect(url_for("login"))
+
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        usuario = request.form.get("usuario").strip()
+        senha = request.form.get("senha").strip()
+
+        user = Usuario.query.filter_by(usuario=usuario, senha=senha).first()
+
+        if user and user.senha:
+            entrar(user)
+
+            if user.tipo.lower() == "admin":
+                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
+                return redirect(url_for("dashboard_admin"))
+            elif user.tipo.lower() == "cobrador":
+                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
+                return redirect(url_for("dashboard_cobrador"))
+            else:
+                flash(f"Bem vindo, {user.usuario.upper()}!", "success")
+                return redirect(url_for("dashboard_admin"))
+        else:
+            flash("Usuário ou senha incorretos!", "danger")
+            return render_template("login.html")
+
+    return render_template("login.html")
+
+
+@app.route("/adicionar_emprestimo", methods=["GET", "POST"])
+def adicionar_emprestimo():
+    clientes = Cliente.query.all()
+
+    if request.method == "POST":
+        try:
+            cliente_id = int(request.form.get("cliente_id"))
+            valor = dinheiro(request.form.get("valor"))
+            porcentagem = float(request.form.get("porcentagem"))
+            frequencia = request.form.get("frequencia")
+            data_str = request.form.get("data_emprestimo")
+            data_emprestimo = datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else datetime.utcnow().date()
+            qtd_parcelas = request.form.get("qtd_parcelas")
+
+            #cria o emprestimo
+            emprestimo = Emprestimo(
+                cliente_id=int(cliente_id),
+                valor=valor,
+                porcentagem=porcentagem,
+                frequencia=frequencia,
+                data_emprestimo=data_emprestimo
+            )
+
+            db.session.add(emprestimo)
+            db.session.commit()
+
+            #gera parcelas automáticas
+            parcelas = emprestimo.gerar_parcelas(qtd_parcelas)
+
+            if parcelas:
+                for parcela in parcelas:
+                    parcela.emprestimo_id = emprestimo.id
+                    db.session.add(parcela)
+                emprestimo.recalcular_totais(parcelas)
+                incluir_na_agenda([emprestimo.id])
+                db.session.commit()
+
+            cliente = Cliente.query.get(cliente_id)
+            flash(f"Empréstimo de (R$ {valor:.2f} - {frequencia}) registrado para {cliente.nome}!", "success")
+            return redirect(url_for("dashboard_admin"))
+
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Erro ao registrar empréstimo: {e}", "danger")
+            return redirect(url_for("adicionar_emprestimo"))
+
+    return render_template("adicionar_emprestimo.html", clientes=clientes)
+
+
+@app.route("/emprestimos/lote", methods=["POST"])
+def emprestimos_lote():
+    if "usuario" not in session or session["tipo"] != "admin":
+        return jsonify({"erro": "Acesso negado!"}), 403
+
+    dados = request.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get("emprestimos")
+    if not isinstance(dados, list):
+        return jsonify({"erro": "Envie uma lista de empréstimos em JSON."}), 400
+
+    try:
+        ids, qtd_parcelas = criar_emprestimos_em_lote(dados)
+        db.session.commit()
+    except ErroLote as e:
+        db.session.rollback()
+        return jsonify({
+            "erro": str(e),
+            "erros": [{"posicao": posicao, "mensagem": mensagem} for posicao, mensagem in e.erros]
+        }), 400
+
+    return jsonify({"emprestimos": len(ids), "parcelas": qtd_parcelas, "ids": ids}), 201
+
+
+@app.route("/importar/<tipo>", methods=["POST"])
+def importar(tipo):
+    if "usuario" not in session or session["tipo"] != "admin":
+        return jsonify({"erro": "Acesso negado!"}), 403
+
+    if tipo not in TIPOS_IMPORTACAO:
+        return jsonify({"erro": f"Tipo de importação inválido: {tipo}"}), 404
+
+    arquivo = request.files.get("arquivo")
+    if not arquivo:
+        return jsonify({"erro": "Envie o CSV no campo 'arquivo'."}), 400
+
+    # lê o upload como texto, em fluxo, sem carregar tudo na memória
+    texto = io.TextIOWrapper(arquivo.stream, encoding="utf-8-sig", newline="")
+    resumo = importar_csv(tipo, texto)
+
+    resumo["amostra_erros"] = [{"linha": linha, "mensagem": mensagem} for linha, mensagem in resumo["amostra_erros"]]
+    return jsonify(resumo)
+
+
+@app.route("/exportar/<entidade>")
+def exportar_dados(entidade):
+    if "usuario" not in session or session["tipo"] != "admin":
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    formato = request.args.get("formato", "csv")
+    if entidade not in ENTIDADES or formato not in FORMATOS:
+        return jsonify({"erro": "Exportação inválida."}), 404
+
+    try:
+        inicio = request.args.get("inicio")
+        fim = request.args.get("fim")
+        filtros = {
+            "regiao_id": request.args.get("regiao_id", type=int),
+            "cobrador_id": request.args.get("cobrador_id", type=int),
+            "inicio": datetime.strptime(inicio, "%Y-%m-%d").date() if inicio else None,
+            "fim": datetime.strptime(fim, "%Y-%m-%d").date() if fim else None,
+        }
+    except ValueError:
+        return jsonify({"erro": "Datas devem estar no formato AAAA-MM-DD."}), 400
+
+    return Response(
+        stream_with_context(exportar(entidade, formato, **filtros)),
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename={entidade}.{formato}"}
+    )
+
+
+@app.route("/relatorios/atraso")
+def relatorio_atraso():
+    if "usuario" not in session or session["tipo"] != "admin":
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    por = request.args.get("por", "regiao")
+    if por not in AGRUPAMENTOS:
+        por = "regiao"
+    regiao_id = request.args.get("regiao_id", type=int)
+    data_str = request.args.get("data")
+    try:
+        data = datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else datetime.now().date()
+    except ValueError:
+        data = datetime.now().date()
+
+    linhas, geral = calcular_atraso(data, por=por, regiao_id=regiao_id)
+
+    if request.args.get("formato") == "csv":
+        return Response(
+            atraso_csv(linhas, geral, por),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=atraso_{por}_{data:%Y-%m-%d}.csv"}
+        )
+
+    return render_template(
+        "relatorio_atraso.html",
+        linhas=linhas,
+        geral=geral,
+        faixas=FAIXAS_ATRASO,
+        por=por,
+        regiao_id=regiao_id,
+        regioes=referencias().regioes,
+        data=data
+    )
+
+
+@app.route("/relatorios/previsao")
+def previsao():
+    if "usuario" not in session or session["tipo"] != "admin":
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    dias = request.args.get("dias", HORIZONTE_PADRAO, type=int)
+    dias = min(max(dias, 1), HORIZONTE_MAXIMO)
+    regiao_id = request.args.get("regiao_id", type=int)
+    cobrador_id = request.args.get("cobrador_id", type=int)
+    data_str = request.args.get("data")
+    try:
+        data = datetime.strptime(data_str, "%Y-%m-%d").date() if data_str else datetime.now().date()
+    except ValueError:
+        data = datetime.now().date()
+
+    por_dia, total = previsao_recebimentos(data, dias, regiao_id, cobrador_id)
+
+    if request.args.get("formato") == "json":
+        return jsonify(previsao_json(por_dia, total))
+
+    ref = referencias()
+    return render_template(
+        "previsao.html",
+        por_dia=por_dia,
+        total=total,
+        dias=dias,
+        data=data,
+        regiao_id=regiao_id,
+        cobrador_id=cobrador_id,
+        regioes=ref.regioes,
+        cobradores=ref.cobradores
+    )
+
+
+@app.route("/metrics")
+def metrics():
+    # tráfego e tempos de SQL por endpoint não são públicos: o Prometheus manda
+    # "Authorization: Bearer <METRICS_TOKEN>"; sem o token, só um admin logado vê
+    token = os.environ.get("METRICS_TOKEN")
+    com_token = bool(token) and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
+    if not com_token and session.get("tipo") != "admin":
+        return Response("Não autorizado\n", status=401, mimetype="text/plain")
+    return Response(texto_metricas(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def origem_da_rota():
+    """Ponto de partida da rota (lat e lon da URL, opcionais). Inválido: ValueError."""
+    lat, lon = ler_coordenadas(request.args.get("lat"), request.args.get("lon"))
+    return (lat, lon) if lat is not None else None
+
+
+@app.route("/api/rota")
+def api_rota():
+    if "usuario" not in session:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    usuario = usuario_logado()
+    if usuario is None:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    # mesmas parcelas do dashboard_cobrador: as regiões do cobrador, ou os filtros do admin
+    cobrador_id = None
+    if usuario.tipo == "cobrador":
+        regioes_ids = list(usuario.regioes_ids)
+    else:
+        regiao_id = request.args.get("regiao_id", type=int)
+        regioes_ids = [regiao_id] if regiao_id else [r.id for r in referencias().regioes]
+        cobrador_id = request.args.get("cobrador_id", type=int)
+
+    data = request.args.get("data")
+    try:
+        dia = datetime.strptime(data, "%Y-%m-%d").date() if data else date.today()
+    except ValueError:
+        return jsonify({"erro": "data deve estar no formato AAAA-MM-DD."}), 400
+    try:
+        origem = origem_da_rota()
+    except ValueError as e:
+        return jsonify({"erro": f"Ponto de partida inválido: {e}"}), 400
+
+    itens = agenda_do_dia(dia, regioes_ids, cobrador_id=cobrador_id) if regioes_ids else []
+    paradas, distancia, sem_coordenadas = rota_da_agenda(itens, origem)
+    return jsonify(rota_json(dia, paradas, distancia, sem_coordenadas, origem))
+
+
+@app.route("/api/sincronizar")
+def api_sincronizar():
+    if "usuario" not in session:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    usuario = usuario_logado()
+    if usuario is None:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    # cobrador recebe as suas regiões; admin recebe todas ou a região do filtro
+    ref = referencias()
+    if usuario.tipo == "cobrador":
+        regioes_ids = list(usuario.regioes_ids)
+    else:
+        regiao_id = request.args.get("regiao_id", type=int)
+        regioes_ids = [regiao_id] if regiao_id else [r.id for r in ref.regioes]
+
+    since = request.args.get("since")
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({"erro": "since deve estar no formato ISO 8601 (AAAA-MM-DDTHH:MM:SS)."}), 400
+
+    # nada mudou desde a última resposta: 304 sem consultar os dados
+    etag = calcular_etag(regioes_ids, since)
+    if etag in request.if_none_match:
+        resposta = Response(status=304)
+        resposta.set_etag(etag)
+        return resposta
+
+    resposta = jsonify(dados_para_sincronizar(regioes_ids, since))
+    resposta.set_etag(etag)
+    resposta.headers["Cache-Control"] = "private, no-cache"
+    return resposta
+
+
+@app.route("/cadastrar_regiao", methods=["GET", "POST"])
+def cadastrar_regiao():
+    if request.method == "POST":
+        nome = request.form["nome"]
+        cobradores_ids = request.form.getlist("cobradores")
+
+        if not nome:
+            flash("Nome da região é obrigatório!", "danger")
+            return redirect(url_for("cadastrar_regiao"))
+
+        regiao = Regiao(nome=nome)
+
+        if cobradores_ids:
+            cobradores = Usuario.query.filter(Usuario.id.in_(cobradores_ids), Usuario.tipo=="cobrador").all()
+            regiao.cobradores.extend(cobradores)
+
+        db.session.add(regiao)
+        invalidar_referencias()
+        db.session.commit()
+        flash("Região cadastrada com sucesso!", "success")
+        return redirect(url_for("cadastrar_regiao"))
+
+    return render_template("cadastrar_regiao.html", cobradores=referencias().cobradores)
+
+
+@app.route("/regioes")
+def listar_regioes():
+    return render_template("regioes.html", regioes=referencias().regioes)
+
+
+@app.route("/dashboard_admin")
+def dashboard_admin():
+    if "usuario" not in session or session["tipo"] != "admin":
+        flash("Acesso Negado!", "danger")
+        return redirect(url_for("login"))
+
+    db.session.expire_all()
+
+    regiao_id = request.args.get("regiao_id", type=int)
+    cobrador_id = request.args.get("cobrador_id", type=int)
+
+    per_page = 10
+
+    ref = referencias()
+    regioes = ref.regioes
+    cobradores = ref.cobradores
+
+    clientes_query = Cliente.query
+
+    if regiao_id:
+        cobradores = ref.cobradores_da_regiao(regiao_id)
+        clientes_query = clientes_query.filter_by(regiao_id=regiao_id)
+
+    if cobrador_id:
+        clientes_query = clientes_query.filter_by(cobrador_id=cobrador_id)
+
+    # paginação por cursor (nome, id); empréstimos, região e cobrador da página carregados de uma vez
+    clientes = PaginaCursor(
+        clientes_query.options(
+            # as parcelas não entram: a tabela de cada empréstimo e o modal de pagamento são buscados ao abrir
+            selectinload(Cliente.emprestimos),
+            joinedload(Cliente.regiao),
+            joinedload(Cliente.cobrador),
+        ),
+        Cliente.nome, Cliente.id,
+        por_pagina=per_page,
+        apos=request.args.get("apos"),
+        antes=request.args.get("antes"),
+    )
+
+    now = datetime.now().date()
+
+    # totais de toda a carteira filtrada, calculados no banco
+    indicadores = indicadores_carteira(now, regiao_id=regiao_id, cobrador_id=cobrador_id)
+
+    todos_emprestimos = [emprestimo for cliente in clientes for emprestimo in cliente.emprestimos]
+
+    return render_template(
+        "dashboard_admin.html",
+        clientes=clientes.items,
+        pagination=clientes,
+        regiao_selecionada=regiao_id,
+        cobrador_selecionado=cobrador_id,
+        regioes=regioes,
+        cobradores=cobradores,
+        todos_emprestimos=todos_emprestimos,
+        total_a_receber=indicadores["total_a_receber"],
+        total_recebido=indicadores["total_recebido"],
+        total_atrasado=indicadores["total_atrasado"]
+    )
+
+
+@app.route("/emprestimos/<int:id>/parcelas")
+def parcelas_emprestimo(id):
+    """Tabela de parcelas de um empréstimo, buscada pelo dashboard_admin quando o empréstimo é aberto."""
+    if "usuario" not in session or session["tipo"] != "admin":
+        return "Acesso negado!", 403
+
+    emprestimo = Emprestimo.query.options(selectinload(Emprestimo.parcelas)).get_or_404(id)
+    return render_template("parcelas_emprestimo.html", emprestimo=emprestimo)
+
+
+@app.route("/parcelas/<int:parcela_id>/pagamento")
+def modal_pagamento(parcela_id):
+    """Corpo do modal de pagamento de uma parcela, buscado pelo dashboard_admin ao abrir o modal."""
+    if "usuario" not in session or session["tipo"] != "admin":
+        return "Acesso negado!", 403
+
+    parcela = Parcela.query.get_or_404(parcela_id)
+    return render_template("modal_pagamento.html", parcela=parcela, emprestimo=parcela.emprestimo)
+
+
+@app.route("/dashboard_cobrador")
+def dashboard_cobrador():
+    if "usuario" not in session:
+        flash("Faça login para continuar!", "danger")
+        return redirect(url_for("login"))
+
+    # usuário e regiões vêm da sessão, sem consulta (ver acesso.usuario_logado)
+    usuario = usuario_logado()
+    now = datetime.now().date()
+
+    if not usuario or usuario.tipo not in ["cobrador", "admin"]:
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    # --- Filtros da URL ---
+    data_filtro = request.args.get("data_filtro")
+    regiao_id_filtro = request.args.get("regiao_id", type=int)
+    cobrador_id_filtro = request.args.get("cobrador_id", type=int)
+    ordem = request.args.get("ordem", "agenda")
+
+    # --- Data ---
+    if data_filtro:
+        try:
+            hoje = datetime.strptime(data_filtro, "%Y-%m-%d").date()
+        except:
+            hoje = date.today()
+    else:
+        hoje = date.today()
+
+    ref = referencias()
+
+    # --- Caso seja cobrador ---
+    if usuario.tipo == "cobrador":
+        regioes_ids = list(usuario.regioes_ids)
+    else:
+        # Admin pode ver tudo (ou filtrar)
+        if regiao_id_filtro:
+            regioes_ids = [regiao_id_filtro]
+        else:
+            regioes_ids = [r.id for r in ref.regioes]
+
+    # --- Nenhuma região ---
+    if not regioes_ids:
+        flash("Nenhuma região encontrada!", "warning")
+        return render_template(
+            "dashboard_cobrador.html",
+            dashboard=[],
+            parcelas_hoje=[],
+            total_a_receber=0,
+            total_pago_hoje=0,
+            total_nao_recebido=0,
+            totais_pendentes={},
+            totais_atrasados={},
+            hoje=hoje.strftime("%d/%m/%Y"),
+            data_filtro_value=hoje.strftime("%Y-%m-%d"),
+            regioes=ref.regioes,
+            cobradores=ref.cobradores,
+            regiao_id_filtro=regiao_id_filtro,
+            cobrador_id_filtro=cobrador_id_filtro,
+            ordem=ordem,
+            rota=None
+        )
+
+    # --- Parcelas do dia (agenda pré-calculada) ---
+    parcelas_hoje = agenda_do_dia(hoje, regioes_ids, cobrador_id=cobrador_id_filtro)
+
+    # --- Ordem de visita: parcelas agrupadas por cliente, na rota mais curta ---
+    rota = None
+    if ordem == "rota":
+        try:
+            origem = origem_da_rota()
+        except ValueError as e:
+            flash(f"Ponto de partida ignorado: {e}", "warning")
+            origem = None
+        paradas, distancia, sem_coordenadas = rota_da_agenda(parcelas_hoje, origem)
+        parcelas_hoje = [item for parada in paradas for item in parada.itens]
+        rota = {"paradas": len(paradas), "distancia_km": distancia, "sem_coordenadas": sem_coordenadas}
+
+    total_pago_hoje = sum(
+        (parcela.valor_pago for parcela in parcelas_hoje if parcela.status in ["pago", "parcialmente_paga", "atrasado"]), ZERO
+    )
+    total_a_receber = sum((parcela.valor for parcela in parcelas_hoje), ZERO)
+    total_nao_recebido = total_a_receber - total_pago_hoje
+
+    # --- Clientes filtrados ---
+    query_clientes = (
+        Cliente.query
+        .options(selectinload(Cliente.emprestimos).selectinload(Emprestimo.parcelas))
+        .filter(Cliente.regiao_id.in_(regioes_ids))
+    )
+    if cobrador_id_filtro:
+        query_clientes = query_clientes.filter(Cliente.cobrador_id == cobrador_id_filtro)
+    clientes = query_clientes.all()
+
+    # --- Totais por cliente (uma consulta agrupada) ---
+    totais = totais_por_cliente(regioes_ids, hoje, cobrador_id=cobrador_id_filtro)
+
+    dashboard = []
+    totais_pendentes = {}
+    totais_atrasados = {}
+
+    for cliente in clientes:
+        totais_cliente = totais_do_cliente(totais, cliente.id)
+        parcelas_info = []
+
+        for emprestimo in cliente.emprestimos:
+            for parcela in emprestimo.parcelas:
+                parcelas_info.append({
+                    "id": parcela.id,
+                    "numero_parcela": parcela.numero_parcela,
+                    "valor": parcela.valor or ZERO,
+                    "valor_pago": parcela.valor_pago or ZERO,
+                    "data_vencimento": parcela.data_vencimento,
+                    "status": parcela.status
+                })
+
+        totais_pendentes[cliente.id] = totais_cliente["pendente"]
+        totais_atrasados[cliente.id] = totais_cliente["atrasado"]
+
+        dashboard.append({
+            "cliente": cliente,
+            "emprestimos": cliente.emprestimos,
+            "parcelas": parcelas_info,
+            "total_cliente": totais_cliente["total"],
+            "recebido_cliente": totais_cliente["recebido"],
+            "nao_recebido_cliente": totais_cliente["nao_recebido"]
+        })
+
+    return render_template(
+        "dashboard_cobrador.html",
+        dashboard=dashboard,
+        parcelas_hoje=parcelas_hoje,
+        total_a_receber=total_a_receber,
+        total_pago_hoje=total_pago_hoje,
+        total_nao_recebido=total_nao_recebido,
+        now=now,
+        totais_pendentes=totais_pendentes,
+        totais_atrasados=totais_atrasados,
+        hoje=hoje.strftime("%d/%m/%Y"),
+        data_filtro_value=hoje.strftime("%Y-%m-%d"),
+        regioes=ref.regioes,
+        cobradores=ref.cobradores,
+        regiao_id_filtro=regiao_id_filtro,
+        cobrador_id_filtro=cobrador_id_filtro,
+        ordem=ordem,
+        rota=rota
+    )
+
+
+@app.route("/receber_pagamento/<int:parcela_id>", methods=["POST"])
+def receber_pagamento(parcela_id):
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    Parcela.query.get_or_404(parcela_id)
+    valor_pago = dinheiro(request.form.get("valor_pago", 0))
+
+    if valor_pago <= 0:
+        flash("Valor inválido!", "danger")
+        return redirect(url_for("dashboard_cobrador"))
+
+    def receber():
+        #registra o pagamento na parcela; o que passar do restante vai para as próximas parcelas em aberto
+        parcela = db.session.get(Parcela, parcela_id)
+        return parcela.emprestimo.alocar_pagamento(valor_pago, primeira=parcela)
+
+    # outro cobrador (ou um segundo toque) pode gravar na mesma parcela ao mesmo tempo
+    try:
+        pagamentos, sobra = com_retentativas(receber)
+    except ParcelaJaPaga:
+        db.session.rollback()
+        flash("Parcela já paga", "danger")
+        pagamentos, sobra = [], ZERO
+
+    if len(pagamentos) > 1:
+        flash(f"Pagamento de R$ {valor_pago - sobra:.2f} distribuído em {len(pagamentos)} parcelas!", "success")
+    elif pagamentos:
+        # a escolhida recebe primeiro: com um só pagamento, é ela
+        parcela = db.session.get(Parcela, pagamentos[0].parcela_id)
+        if parcela.status == "pago":
+            flash(f"Parcela {parcela.numero_parcela} paga completamente!", "success")
+        else:
+            flash(f"Pagamento parcial de R$ {pagamentos[0].valor:.2f} registrado para parcela {parcela.numero_parcela}!", "success")
+    if sobra > 0:
+        flash(f"R$ {sobra:.2f} passaram do total em aberto do empréstimo e não foram registrados.", "warning")
+
+    if session["tipo"] == "admin":
+        return redirect(url_for("dashboard_admin"))
+    else:
+        return redirect(url_for("dashboard_cobrador"))
+
+
+@app.route("/emprestimos/<int:id>/receber", methods=["POST"])
+def receber_emprestimo(id):
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    Emprestimo.query.get_or_404(id)
+    valor = request.form.get("valor", 0, type=dinheiro)
+
+    if valor <= 0:
+        flash("Valor inválido!", "danger")
+        return redirect(url_for("dashboard_admin"))
+
+    def receber():
+        # cascata: paga as parcelas em aberto da mais antiga para a mais nova
+        emprestimo = Emprestimo.query.options(selectinload(Emprestimo.parcelas)).get(id)
+        return emprestimo.alocar_pagamento(valor)
+
+    pagamentos, sobra = com_retentativas(receber)
+
+    if pagamentos:
+        flash(f"R$ {valor - sobra:.2f} distribuídos em {len(pagamentos)} parcela(s)!", "success")
+    if sobra > 0:
+        flash(f"R$ {sobra:.2f} passaram do total em aberto do empréstimo e não foram registrados.", "warning")
+
+    if session["tipo"] == "admin":
+        return redirect(url_for("dashboard_admin"))
+    else:
+        return redirect(url_for("dashboard_cobrador"))
+
+
+@app.route("/pagamentos/lote", methods=["POST"])
+def pagamentos_lote():
+    if "usuario" not in session:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    dados = request.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get("pagamentos")
+    if not isinstance(dados, list):
+        return jsonify({"erro": "Envie uma lista de pagamentos em JSON."}), 400
+    if len(dados) > MAX_ITENS_LOTE:
+        return jsonify({"erro": f"Envie no máximo {MAX_ITENS_LOTE} pagamentos por lote."}), 400
+
+    # um envio simultâneo com a mesma chave pode gravar antes; na segunda
+    # tentativa a chave já existe e o item volta como duplicado
+    for tentativa in range(2):
+        try:
+            resultados = com_retentativas(lambda: registrar_pagamentos_em_lote(dados))
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if tentativa:
+                raise
+
+    return jsonify({
+        "aplicados": sum(r["status"] == "aplicado" for r in resultados),
+        "duplicados": sum(r["status"] == "duplicado" for r in resultados),
+        "erros": sum(r["status"] == "erro" for r in resultados),
+        "resultados": resultados,
+    })
+
+
+@app.route("/editar_pagamento/<int:pagamento_id>", methods=["POST"])
+def editar_pagamento(pagamento_id):
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    pagamento = Pagamento.query.get_or_404(pagamento_id)
+
+    if not Parcela.query.get(pagamento.parcela_id):
+        flash("Parcela não encontrada!", "danger")
+        return redirect(url_for("dashboard_cobrador"))
+
+    novo_valor = dinheiro(request.form.get("novo_valor", 0))
+
+    if novo_valor <= 0:
+        flash("Valor inválido!", "danger")
+        return redirect(url_for("dashboard_cobrador"))
+
+    def editar():
+        pagamento = db.session.get(Pagamento, pagamento_id)
+        if pagamento is None:
+            # cancelado por outra requisição enquanto esta esperava
+            return
+        parcela = db.session.get(Parcela, pagamento.parcela_id)
+
+        diferenca = novo_valor - pagamento.valor
+        antes = parcela.situacao()
+
+        parcela.valor_pago += diferenca
+        pagamento.valor = novo_valor
+
+        if parcela.valor_pago >= parcela.valor:
+            parcela.valor_pago = parcela.valor
+        elif parcela.valor_pago < 0:
+            parcela.valor_pago = 0
+        parcela.atualizar_status()
+
+        parcela.emprestimo.registrar_alteracao(parcela, antes)
+
+    com_retentativas(editar)
+    flash("Pagamento editado com sucesso!", "success")
+
+    if session["tipo"] == "admin":
+        return redirect(url_for("dashboard_admin"))
+    else:
+        return redirect(url_for("dashboard_cobrador"))
+
+
+@app.route("/cancelar_pagamento/<int:pagamento_id>", methods=["POST"])
+def cancelar_pagamento(pagamento_id):
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    valor = Pagamento.query.get_or_404(pagamento_id).valor
+
+    def cancelar():
+        pagamento = db.session.get(Pagamento, pagamento_id)
+        if pagamento is None:
+            # cancelado por outra requisição enquanto esta esperava
+            return
+        parcela = db.session.get(Parcela, pagamento.parcela_id) if pagamento.parcela_id else None
+
+        if parcela:
+            antes = parcela.situacao()
+            parcela.valor_pago -= pagamento.valor
+
+            if parcela.valor_pago < 0:
+                parcela.valor_pago = 0
+            parcela.atualizar_status()
+
+            parcela.emprestimo.registrar_alteracao(parcela, antes)
+
+        db.session.delete(pagamento)
+
+    com_retentativas(cancelar)
+
+    flash(f"Pagamento cancelado! Valor de R$ {valor:.2f} devolvido à parcela.", "warning")
+
+    if session["tipo"] == "admin":
+        return redirect(url_for("dashboard_admin"))
+    else:
+        return redirect(url_for("dashboard_cobrador"))
+
+
+@app.route("/cadastro_cliente", methods=["GET", "POST"])
+def cadastro_cliente():
+    if request.method == "POST":
+        nome = request.form["nome"]
+        telefone = request.form["telefone"]
+        endereco = request.form["endereco"]
+        regiao_id = request.form["regiao_id"]
+        cobrador_id = request.form["cobrador_id"]
+        try:
+            latitude, longitude = ler_coordenadas(request.form.get("latitude"), request.form.get("longitude"))
+        except ValueError as e:
+            flash(f"Localização inválida: {e}", "danger")
+            return redirect(url_for("cadastro_cliente"))
+
+        novo_cliente = Cliente(
+            nome=nome,
+            telefone=telefone,
+            endereco=endereco,
+            regiao_id=regiao_id,
+            cobrador_id=cobrador_id,
+            latitude=latitude,
+            longitude=longitude
+        )
+        db.session.add(novo_cliente)
+        db.session.commit()
+
+        flash("Cliente cadastrado com sucesso!", "success")
+        return redirect(url_for("dashboard_admin"))
+    #aqui busca todas as regiões (do cache, já com os cobradores)
+    ref = referencias()
+
+    #aqui faz a conversão antes de renderizar para o template
+    regioes = []
+    for r in ref.regioes:
+        regioes.append({
+            "id": r.id,
+            "nome": r.nome,
+            "cobradores": [{"id": c.id, "usuario": c.usuario} for c in r.cobradores]
+        })
+
+    return render_template("cadastro_cliente.html", regioes=regioes, cobradores=ref.cobradores)
+
+
+@app.route("/cadastrar_cobrador", methods=["GET", "POST"])
+def cadastrar_cobrador():
+    if "usuario" not in session or session["tipo"] != "admin":
+        flash("Acesso negado.", "danger")
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        usuario_nome = request.form.get("usuario")
+        senha = request.form.get("senha")
+        tipo = request.form.get("tipo") #admin ou cobrador
+        regiao_id = request.form.get("regiao_id", type=int)
+
+        novo_cobrador = Usuario(usuario=usuario_nome, senha=senha, tipo=tipo)
+
+        if tipo == "cobrador" and regiao_id:
+            regiao = Regiao.query.get(int(regiao_id))
+            if regiao:
+                novo_cobrador.regioes.append(regiao)
+
+        db.session.add(novo_cobrador)
+        invalidar_referencias()
+        db.session.commit()
+
+        flash(f"{tipo.capitalize()} cadastrado com sucesso!", "success")
+        return redirect(url_for("dashboard_admin"))
+
+    return render_template("cadastrar_cobrador.html", regioes=referencias().regioes)
+
+
+@app.route("/trocar_usuario")
+def trocar_usuario():
+    session.clear()
+    flash("Você saiu do sistema. Faça login novamente", "success")
+    return redirect(url_for("login"))
+
+
+@app.route("/listar_clientes")
+def listar_clientes():
+    if session.get("tipo") != "admin":
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    # com busca: os mais relevantes, sem paginação
+    termo = request.args.get("q", "").strip()
+    if termo:
+        clientes, _ = buscar_clientes(termo, limite=LIMITE_MAXIMO)
+        return render_template("listar_clientes.html", clientes=clientes, qtd_clientes=len(clientes), pagination=None, termo=termo)
+
+    per_page = 10 #mostra 10 clientes a cada pagina 
+
+    clientes = PaginaCursor(
+        Cliente.query.options(joinedload(Cliente.cobrador)),
+        Cliente.nome, Cliente.id,
+        por_pagina=per_page,
+        apos=request.args.get("apos"),
+        antes=request.args.get("antes"),
+        query_total=Cliente.query,
+        chave_total="listar_clientes",
+    )
+    return render_template("listar_clientes.html", clientes=clientes, qtd_clientes=clientes.total, pagination=clientes)
+
+
+@app.route("/clientes/busca")
+def busca_clientes():
+    if "usuario" not in session:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    usuario = usuario_logado()
+    if usuario is None:
+        return jsonify({"erro": "Faça login para continuar!"}), 401
+
+    termo = request.args.get("q", "").strip()
+    if not termo:
+        return jsonify({"erro": "Informe o termo da busca em q."}), 400
+    limite = request.args.get("limite", LIMITE_PADRAO, type=int)
+
+    # cobrador só encontra clientes das suas regiões
+    regioes_ids = list(usuario.regioes_ids) if usuario.tipo == "cobrador" else None
+    clientes, modo = buscar_clientes(termo, limite=limite, regioes_ids=regioes_ids)
+    return jsonify({
+        "termo": termo,
+        "modo": modo,
+        "clientes": [
+            {
+                "id": c.id,
+                "nome": c.nome,
+                "telefone": c.telefone,
+                "endereco": c.endereco,
+                "regiao": c.regiao.nome if c.regiao else None,
+                "cobrador": c.cobrador.usuario if c.cobrador else None,
+            }
+            for c in clientes
+        ],
+    })
+
+@app.route("/resumo_clientes")
+def resumo_clientes():
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    usuario = usuario_logado()
+
+    if not usuario or usuario.tipo not in ["admin", "cobrador"]:
+        flash("Acesso negado", "danger")
+        return redirect(url_for("login"))
+
+    hoje = datetime.now().date()
+    regioes_ids = list(usuario.regioes_ids)
+
+    #carregar clientes das regioes
+    clientes = (
+        Cliente.query
+        .options(selectinload(Cliente.emprestimos).selectinload(Emprestimo.parcelas))
+        .filter(Cliente.regiao_id.in_(regioes_ids))
+        .order_by(Cliente.nome.asc())
+        .all()
+    )
+    totais = totais_por_cliente(regioes_ids, hoje)
+
+    dashboard = []
+    totais_pendentes = {}
+    totais_atrasados = {}
+
+    for cliente in clientes:
+        totais_cliente = totais_do_cliente(totais, cliente.id)
+        totais_pendentes[cliente.id] = totais_cliente["pendente"]
+        totais_atrasados[cliente.id] = totais_cliente["atrasado"]
+
+        dashboard.append({
+            "cliente": cliente,
+            "emprestimos": cliente.emprestimos
+            })
+
+    return render_template(
+        "resumo_clientes.html",
+        dashboard=dashboard,
+        totais_pendentes=totais_pendentes,
+        totais_atrasados=totais_atrasados
+        )
+
+
+@app.route("/excluir_clientes/<int:id>", methods=["POST"])
+def excluir_clientes(id):
+    cliente = Cliente.query.get_or_404(id)
+
+    remover_cliente_da_agenda(cliente.id)
+    db.session.delete(cliente)
+    db.session.commit()
+    flash(f"Cliente {cliente.nome} excluído com sucesso!", "success")
+    return redirect(url_for("listar_clientes"))
+
+@app.route("/listar_cobradores")
+def listar_cobradores():
+    if session.get("tipo") != "admin":
+        flash("Acesso negado!", "danger")
+        return redirect(url_for("login"))
+
+    usuario = Usuario.query.all()
+    return render_template("listar_cobradores.html", usuario=usuario)
+
+
+@app.route("/excluir_cobrador/<int:id>", methods=["POST"])
+def excluir_cobrador(id):
+    cobrador = Usuario.query.get_or_404(id)
+
+    if cobrador.tipo != "cobrador":
+        flash("Não é possível excluir este usuário", "danger")
+        return redirect(url_for("listar_cobradores"))
+
+    db.session.delete(cobrador)
+    invalidar_referencias()
+    db.session.commit()
+    flash(f"Cobrador {cobrador.usuario} excluído com sucesso!", "success")
+    return redirect(url_for("listar_cobradores"))
+
+
+@app.route("/editar_cliente/<int:id>", methods=["POST", "GET"])
+def editar_cliente(id):
+    if "usuario" not in session:
+        flash("Faça login primeiro!", "danger")
+        return redirect(url_for("login"))
+
+    cliente = Cliente.query.get_or_404(id)
+
+    nome = request.form.get("nome")
+    telefone = request.form.get("telefone")
+    endereco = request.form.get("endereco")
+    try:
+        latitude, longitude = ler_coordenadas(request.form.get("latitude"), request.form.get("longitude"))
+    except ValueError as e:
+        flash(f"Localização inválida: {e}", "danger")
+        return redirect(url_for("listar_clientes"))
+
+    cliente.nome = nome
+    cliente.telefone = telefone
+    cliente.endereco = endereco
+    cliente.latitude = latitude
+    cliente.longitude = longitude
+
+    renomear_na_agenda(cliente.id, cliente.nome)
+    db.session.commit()
+
+    flash(f"Cliente {cliente.nome} atualizado com sucesso!", "success")
+    return redirect(url_for("listar_clientes"))
+
+
+@app.route("/excluir_cliente/<int:id>", methods=["POST", "GET"])
+def excluir_cliente(id):
+    cliente = Cliente.query.get_or_404(id)
+
+    remover_cliente_da_agenda(cliente.id)
+    # empréstimos, parcelas e pagamentos saem pela cascata; excluí-los um a um faz o
+    # autoflush apagar as parcelas antes e a cascata tentar apagá-las de novo
+    db.session.delete(cliente)
+    db.session.commit()
+
+    flash("Cliente e todos os empréstimos excluídos com sucesso!", "danger")
+    return redirect(url_for("listar_clientes"))
+
+
+@app.route("/editar_emprestimo/<int:id>", methods=["POST", "GET"])
+def editar_emprestimo(id):
+    emprestimo = Emprestimo.query.get_or_404(id)
+
+    # Atualiza os campos do empréstimo
+    emprestimo.valor = dinheiro(request.form.get("valor", emprestimo.valor))
+    emprestimo.porcentagem = float(request.form.get("porcentagem", emprestimo.porcentagem))
+    emprestimo.frequencia = request.form.get("frequencia", emprestimo.frequencia)
+
+    # Tratar qtd_parcelas para não dar erro se estiver vazio
+    qtd_parcelas_str = request.form.get("qtd_parcelas")
+    if qtd_parcelas_str and qtd_parcelas_str.isdigit():
+        emprestimo.qtd_parcelas = int(qtd_parcelas_str)
+    else:
+        emprestimo.qtd_parcelas = len(emprestimo.parcelas)
+
+    # Data do empréstimo
+    data_str = request.form.get("data_emprestimo")
+    if data_str:
+        emprestimo.data_emprestimo = datetime.strptime(data_str, "%Y-%m-%d").date()
+
+    # Calcula valor total atualizado
+    emprestimo.valor_total = valor_total_com_juros(emprestimo.valor, emprestimo.porcentagem)
+
+    # Remove parcelas antigas
+    remover_da_agenda([p.id for p in emprestimo.parcelas])
+    for p in list(emprestimo.parcelas):
+        db.session.delete(p)
+    db.session.flush()
+
+    # Gera novas parcelas
+    parcelas = emprestimo.gerar_parcelas()
+    for parcela in parcelas:
+        parcela.emprestimo_id = emprestimo.id
+        db.session.add(parcela)
+
+    # Atualiza totais, saldo e status do empréstimo e do cliente
+    emprestimo.recalcular_totais(parcelas)
+    incluir_na_agenda([emprestimo.id])
+
+    db.session.commit()
+    flash("Empréstimo e parcelas atualizadas com sucesso!", "success")
+    return redirect(url_for("dashboard_admin"))
+
+
+
+
+@app.route("/excluir_emprestimo/<int:id>")
+def excluir_emprestimo(id):
+    emprestimo = Emprestimo.query.get_or_404(id)
+
+    nome_cliente = emprestimo.cliente.nome
+    frequencia = emprestimo.frequencia
+
+    remover_da_agenda([p.id for p in emprestimo.parcelas])
+    emprestimo.remover_dos_totais()
+    # parcelas e pagamentos saem pela cascata (ver excluir_cliente)
+    db.session.delete(emprestimo)
+    db.session.commit()
+    flash(f"Empréstimo ({frequencia.capitalize()}) de {nome_cliente} excluído!", "danger")
+    return redirect(url_for("dashboard_admin"))
+
+
+@app.route("/logout")
+def logout():
+    session.clear()
+    flash("Você saiu com sucesso!", "success")
+    return redirect(url_for("login"))
+
+
+@app.cli.command("recalcular-totais")
+@click.option("--verificar", is_flag=True, help="Apenas lista as divergências, sem corrigir.")
+def recalcular_totais_command(verificar):
+    """Reconstrói total_pago, total_pendente e saldo de empréstimos e clientes a partir das parcelas."""
+    divergencias = reconstruir_totais(corrigir=not verificar)
+
+    for tabela, registro_id, gravado, calculado in divergencias:
+        click.echo(f"{tabela} {registro_id}: gravado={gravado} calculado={calculado}")
+
+    if verificar:
+        click.echo(f"{len(divergencias)} divergência(s) encontrada(s).")
+        if divergencias:
+            raise SystemExit(1)
+    else:
+        db.session.commit()
+        click.echo(f"{len(divergencias)} registro(s) corrigido(s).")
+
+
+@app.cli.command("criar-emprestimos-lote")
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+def criar_emprestimos_lote_command(arquivo):
+    """
+    Cria empréstimos em lote a partir de um arquivo CSV ou JSON (lista de objetos)
+    com as colunas cliente_id, valor, porcentagem, frequencia, data_emprestimo e qtd_parcelas.
+    """
+    with open(arquivo, newline="", encoding="utf-8") as f:
+        if arquivo.lower().endswith(".csv"):
+            especificacoes = list(csv.DictReader(f))
+        else:
+            especificacoes = json.load(f)
+
+    inicio = time.perf_counter()
+    try:
+        ids, qtd_parcelas = criar_emprestimos_em_lote(especificacoes)
+        db.session.commit()
+    except ErroLote as e:
+        db.session.rollback()
+        for posicao, mensagem in e.erros:
+            click.echo(f"linha {posicao + 1}: {mensagem}")
+        click.echo(f"{e}. Nada foi gravado.")
+        raise SystemExit(1)
+
+    segundos = time.perf_counter() - inicio
+    click.echo(
+        f"{len(ids)} empréstimo(s) e {qtd_parcelas} parcela(s) criados em {segundos:.2f}s "
+        f"({qtd_parcelas / max(segundos, 1e-9):,.0f} parcelas/s)."
+    )
+
+
+@app.cli.command("importar")
+@click.argument("tipo", type=click.Choice(sorted(TIPOS_IMPORTACAO)))
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+def importar_command(tipo, arquivo):
+    """
+    Importa clientes, regiões ou cobradores de um CSV (separado por "," ou ";").
+
+    \b
+    clientes:   nome, telefone, endereco, regiao, cobrador, latitude, longitude
+    regioes:    nome, cobradores (nomes separados por ";" ou "|")
+    cobradores: usuario, senha, regioes (nomes separados por ";" ou "|")
+    """
+    def ao_erro(linha, mensagem):
+        click.echo(f"linha {linha}: {mensagem}")
+
+    inicio = time.perf_counter()
+    with open(arquivo, newline="", encoding="utf-8-sig") as f:
+        resumo = importar_csv(tipo, f, ao_erro=ao_erro)
+
+    click.echo(
+        f"{resumo['importados']} registro(s) importado(s), {resumo['erros']} linha(s) com erro "
+        f"em {time.perf_counter() - inicio:.2f}s."
+    )
+
+
+@app.cli.command("exportar")
+@click.argument("entidade", type=click.Choice(ENTIDADES))
+@click.option("--formato", type=click.Choice(sorted(FORMATOS)), default="csv", show_default=True)
+@click.option("--saida", type=click.File("w", encoding="utf-8"), default="-", help="Arquivo de saída (padrão: tela).")
+@click.option("--regiao-id", type=int)
+@click.option("--cobrador-id", type=int)
+@click.option("--inicio", type=click.DateTime(["%Y-%m-%d"]))
+@click.option("--fim", type=click.DateTime(["%Y-%m-%d"]))
+def exportar_command(entidade, formato, saida, regiao_id, cobrador_id, inicio, fim):
+    """Exporta clientes, empréstimos, parcelas ou pagamentos em CSV ou JSON Lines."""
+    for pedaco in exportar(
+        entidade, formato,
+        regiao_id=regiao_id, cobrador_id=cobrador_id,
+        inicio=inicio.date() if inicio else None, fim=fim.date() if fim else None
+    ):
+        saida.write(pedaco)
+
+
+@app.cli.command("relatorio-atraso")
+@click.option("--por", type=click.Choice(AGRUPAMENTOS), default="regiao", show_default=True)
+@click.option("--data", type=click.DateTime(["%Y-%m-%d"]), help="Posição em (padrão: hoje).")
+@click.option("--regiao-id", type=int)
+@click.option("--cobrador-id", type=int)
+@click.option("--csv", "como_csv", is_flag=True, help="Saída em CSV.")
+def relatorio_atraso_command(por, data, regiao_id, cobrador_id, como_csv):
+    """Saldo em aberto por faixa de atraso (a vencer, 1-7, 8-30, 31-60, 60+ dias)."""
+    linhas, geral = calcular_atraso(data.date() if data else None, por, regiao_id, cobrador_id)
+
+    if como_csv:
+        click.echo(atraso_csv(linhas, geral, por), nl=False)
+        return
+
+    titulos = [titulo for _, titulo, _, _ in FAIXAS_ATRASO] + ["Total"]
+    click.echo(f"{'':<20}" + "".join(f"{titulo:>16}" for titulo in titulos))
+    for linha in [*linhas, geral]:
+        valores = [linha[chave] for chave, _, _, _ in FAIXAS_ATRASO] + [linha["total"]]
+        click.echo(f"{linha['nome'][:20]:<20}" + "".join(f"{valor:>16,.2f}" for valor in valores))
+
+
+@app.cli.command("gerar-agenda")
+@click.option("--data", type=click.DateTime(["%Y-%m-%d"]), help="Primeiro dia (padrão: hoje).")
+@click.option("--dias", type=int, default=1, show_default=True, help="Quantos dias montar a partir da data.")
+def gerar_agenda_command(data, dias):
+    """Monta a agenda de cobrança dos próximos dias (para rodar agendado, antes do expediente)."""
+    for dia, qtd in gerar_agendas(data.date() if data else None, dias).items():
+        click.echo(f"{dia:%d/%m/%Y}: {qtd} parcela(s) na agenda.")
+
+
+@app.cli.command("recriar-busca")
+def recriar_busca_command():
+    """Recria o índice FTS5 da busca de clientes e os triggers que o mantêm."""
+    with db.engine.begin() as conexao:
+        criado = criar_indice_busca(conexao, recriar=True)
+    if not criado:
+        click.echo("Sem FTS5 neste banco: a busca de clientes usa LIKE.")
+        raise SystemExit(1)
+    click.echo(f"Índice de busca recriado com {Cliente.query.count()} cliente(s).")
+
+
+@app.cli.command("atualizar-status")
+@click.option("--data", type=click.DateTime(["%Y-%m-%d"]), help="Dia de referência (padrão: hoje).")
+def atualizar_status_command(data):
+    """
+    Marca as parcelas atrasadas e corrige status e saldo dos empréstimos com
+    UPDATEs em massa (para rodar agendado, logo depois da meia-noite). Também
+    apaga os registros excluídos que já saíram do horizonte da sincronização.
+    """
+    alteradas = atualizar_status(data.date() if data else None)
+    limpos = limpar_registros_excluidos()
+    db.session.commit()
+    click.echo(
+        f"{alteradas['parcelas']} parcela(s), {alteradas['agenda']} item(ns) da agenda "
+        f"e {alteradas['emprestimos']} empréstimo(s) atualizados."
+    )
+    click.echo(f"{limpos} registro(s) excluído(s) fora do horizonte da sincronização apagados.")
+
+
+@app.cli.command("verificar-planos")
+@click.option("--detalhes", is_flag=True, help="Mostra o plano completo de cada consulta.")
+def verificar_planos_command(detalhes):
+    """Roda EXPLAIN QUERY PLAN nas consultas dos dashboards e falha se alguma varrer uma tabela inteira."""
+    falhas = 0
+
+    for nome, plano, varreduras in verificar_planos():
+        click.echo(f"[{'FALHA' if varreduras else 'ok'}] {nome}")
+        for detalhe in (plano if detalhes else varreduras):
+            click.echo(f"    {detalhe}")
+        falhas += bool(varreduras)
+
+    if falhas:
+        click.echo(f"{falhas} consulta(s) com varredura de tabela.")
+        raise SystemExit(1)
+
+
+@app.cli.command("estresse-escrita")
+@click.option("--trabalhadores", type=int, multiple=True, help="Processos simultâneos (repetível; padrão: 1, 4 e 8).")
+@click.option("--pagamentos", type=int, default=200, show_default=True, help="Recebimentos gravados por processo.")
+@click.option("--url", help="Banco de teste (padrão: SQLite temporário). Use um banco vazio.")
+@click.option("--sem-wal", is_flag=True, help="Mantém o journal padrão do SQLite, para comparar.")
+def estresse_escrita_command(trabalhadores, pagamentos, url, sem_wal):
+    """Mede recebimentos por segundo com vários processos gravando ao mesmo tempo."""
+    rodadas = medir_escrita(trabalhadores or (1, 4, 8), pagamentos, url, wal=not sem_wal)
+
+    click.echo(f"{'processos':>9} {'transações':>11} {'segundos':>9} {'por segundo':>12} {'falhas':>7}")
+    for quantidade, feitas, segundos, por_segundo, falhas in rodadas:
+        click.echo(f"{quantidade:>9} {feitas:>11} {segundos:>9.2f} {por_segundo:>12.1f} {falhas:>7}")
+
+
+@app.cli.command("martelar-parcela")
+@click.option("--threads", type=int, default=8, show_default=True)
+@click.option("--pagamentos", type=int, default=25, show_default=True, help="Recebimentos de R$ 1,00 por thread.")
+@click.option("--url", help="Banco de teste (padrão: SQLite temporário). Use um banco vazio.")
+def martelar_parcela_command(threads, pagamentos, url):
+    """Várias threads recebendo na mesma parcela; falha se algum recebimento se perder."""
+    contagens, divergencias = martelar_parcela(threads, pagamentos, url)
+
+    click.echo(
+        f"{contagens['confirmados']} recebimento(s) confirmados em {contagens['segundos']:.2f}s, "
+        f"{contagens['retentativas']} nova(s) tentativa(s) por conflito, "
+        f"{contagens['desistencias']} desistência(s)."
+    )
+    for nome, obtido, esperado in divergencias:
+        click.echo(f"    {nome}: gravado={obtido} esperado={esperado}")
+    if divergencias:
+        click.echo(f"{len(divergencias)} divergência(s): recebimentos perdidos.")
+        raise SystemExit(1)
+    click.echo("Nenhum recebimento perdido.")
+
+
+
+@app.cli.command("gerar-dados")
+@click.option("--regioes", type=int, default=50, show_default=True)
+@click.option("--cobradores", type=int, default=200, show_default=True)
+@click.option("--clientes", type=int, default=100_000, show_default=True)
+@click.option("--parcelas", type=int, default=5_000_000, show_default=True, help="Aproximado: para no empréstimo que passar disso.")
+@click.option("--semente", type=int, default=1, show_default=True, help="Mesma semente, mesmos dados.")
+def gerar_dados_command(regioes, cobradores, clientes, parcelas, semente):
+    """Grava no banco configurado uma carteira sintética para medir desempenho."""
+    def avancar(contagens):
+        click.echo(
+            f"\r{contagens['clientes']} cliente(s), {contagens['emprestimos']} empréstimo(s), "
+            f"{contagens['parcelas']} parcela(s)", nl=False
+        )
+
+    inicio = time.perf_counter()
+    try:
+        contagens = gerar_dados_sinteticos(regioes, cobradores, clientes, parcelas, semente, ao_avancar=avancar)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo()
+    click.echo(
+        f"{contagens['regioes']} região(ões), {contagens['cobradores']} cobrador(es), "
+        f"{contagens['clientes']} cliente(s), {contagens['emprestimos']} empréstimo(s), "
+        f"{contagens['parcelas']} parcela(s) e {contagens['pagamentos']} pagamento(s) "
+        f"em {time.perf_counter() - inicio:.1f}s. Senha dos cobradores: 123."
+    )
+
+
+@app.cli.command("medir-desempenho")
+@click.option("--repeticoes", type=int, default=5, show_default=True, help="Chamadas cronometradas por endpoint.")
+@click.option("--cobrador", help="Usuário do cobrador (padrão: o que tem mais clientes).")
+@click.option("--base", type=click.Path(dir_okay=False), help="Arquivo JSON com a linha de base.")
+@click.option("--salvar", is_flag=True, help="Grava o resultado como nova linha de base em --base.")
+@click.option("--tolerancia", type=float, default=TOLERANCIA, show_default=True, help="Aumento aceito de tempo e memória.")
+def medir_desempenho_command(repeticoes, cobrador, base, salvar, tolerancia):
+    """Mede tempo, consultas e memória dos dashboards e do recebimento; falha se piorar em relação à base."""
+    if salvar and not base:
+        raise click.UsageError("--salvar precisa de --base")
+    try:
+        resultados = medir_endpoints(app, repeticoes, cobrador)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"{'endpoint':<20} {'mediana ms':>11} {'máximo ms':>10} {'consultas':>10} {'memória KB':>11}")
+    for endpoint, medida in resultados.items():
+        click.echo(
+            f"{endpoint:<20} {medida['mediana_ms']:>11.1f} {medida['maximo_ms']:>10.1f} "
+            f"{medida['consultas']:>10} {medida['memoria_kb']:>11}"
+        )
+
+    if salvar:
+        salvar_base(base, resultados)
+        click.echo(f"Linha de base gravada em {base}.")
+    elif base:
+        regressoes = comparar_com_base(resultados, ler_base(base), tolerancia)
+        for endpoint, medida, anterior, atual in regressoes:
+            click.echo(f"    {endpoint}: {medida} {anterior} -> {atual}")
+        if regressoes:
+            click.echo(f"{len(regressoes)} regressão(ões) em relação à linha de base.")
+            raise SystemExit(1)
+        click.echo("Nenhuma regressão em relação à linha de base.")
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000, debug=True)
+
@@ -0,0 +1,98 @@
+import os
+import time
+import random
+from sqlalchemy import event
+from sqlalchemy.orm.exc import StaleDataError
+from models import db
+
+# relativo à pasta instance/ do Flask
+URL_PADRAO = "sqlite:///sistema.db"
+
+# quantas vezes uma operação é refeita depois de perder a corrida para outra transação
+TENTATIVAS_CONFLITO = 8
+
+
+def _inteiro(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+def url_do_banco():
+    """URL do banco vinda de DATABASE_URL (SQLite local quando não informada)."""
+    url = os.environ.get("DATABASE_URL") or URL_PADRAO
+    # alguns provedores ainda entregam "postgres://", que o SQLAlchemy 2 não aceita
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def opcoes_do_engine(url):
+    """
+    Opções do engine para a URL. No SQLite o pool padrão já serve (uma conexão por
+    thread, arquivo local) e só o tempo de espera por bloqueio importa; nos demais
+    bancos o tamanho do pool é ajustável por variável de ambiente.
+    """
+    if url.startswith("sqlite"):
+        return {"connect_args": {"timeout": _inteiro("SQLITE_BUSY_TIMEOUT", 15000) / 1000}}
+    return {
+        "pool_size": _inteiro("DB_POOL_SIZE", 5),
+        "max_overflow": _inteiro("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _inteiro("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _inteiro("DB_POOL_RECYCLE", 1800),
+        # descarta conexões derrubadas pelo servidor em vez de falhar a requisição
+        "pool_pre_ping": True,
+    }
+
+
+def preparar_engine(engine, wal=True):
+    """
+    No SQLite, ajusta cada conexão nova: WAL deixa leituras correrem durante uma
+    escrita, synchronous=NORMAL só sincroniza o disco no checkpoint (seguro com WAL)
+    e busy_timeout faz a conexão esperar o bloqueio em vez de falhar na hora.
+    Outros bancos não precisam de nada.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    espera = _inteiro("SQLITE_BUSY_TIMEOUT", 15000)
+
+    @event.listens_for(engine, "connect")
+    def _ajustar_conexao(conexao, registro):
+        cursor = conexao.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={espera}")
+        cursor.close()
+
+
+def configurar_banco(app, url=None):
+    url = url or url_do_banco()
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opcoes_do_engine(url)
+    db.init_app(app)
+
+    # o engine é criado aqui, antes da primeira conexão
+    with app.app_context():
+        preparar_engine(db.engine)
+
+
+def com_retentativas(operacao, tentativas=TENTATIVAS_CONFLITO):
+    """
+    Executa `operacao()` e faz o commit. Cliente, Emprestimo e Parcela têm coluna de
+    versão: se outra transação alterou uma dessas linhas depois que a operação a
+    leu, o UPDATE não encontra a versão lida e o flush levanta StaleDataError.
+    Nesse caso tudo é desfeito e a operação roda de novo, relendo os dados, até
+    `tentativas` vezes. A operação deve buscar o que altera (não reaproveitar
+    objetos carregados antes). Retorna o que ela retornar.
+    """
+    for tentativa in range(tentativas):
+        try:
+            resultado = operacao()
+            db.session.commit()
+            return resultado
+        except StaleDataError:
+            db.session.rollback()
+            if tentativa == tentativas - 1:
+                raise
+            # espera um pouco (e cada um uma quantia diferente) para as transações não colidirem de novo
+            time.sleep(random.uniform(0, 0.005 * 2 ** tentativa))
@@ -0,0 +1,152 @@
+import re
+import threading
+from sqlalchemy import event, table, column, text, and_, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+from models import db, Cliente
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+# acima disso o termo é genérico demais ("ma", "rua"): calcular o bm25 de cada
+# resultado custaria centenas de ms, e eles vêm na ordem do índice (id)
+MAXIMO_RANQUEADOS = 2_000
+
+# índice FTS5 com o conteúdo da própria tabela cliente (content=), mantido por triggers.
+# remove_diacritics: "joao" encontra "João"; prefix: índices para buscas de 2 e 3 letras
+COMANDOS_INDICE = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cliente_busca USING fts5(
+        nome, telefone, endereco,
+        content='cliente', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_ai AFTER INSERT ON cliente BEGIN
+        INSERT INTO cliente_busca(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_ad AFTER DELETE ON cliente BEGIN
+        INSERT INTO cliente_busca(cliente_busca, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+    END""",
+    # só quando muda um campo buscável: os totais mudam a cada pagamento e não precisam reindexar
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_au AFTER UPDATE OF nome, telefone, endereco ON cliente BEGIN
+        INSERT INTO cliente_busca(cliente_busca, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+        INSERT INTO cliente_busca(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END""",
+    # relevância: o nome pesa mais que o telefone, que pesa mais que o endereço
+    "INSERT INTO cliente_busca(cliente_busca, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    "INSERT INTO cliente_busca(cliente_busca) VALUES ('rebuild')",
+)
+COMANDOS_REMOCAO = (
+    "DROP TRIGGER IF EXISTS cliente_busca_ai",
+    "DROP TRIGGER IF EXISTS cliente_busca_ad",
+    "DROP TRIGGER IF EXISTS cliente_busca_au",
+    "DROP TABLE IF EXISTS cliente_busca",
+)
+
+cliente_busca = table("cliente_busca", column("rowid"), column("rank"))
+
+# se o banco de cada engine tem o índice: {url: bool}
+_com_indice = {}
+_trava = threading.Lock()
+
+
+def criar_indice_busca(conexao, recriar=False):
+    """
+    Cria (ou recria) o índice FTS5 e os triggers e indexa os clientes existentes.
+    Só no SQLite; retorna False se o SQLite não tiver o FTS5 (a busca usa LIKE).
+    """
+    if conexao.dialect.name != "sqlite":
+        return False
+    try:
+        for comando in (COMANDOS_REMOCAO if recriar else ()) + COMANDOS_INDICE:
+            conexao.exec_driver_sql(comando)
+    except OperationalError:
+        # "no such module: fts5"
+        return False
+    finally:
+        with _trava:
+            _com_indice.pop(str(conexao.engine.url), None)
+    return True
+
+
+@event.listens_for(Cliente.__table__, "after_create")
+def _criar_indice_com_a_tabela(tabela, conexao, **kw):
+    # bancos novos são criados por db.create_all, sem passar pelas migrações
+    criar_indice_busca(conexao)
+
+
+def indice_disponivel():
+    chave = str(db.engine.url)
+    with _trava:
+        if chave in _com_indice:
+            return _com_indice[chave]
+    disponivel = db.engine.dialect.name == "sqlite" and bool(db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cliente_busca'")
+    ).scalar())
+    with _trava:
+        _com_indice[chave] = disponivel
+    return disponivel
+
+
+def _palavras(termo):
+    return re.findall(r"\w+", termo or "")
+
+
+def _consulta_fts(palavras):
+    # cada palavra entre aspas (nada do termo vira operador do FTS5); com * a partir
+    # de 2 letras, para buscar pelo início: "9"* seria quase todo telefone
+    return " ".join('"{}"*'.format(p) if len(p) > 1 else '"{}"'.format(p) for p in palavras)
+
+
+def _poucos_resultados(consulta):
+    # só conta até o limite: contar os 100 mil clientes de um termo genérico já é lento
+    return db.session.execute(text(
+        "SELECT count(*) FROM (SELECT 1 FROM cliente_busca WHERE cliente_busca MATCH :consulta LIMIT :limite)"
+    ), {"consulta": consulta, "limite": MAXIMO_RANQUEADOS + 1}).scalar() <= MAXIMO_RANQUEADOS
+
+
+def buscar_clientes(termo, limite=LIMITE_PADRAO, regioes_ids=None):
+    """
+    Clientes cujo nome, telefone ou endereço têm todas as palavras do termo, cada
+    uma como início de palavra ("mar sil" encontra "Maria da Silva"), sem
+    diferenciar acentos. Com o índice FTS5, ordenados por relevância (bm25) se o
+    termo tiver até MAXIMO_RANQUEADOS resultados; sem ele (outro banco ou SQLite
+    sem FTS5), por LIKE em qualquer posição, ordenados pelo nome. `regioes_ids`
+    restringe às regiões do cobrador.
+
+    Retorna (clientes, modo), com modo "fts5" ou "like".
+    """
+    palavras = _palavras(termo)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    modo = "fts5" if indice_disponivel() else "like"
+    if not palavras:
+        return [], modo
+
+    query = Cliente.query.options(joinedload(Cliente.regiao), joinedload(Cliente.cobrador))
+    if regioes_ids is not None:
+        query = query.filter(Cliente.regiao_id.in_(regioes_ids))
+
+    if modo == "fts5":
+        consulta = _consulta_fts(palavras)
+        query = (
+            query.join(cliente_busca, cliente_busca.c.rowid == Cliente.id)
+            .filter(text("cliente_busca MATCH :consulta").bindparams(consulta=consulta))
+        )
+        if _poucos_resultados(consulta):
+            query = query.order_by(cliente_busca.c.rank, Cliente.id)
+        else:
+            # na ordem do índice o SQLite para nos primeiros `limite`, sem ordenar
+            query = query.order_by(cliente_busca.c.rowid)
+    else:
+        query = query.filter(and_(*(
+            or_(
+                Cliente.nome.icontains(palavra, autoescape=True),
+                Cliente.telefone.icontains(palavra, autoescape=True),
+                Cliente.endereco.icontains(palavra, autoescape=True),
+            )
+            for palavra in palavras
+        ))).order_by(Cliente.nome, Cliente.id)
+
+    return query.limit(limite).all(), modo
@@ -0,0 +1,267 @@
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from sqlalchemy import insert, bindparam
+from dinheiro import dinheiro, ZERO
+from agenda import invalidar_agenda
+from referencias import invalidar_referencias
+from models import (
+    db, Regiao, Usuario, Cliente, Emprestimo, Parcela, Pagamento, regiao_cobrador, marcar_vencimentos
+)
+
+PREFIXO = "sintetico"
+
+# clientes e empréstimos gravados por INSERT (e por commit)
+TAMANHO_BLOCO = 5000
+
+# empréstimos feitos nos últimos DIAS_EMPRESTIMOS dias
+DIAS_EMPRESTIMOS = 120
+
+FREQUENCIAS = (("diaria", 60), ("semanal", 30), ("mensal", 10))
+PARCELAS_DIARIAS = (10, 20, 24, 30)
+VALORES = tuple(range(200, 5001, 50))
+PORCENTAGENS = (10, 20, 25, 30)
+
+# o que acontece com cada parcela que já venceu (e com as que vencem hoje)
+DESTINO_VENCIDAS = (("pago", 70), ("parcial", 10), ("nada", 20))
+DESTINO_DE_HOJE = (("pago", 40), ("parcial", 10), ("nada", 50))
+
+NOMES = (
+    "Ana", "Antônio", "Benedita", "Carlos", "Cláudia", "Conceição", "Damião", "Edson", "Fábio", "Fátima",
+    "Francisco", "Gabriel", "Helena", "Inês", "João", "José", "Júlia", "Lúcia", "Luís", "Márcia",
+    "Maria", "Mônica", "Otávio", "Patrícia", "Raimundo", "Sebastião", "Simão", "Tânia", "Vânia", "Vitória",
+)
+SOBRENOMES = (
+    "Almeida", "Araújo", "Barbosa", "Cardoso", "Conceição", "Costa", "Dias", "Fernandes", "Gonçalves", "Lima",
+    "Magalhães", "Nascimento", "Oliveira", "Pereira", "Ribeiro", "Rodrigues", "Santos", "Silva", "Sousa", "Souza",
+)
+RUAS = ("Rua", "Avenida", "Travessa", "Alameda")
+
+
+def _sorteio(rng, opcoes):
+    return rng.choices([valor for valor, _ in opcoes], [peso for _, peso in opcoes])[0]
+
+
+def _pagamentos_da_parcela(rng, parcela, hoje):
+    """Decide quanto da parcela já foi recebido e devolve os pagamentos (data, valor)."""
+    if parcela.data_vencimento > hoje:
+        return []
+    destino = _sorteio(rng, DESTINO_VENCIDAS if parcela.data_vencimento < hoje else DESTINO_DE_HOJE)
+    if destino == "nada":
+        return []
+    valor = parcela.valor
+    if destino == "parcial":
+        valor = dinheiro(parcela.valor * Decimal(rng.randint(10, 90)) / 100)
+    quando = datetime.combine(parcela.data_vencimento, time(rng.randint(8, 18), rng.randint(0, 59)))
+    return [(quando, valor)]
+
+
+class GeradorSintetico:
+    """
+    Carteira sintética reproduzível (mesma semente, mesmos dados) para medir
+    desempenho: regiões, cobradores, clientes e empréstimos com parcelas e
+    pagamentos. Os cronogramas vêm de Emprestimo.gerar_parcelas, e o status de
+    cada parcela de Parcela.atualizar_status, como num lançamento pela tela; a
+    gravação é feita com INSERTs em massa e um commit por bloco.
+    """
+
+    def __init__(self, semente=1, hoje=None, ao_avancar=None):
+        self.rng = random.Random(semente)
+        self.prefixo = f"{PREFIXO}-{semente}"
+        self.hoje = hoje or date.today()
+        self.ao_avancar = ao_avancar
+        self.contagens = {"regioes": 0, "cobradores": 0, "clientes": 0, "emprestimos": 0, "parcelas": 0, "pagamentos": 0}
+
+    def _avancar(self):
+        if self.ao_avancar:
+            self.ao_avancar(self.contagens)
+
+    def gerar(self, regioes=50, cobradores=200, clientes=100_000, parcelas=5_000_000):
+        if db.session.query(Regiao.id).filter(Regiao.nome.like(f"{self.prefixo} %")).first():
+            raise ValueError(f"o banco já tem dados sintéticos com o prefixo {self.prefixo!r}; use outra semente")
+
+        regioes_ids = self._gerar_regioes(regioes)
+        cobradores_por_regiao = self._gerar_cobradores(cobradores, regioes_ids)
+        clientes_ids = self._gerar_clientes(clientes, regioes_ids, cobradores_por_regiao)
+        if clientes_ids:
+            self._gerar_emprestimos(parcelas, clientes_ids)
+        return self.contagens
+
+    def _gerar_regioes(self, quantidade):
+        ids = db.session.scalars(
+            insert(Regiao).returning(Regiao.id, sort_by_parameter_order=True),
+            [{"nome": f"{self.prefixo} região {i + 1}"} for i in range(quantidade)]
+        ).all() if quantidade else []
+        self.contagens["regioes"] = len(ids)
+        return ids
+
+    def _gerar_cobradores(self, quantidade, regioes_ids):
+        """Cada cobrador atende uma região (a principal), em rodízio."""
+        if not quantidade:
+            return {}
+        regiao_de = [regioes_ids[i % len(regioes_ids)] if regioes_ids else None for i in range(quantidade)]
+        ids = db.session.scalars(
+            insert(Usuario).returning(Usuario.id, sort_by_parameter_order=True),
+            [
+                {"usuario": f"{self.prefixo}-cobrador-{i + 1}", "senha": "123", "tipo": "cobrador", "regiao_id": regiao_de[i]}
+                for i in range(quantidade)
+            ]
+        ).all()
+
+        por_regiao = {}
+        for cobrador_id, regiao_id in zip(ids, regiao_de):
+            if regiao_id is not None:
+                por_regiao.setdefault(regiao_id, []).append(cobrador_id)
+        vinculos = [
+            {"regiao_id": regiao_id, "cobrador_id": cobrador_id}
+            for regiao_id, cobradores_ids in por_regiao.items() for cobrador_id in cobradores_ids
+        ]
+        if vinculos:
+            db.session.execute(insert(regiao_cobrador), vinculos)
+        invalidar_referencias()
+        db.session.commit()
+        self.contagens["cobradores"] = len(ids)
+        self._avancar()
+        return por_regiao
+
+    def _cliente(self, regioes_ids, cobradores_por_regiao):
+        rng = self.rng
+        regiao_id = rng.choice(regioes_ids) if regioes_ids else None
+        cobradores_ids = cobradores_por_regiao.get(regiao_id)
+        return {
+            "nome": f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}",
+            "telefone": f"({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(0, 9999):04d}",
+            "endereco": f"{rng.choice(RUAS)} {rng.choice(NOMES)} {rng.choice(SOBRENOMES)}, {rng.randint(1, 3000)}",
+            "regiao_id": regiao_id,
+            "cobrador_id": rng.choice(cobradores_ids) if cobradores_ids else None,
+        }
+
+    def _gerar_clientes(self, quantidade, regioes_ids, cobradores_por_regiao):
+        ids = []
+        for inicio in range(0, quantidade, TAMANHO_BLOCO):
+            bloco = [
+                self._cliente(regioes_ids, cobradores_por_regiao)
+                for _ in range(min(TAMANHO_BLOCO, quantidade - inicio))
+            ]
+            ids.extend(db.session.scalars(
+                insert(Cliente).returning(Cliente.id, sort_by_parameter_order=True), bloco
+            ).all())
+            db.session.commit()
+            self.contagens["clientes"] = len(ids)
+            self._avancar()
+        return ids
+
+    def _emprestimo(self, cliente_id):
+        """Um empréstimo sorteado com o cronograma de gerar_parcelas e os pagamentos já feitos."""
+        rng = self.rng
+        frequencia = _sorteio(rng, FREQUENCIAS)
+        emprestimo = Emprestimo(
+            cliente_id=cliente_id,
+            valor=rng.choice(VALORES),
+            porcentagem=rng.choice(PORCENTAGENS),
+            frequencia=frequencia,
+            data_emprestimo=self.hoje - timedelta(days=rng.randint(0, DIAS_EMPRESTIMOS)),
+        )
+        parcelas = emprestimo.gerar_parcelas(rng.choice(PARCELAS_DIARIAS) if frequencia == "diaria" else None)
+
+        pagamentos = []
+        for parcela in parcelas:
+            recebidos = _pagamentos_da_parcela(rng, parcela, self.hoje)
+            parcela.valor_pago = sum((valor for _, valor in recebidos), ZERO)
+            parcela.atualizar_status(self.hoje)
+            pagamentos.append(recebidos)
+
+        # os mesmos totais de recalcular_totais, sem passar pela sessão
+        emprestimo.total_pago = sum((p.situacao()[0] for p in parcelas), ZERO)
+        emprestimo.total_pendente = sum((p.situacao()[1] for p in parcelas), ZERO)
+        emprestimo.saldo = max(ZERO, emprestimo.valor_total - emprestimo.total_pago)
+        emprestimo.status = "quitado" if emprestimo.saldo <= 0 else "em_aberto"
+        return emprestimo, parcelas, pagamentos
+
+    def _gravar_emprestimos(self, bloco, totais_clientes, vencimentos):
+        ids = db.session.scalars(
+            insert(Emprestimo).returning(Emprestimo.id, sort_by_parameter_order=True),
+            [
+                {
+                    "cliente_id": e.cliente_id, "valor": e.valor, "porcentagem": e.porcentagem,
+                    "frequencia": e.frequencia, "data_emprestimo": e.data_emprestimo,
+                    "valor_total": e.valor_total, "saldo": e.saldo, "status": e.status,
+                    "total_pago": e.total_pago, "total_pendente": e.total_pendente,
+                }
+                for e, _, _ in bloco
+            ]
+        ).all()
+
+        linhas_parcelas = []
+        for emprestimo_id, (emprestimo, parcelas, _) in zip(ids, bloco):
+            for parcela in parcelas:
+                linhas_parcelas.append({
+                    "emprestimo_id": emprestimo_id, "numero_parcela": parcela.numero_parcela,
+                    "valor": parcela.valor, "valor_pago": parcela.valor_pago,
+                    "data_vencimento": parcela.data_vencimento, "status": parcela.status,
+                })
+                vencimentos.add(parcela.data_vencimento)
+            pago, pendente = totais_clientes.get(emprestimo.cliente_id, (ZERO, ZERO))
+            totais_clientes[emprestimo.cliente_id] = (pago + emprestimo.total_pago, pendente + emprestimo.total_pendente)
+        tabela = Parcela.__table__
+        parcelas_ids = db.session.scalars(
+            insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), linhas_parcelas
+        ).all()
+
+        linhas_pagamentos = []
+        posicao = 0
+        for emprestimo_id, (_, parcelas, pagamentos) in zip(ids, bloco):
+            for recebidos in pagamentos:
+                parcela_id = parcelas_ids[posicao]
+                posicao += 1
+                linhas_pagamentos.extend(
+                    {"emprestimo_id": emprestimo_id, "parcela_id": parcela_id, "valor": valor, "data_pagamento": quando}
+                    for quando, valor in recebidos
+                )
+        if linhas_pagamentos:
+            db.session.execute(insert(Pagamento.__table__), linhas_pagamentos)
+        db.session.commit()
+
+        self.contagens["emprestimos"] += len(ids)
+        self.contagens["parcelas"] += len(parcelas_ids)
+        self.contagens["pagamentos"] += len(linhas_pagamentos)
+        self._avancar()
+
+    def _gerar_emprestimos(self, total_parcelas, clientes_ids):
+        """Sorteia empréstimos para clientes ao acaso até passar de `total_parcelas` parcelas."""
+        totais_clientes = {}
+        vencimentos = set()
+        bloco = []
+        geradas = 0
+        while geradas < total_parcelas:
+            emprestimo = self._emprestimo(self.rng.choice(clientes_ids))
+            geradas += len(emprestimo[1])
+            bloco.append(emprestimo)
+            if len(bloco) >= TAMANHO_BLOCO:
+                self._gravar_emprestimos(bloco, totais_clientes, vencimentos)
+                bloco = []
+        if bloco:
+            self._gravar_emprestimos(bloco, totais_clientes, vencimentos)
+
+        # os clientes foram criados aqui com totais zerados: grava a soma dos empréstimos
+        tabela = Cliente.__table__
+        itens = list(totais_clientes.items())
+        for inicio in range(0, len(itens), TAMANHO_BLOCO):
+            db.session.execute(
+                tabela.update().where(tabela.c.id == bindparam("b_id"))
+                .values(total_pago=bindparam("b_pago"), total_pendente=bindparam("b_pendente")),
+                [
+                    {"b_id": cliente_id, "b_pago": pago, "b_pendente": pendente}
+                    for cliente_id, (pago, pendente) in itens[inicio:inicio + TAMANHO_BLOCO]
+                ]
+            )
+        # os INSERTs em massa não passam pelo flush do ORM
+        marcar_vencimentos(vencimentos)
+        invalidar_agenda()
+        db.session.commit()
+
+
+def gerar_dados_sinteticos(regioes=50, cobradores=200, clientes=100_000, parcelas=5_000_000,
+                           semente=1, hoje=None, ao_avancar=None):
+    """Atalho para GeradorSintetico(...).gerar(...). Retorna as quantidades criadas."""
+    return GeradorSintetico(semente, hoje, ao_avancar).gerar(regioes, cobradores, clientes, parcelas)
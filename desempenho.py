@@ -0,0 +1,205 @@
+import json
+import time
+import threading
+import statistics
+import tracemalloc
+from sqlalchemy import event, select, func
+from models import db, Usuario, Cliente, Emprestimo, Parcela, Pagamento
+
+# tempo e memória podem crescer até TOLERANCIA sobre a linha de base
+TOLERANCIA = 0.3
+# diferenças de tempo menores que isso são ruído, mesmo acima da tolerância
+FOLGA_MS = 5.0
+# valor de cada recebimento medido (desfeito no final)
+VALOR_RECEBIMENTO = "0.01"
+
+
+class ContadorDeConsultas:
+    """Conta as consultas executadas no engine enquanto estiver ativo (with)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args):
+        self.total += 1
+
+    def __enter__(self):
+        self.total = 0
+        event.listen(self.engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *erro):
+        event.remove(self.engine, "before_cursor_execute", self._contar)
+
+
+def _entrar(cliente, usuario):
+    # as chaves que o login grava; as regiões e a versão de acesso a aplicação
+    # completa na primeira requisição (a de aquecimento)
+    with cliente.session_transaction() as sessao:
+        sessao["usuario"] = usuario.usuario
+        sessao["tipo"] = usuario.tipo
+        sessao["usuario_id"] = usuario.id
+
+
+def _medir(engine, chamar, repeticoes, status_esperado):
+    """
+    Uma chamada de aquecimento (caches de referências e agenda), `repeticoes`
+    chamadas cronometradas e uma última com tracemalloc, separada para que o
+    rastreamento não pese no tempo.
+    """
+    def chamar_e_conferir():
+        resposta = chamar()
+        if resposta.status_code != status_esperado:
+            raise RuntimeError(f"resposta {resposta.status_code} (esperada {status_esperado})")
+
+    chamar_e_conferir()
+    tempos = []
+    consultas = []
+    contador = ContadorDeConsultas(engine)
+    for _ in range(repeticoes):
+        with contador:
+            inicio = time.perf_counter()
+            chamar_e_conferir()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.total)
+
+    tracemalloc.start()
+    try:
+        chamar_e_conferir()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mediana_ms": round(statistics.median(tempos), 1),
+        "maximo_ms": round(max(tempos), 1),
+        "consultas": max(consultas),
+        "memoria_kb": pico // 1024,
+    }
+
+
+def _usuarios(cobrador=None):
+    admin = Usuario.query.filter_by(tipo="admin").order_by(Usuario.id).first()
+    if cobrador:
+        usuario_cobrador = Usuario.query.filter_by(usuario=cobrador, tipo="cobrador").first()
+    else:
+        # o cobrador com mais clientes: o pior caso das telas do cobrador
+        mais_clientes = db.session.execute(
+            select(Cliente.cobrador_id).where(Cliente.cobrador_id.is_not(None))
+            .group_by(Cliente.cobrador_id).order_by(func.count().desc(), Cliente.cobrador_id).limit(1)
+        ).scalar()
+        usuario_cobrador = db.session.get(Usuario, mais_clientes) if mais_clientes else None
+    if admin is None or usuario_cobrador is None:
+        raise ValueError("é preciso um admin e um cobrador com clientes (veja flask gerar-dados)")
+    return admin, usuario_cobrador
+
+
+def _parcelas_em_aberto(cobrador_id, quantidade):
+    return db.session.scalars(
+        select(Parcela.id)
+        .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+        .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        .where(Cliente.cobrador_id == cobrador_id, Parcela.status != "pago")
+        .order_by(Parcela.id).limit(quantidade)
+    ).all()
+
+
+def _medir_endpoints(app, repeticoes, cobrador):
+    with app.app_context():
+        engine = db.engine
+        admin, usuario_cobrador = _usuarios(cobrador)
+        # aquecimento + repetições + a chamada da memória
+        parcelas_ids = _parcelas_em_aberto(usuario_cobrador.id, repeticoes + 2)
+        if len(parcelas_ids) < repeticoes + 2:
+            raise ValueError(f"o cobrador {usuario_cobrador.usuario} não tem parcelas em aberto suficientes")
+        ultimo_pagamento = db.session.scalar(select(func.max(Pagamento.id))) or 0
+
+    resultados = {}
+    cliente_admin = app.test_client()
+    _entrar(cliente_admin, admin)
+    resultados["dashboard_admin"] = _medir(
+        engine, lambda: cliente_admin.get("/dashboard_admin"), repeticoes, 200)
+
+    cliente = app.test_client()
+    _entrar(cliente, usuario_cobrador)
+    resultados["dashboard_cobrador"] = _medir(
+        engine, lambda: cliente.get("/dashboard_cobrador"), repeticoes, 200)
+    resultados["resumo_clientes"] = _medir(
+        engine, lambda: cliente.get("/resumo_clientes"), repeticoes, 200)
+
+    fila = iter(parcelas_ids)
+    try:
+        resultados["receber_pagamento"] = _medir(
+            engine,
+            lambda: cliente.post(f"/receber_pagamento/{next(fila)}", data={"valor_pago": VALOR_RECEBIMENTO}),
+            repeticoes, 302,
+        )
+    finally:
+        with app.app_context():
+            feitos = db.session.scalars(
+                select(Pagamento.id).where(Pagamento.id > ultimo_pagamento).order_by(Pagamento.id)
+            ).all()
+        for pagamento_id in feitos:
+            cliente.post(f"/cancelar_pagamento/{pagamento_id}")
+    return resultados
+
+
+def medir_endpoints(app, repeticoes=5, cobrador=None):
+    """
+    Mede dashboard_admin (como admin), dashboard_cobrador e resumo_clientes (como
+    o cobrador) e receber_pagamento pelo cliente de teste do Flask, com os dados
+    do banco configurado. Os recebimentos de R$ 0,01 feitos na medição são
+    cancelados no final pela rota cancelar_pagamento.
+
+    Roda numa thread própria: os comandos do flask já estão dentro de um contexto
+    de aplicação, e as requisições o reaproveitariam (mesma sessão e mesmo g).
+    Na thread, cada requisição abre o próprio contexto, como no servidor.
+
+    Retorna {endpoint: {mediana_ms, maximo_ms, consultas, memoria_kb}}.
+    """
+    saida = {}
+
+    def medir():
+        try:
+            saida["resultados"] = _medir_endpoints(app, repeticoes, cobrador)
+        except Exception as e:
+            saida["erro"] = e
+
+    thread = threading.Thread(target=medir)
+    thread.start()
+    thread.join()
+    if "erro" in saida:
+        raise saida["erro"]
+    return saida["resultados"]
+
+
+def comparar_com_base(resultados, base, tolerancia=TOLERANCIA):
+    """
+    Regressões em relação à linha de base: mais consultas, ou tempo (mediana) e
+    memória acima da tolerância. Retorna (endpoint, medida, base, atual) de cada uma.
+    """
+    regressoes = []
+    for endpoint, atual in resultados.items():
+        anterior = base.get(endpoint)
+        if not anterior:
+            continue
+        if atual["consultas"] > anterior["consultas"]:
+            regressoes.append((endpoint, "consultas", anterior["consultas"], atual["consultas"]))
+        limite_ms = max(anterior["mediana_ms"] * (1 + tolerancia), anterior["mediana_ms"] + FOLGA_MS)
+        if atual["mediana_ms"] > limite_ms:
+            regressoes.append((endpoint, "mediana_ms", anterior["mediana_ms"], atual["mediana_ms"]))
+        if atual["memoria_kb"] > anterior["memoria_kb"] * (1 + tolerancia):
+            regressoes.append((endpoint, "memoria_kb", anterior["memoria_kb"], atual["memoria_kb"]))
+    return regressoes
+
+
+def ler_base(caminho):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def salvar_base(caminho, resultados):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(resultados, arquivo, indent=2, sort_keys=True)
+        arquivo.write("\n")
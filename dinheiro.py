@@ -0,0 +1,65 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator, Integer
+
+CENTAVO = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+def dinheiro(valor):
+    """
+    Converte um valor (texto do formulário, int, float ou Decimal) para Decimal com
+    2 casas, arredondando o meio centavo para cima. O que não é número (inclusive
+    None e "") levanta ValueError, como float().
+    """
+    if isinstance(valor, float):
+        # repr dá o menor decimal que representa o float (0.1 e não 0.1000000000000000055...)
+        valor = repr(valor)
+    try:
+        resultado = Decimal(str(valor).strip()).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"valor em dinheiro inválido: {valor!r}")
+    if not resultado.is_finite():
+        raise ValueError(f"valor em dinheiro inválido: {valor!r}")
+    return resultado
+
+
+def valor_json(valor):
+    """
+    Valor pronto para JSON (API, exportação): Decimal vira float, que com 2 casas
+    é escrito com as mesmas 2 casas (150.5), e datas viram texto ISO 8601.
+    """
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+class Centavos(TypeDecorator):
+    """
+    Coluna de dinheiro: gravada como inteiro em centavos e lida como Decimal com
+    2 casas. Somas e subtrações no banco são exatas (inteiros), e o resultado de
+    SUM() sobre a coluna volta convertido para Decimal.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, valor, dialect):
+        if valor is None:
+            return None
+        return int(dinheiro(valor) * 100)
+
+    def process_result_value(self, valor, dialect):
+        if valor is None:
+            return None
+        return Decimal(int(valor)).scaleb(-2)
+
+    def coerce_compared_value(self, op, valor):
+        # literais somados, subtraídos ou comparados com a coluna (valor_pago + 1,
+        # valor > 0) também são reais, não centavos; nos demais operadores (valor * 2)
+        # o literal não é dinheiro e fica com o tipo padrão
+        if op in (operators.add, operators.sub) or operators.is_comparison(op):
+            return self
+        return self.impl_instance.coerce_compared_value(op, valor)
@@ -0,0 +1,185 @@
+from datetime import datetime, date
+from sqlalchemy import insert, bindparam
+from dinheiro import dinheiro, ZERO
+from agenda import incluir_na_agenda
+from models import (
+    db, Cliente, Emprestimo, Parcela, marcar_vencimentos,
+    valor_total_com_juros, quantidade_parcelas, valores_parcelas, datas_vencimento
+)
+
+FREQUENCIAS = ("diaria", "semanal", "mensal")
+
+# empréstimos gravados por rodada de INSERT; mantém a memória estável em lotes grandes
+TAMANHO_BLOCO = 1000
+
+
+class ErroLote(ValueError):
+    """Lote com especificações inválidas. `erros` traz (posição, mensagem) de cada uma."""
+
+    def __init__(self, erros):
+        self.erros = erros
+        super().__init__(f"{len(erros)} empréstimo(s) inválido(s) no lote")
+
+
+def _data(valor):
+    if not valor:
+        return datetime.utcnow().date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor), "%Y-%m-%d").date()
+
+
+def validar_especificacoes(especificacoes):
+    """
+    Converte e valida as especificações recebidas (dicts com cliente_id, valor,
+    porcentagem, frequencia e, opcionalmente, data_emprestimo e qtd_parcelas).
+    Levanta ErroLote com todos os problemas encontrados.
+    """
+    # (posição no lote, especificação): as inválidas ficam de fora, e a posição
+    # de um cliente inexistente tem de ser a do item original
+    normalizadas = []
+    erros = []
+
+    for posicao, spec in enumerate(especificacoes):
+        if not isinstance(spec, dict):
+            erros.append((posicao, "item deve ser um objeto"))
+            continue
+        try:
+            frequencia = spec.get("frequencia")
+            if frequencia not in FREQUENCIAS:
+                raise ValueError(f"frequência inválida: {frequencia!r}")
+
+            valor = dinheiro(spec["valor"])
+            if valor <= 0:
+                raise ValueError("valor deve ser maior que zero")
+
+            qtd_parcelas = quantidade_parcelas(frequencia, spec.get("qtd_parcelas"))
+            if qtd_parcelas < 1:
+                raise ValueError("qtd_parcelas deve ser maior que zero")
+
+            normalizadas.append((posicao, {
+                "cliente_id": int(spec["cliente_id"]),
+                "valor": valor,
+                "porcentagem": float(spec.get("porcentagem") or 0),
+                "frequencia": frequencia,
+                "data_emprestimo": _data(spec.get("data_emprestimo")),
+                "qtd_parcelas": qtd_parcelas,
+            }))
+        except KeyError as e:
+            erros.append((posicao, f"campo obrigatório ausente: {e.args[0]}"))
+        except (TypeError, ValueError) as e:
+            erros.append((posicao, str(e)))
+
+    clientes_ids = {spec["cliente_id"] for _, spec in normalizadas}
+    if clientes_ids:
+        existentes = {
+            cliente_id for (cliente_id,) in
+            db.session.query(Cliente.id).filter(Cliente.id.in_(clientes_ids))
+        }
+        for posicao, spec in normalizadas:
+            if spec["cliente_id"] not in existentes:
+                erros.append((posicao, f"cliente {spec['cliente_id']} não encontrado"))
+
+    if erros:
+        raise ErroLote(sorted(erros))
+
+    return [spec for _, spec in normalizadas]
+
+
+def _linhas_parcelas(spec, valor_total):
+    qtd = spec["qtd_parcelas"]
+    valor_parcela, ultima_parcela = valores_parcelas(valor_total, qtd)
+    datas = datas_vencimento(spec["frequencia"], spec["data_emprestimo"], qtd)
+    hoje = date.today()
+
+    return [
+        {
+            "numero_parcela": f"{i+1}/{qtd}",
+            "valor": valor_parcela if i < qtd - 1 else ultima_parcela,
+            "valor_pago": ZERO,
+            "data_vencimento": data_vencimento,
+            "status": "atrasado" if data_vencimento < hoje else "pendente",
+        }
+        for i, data_vencimento in enumerate(datas)
+    ]
+
+
+def criar_emprestimos_em_lote(especificacoes):
+    """
+    Cria vários empréstimos e suas parcelas com INSERTs em lote, dentro da
+    transação corrente (o commit fica por conta de quem chama).
+
+    Os cronogramas são calculados sem instanciar objetos do ORM, e as datas de
+    vencimento vêm do cache de `datas_vencimento`. Retorna (ids dos empréstimos,
+    quantidade de parcelas criadas).
+    """
+    especificacoes = validar_especificacoes(especificacoes)
+
+    ids = []
+    total_parcelas = 0
+    pendente_por_cliente = {}
+    vencimentos = set()
+
+    for inicio in range(0, len(especificacoes), TAMANHO_BLOCO):
+        bloco = especificacoes[inicio:inicio + TAMANHO_BLOCO]
+
+        linhas_emprestimos = []
+        parcelas_por_emprestimo = []
+        for spec in bloco:
+            valor_total = valor_total_com_juros(spec["valor"], spec["porcentagem"])
+            parcelas = _linhas_parcelas(spec, valor_total)
+            # o pendente do empréstimo é a soma das parcelas, como em recalcular_totais
+            total_pendente = sum((p["valor"] for p in parcelas), ZERO)
+
+            linhas_emprestimos.append({
+                "cliente_id": spec["cliente_id"],
+                "valor": spec["valor"],
+                "porcentagem": spec["porcentagem"],
+                "frequencia": spec["frequencia"],
+                "data_emprestimo": spec["data_emprestimo"],
+                "valor_total": valor_total,
+                "saldo": valor_total,
+                "status": "em_aberto",
+                "total_pago": ZERO,
+                "total_pendente": total_pendente,
+            })
+            parcelas_por_emprestimo.append(parcelas)
+            pendente_por_cliente[spec["cliente_id"]] = pendente_por_cliente.get(spec["cliente_id"], ZERO) + total_pendente
+
+        ids_bloco = db.session.scalars(
+            insert(Emprestimo).returning(Emprestimo.id, sort_by_parameter_order=True),
+            linhas_emprestimos
+        ).all()
+
+        linhas_parcelas = []
+        for emprestimo_id, parcelas in zip(ids_bloco, parcelas_por_emprestimo):
+            for parcela in parcelas:
+                parcela["emprestimo_id"] = emprestimo_id
+                vencimentos.add(parcela["data_vencimento"])
+            linhas_parcelas.extend(parcelas)
+
+        db.session.execute(insert(Parcela.__table__), linhas_parcelas)
+
+        incluir_na_agenda(ids_bloco)
+
+        ids.extend(ids_bloco)
+        total_parcelas += len(linhas_parcelas)
+
+    # soma o novo pendente nos totais dos clientes
+    if pendente_por_cliente:
+        tabela = Cliente.__table__
+        db.session.execute(
+            tabela.update()
+            .where(tabela.c.id == bindparam("b_id"))
+            # soma em centavos (inteiros): exata no banco, sem arredondar
+            .values(
+                total_pendente=tabela.c.total_pendente + bindparam("b_pendente"),
+                # muda a versão para que um pagamento concorrente que leu os totais antigos refaça a conta
+                versao=tabela.c.versao + 1,
+            ),
+            [{"b_id": cliente_id, "b_pendente": valor} for cliente_id, valor in pendente_por_cliente.items()]
+        )
+
+    # os INSERTs em massa não passam pelo flush do ORM
+    marcar_vencimentos(vencimentos)
+    return ids, total_parcelas
@@ -0,0 +1,227 @@
+import os
+import time
+import tempfile
+import threading
+import multiprocessing
+from datetime import date, datetime
+from flask import Flask
+from sqlalchemy import create_engine, insert, update, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from banco import opcoes_do_engine, preparar_engine, configurar_banco, com_retentativas
+from models import db, Cliente, Emprestimo, Parcela, Pagamento
+from dinheiro import dinheiro
+from agregacoes import ZERO_SQL
+
+NOME_CLIENTE = "estresse-escrita"
+
+
+def _engine(url, wal):
+    engine = create_engine(url, **opcoes_do_engine(url))
+    preparar_engine(engine, wal=wal)
+    return engine
+
+
+def _preparar_dados(engine, parcelas, valor=1000.0):
+    """Um cliente e um empréstimo de teste com `parcelas` parcelas de `valor` cada."""
+    db.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        cliente_id = conexao.execute(
+            insert(Cliente).values(nome=NOME_CLIENTE, endereco="-", atualizado_em=datetime.utcnow())
+        ).inserted_primary_key[0]
+        emprestimo_id = conexao.execute(
+            insert(Emprestimo).values(
+                cliente_id=cliente_id, valor=valor * parcelas, porcentagem=0.0, frequencia="diaria",
+                data_emprestimo=date.today(), valor_total=valor * parcelas, saldo=valor * parcelas,
+                status="em_aberto", total_pendente=valor * parcelas, atualizado_em=datetime.utcnow(),
+            )
+        ).inserted_primary_key[0]
+        conexao.execute(insert(Parcela), [
+            {
+                "emprestimo_id": emprestimo_id, "valor": valor, "valor_pago": 0.0, "numero_parcela": str(i + 1),
+                "data_vencimento": date.today(), "status": "pendente", "atualizado_em": datetime.utcnow(),
+            }
+            for i in range(parcelas)
+        ])
+        # o total pendente do cliente também entra, como faria o cadastro do empréstimo
+        conexao.execute(update(Cliente).where(Cliente.id == cliente_id).values(total_pendente=valor * parcelas))
+        ids = conexao.scalars(
+            select(Parcela.id).where(Parcela.emprestimo_id == emprestimo_id).order_by(Parcela.id)
+        ).all()
+    return cliente_id, emprestimo_id, ids
+
+
+def _trabalhador(url, wal, cliente_id, emprestimo_id, parcelas_ids, largada, fila):
+    """
+    Cada transação repete as escritas de um recebimento: parcela, pagamento e os
+    totais do empréstimo e do cliente, com um commit por pagamento.
+    """
+    engine = _engine(url, wal)
+    feitas = falhas = 0
+    largada.wait()
+    for parcela_id in parcelas_ids:
+        agora = datetime.utcnow()
+        try:
+            with engine.begin() as conexao:
+                conexao.execute(
+                    update(Parcela).where(Parcela.id == parcela_id)
+                    .values(valor_pago=Parcela.valor_pago + 1, status="parcialmente_paga", atualizado_em=agora,
+                            versao=Parcela.versao + 1)
+                )
+                conexao.execute(insert(Pagamento).values(
+                    emprestimo_id=emprestimo_id, parcela_id=parcela_id, valor=1.0,
+                    data_pagamento=agora, atualizado_em=agora,
+                ))
+                conexao.execute(
+                    update(Emprestimo).where(Emprestimo.id == emprestimo_id)
+                    .values(total_pago=Emprestimo.total_pago + 1, total_pendente=Emprestimo.total_pendente - 1,
+                            atualizado_em=agora, versao=Emprestimo.versao + 1)
+                )
+                conexao.execute(
+                    update(Cliente).where(Cliente.id == cliente_id)
+                    .values(total_pago=Cliente.total_pago + 1, atualizado_em=agora, versao=Cliente.versao + 1)
+                )
+            feitas += 1
+        except OperationalError:
+            # no SQLite: "database is locked" depois de esgotar o busy_timeout
+            falhas += 1
+    engine.dispose()
+    fila.put((feitas, falhas))
+
+
+def _remover_pasta(pasta):
+    for nome in os.listdir(pasta):
+        os.remove(os.path.join(pasta, nome))
+    os.rmdir(pasta)
+
+
+def medir_escrita(trabalhadores=(1, 4, 8), pagamentos=200, url=None, wal=True):
+    """
+    Mede quantos recebimentos por segundo o banco aguenta com 1, 4, 8... processos
+    escrevendo ao mesmo tempo, cada um em parcelas próprias (como cobradores
+    diferentes). Sem `url`, usa um SQLite temporário; com `url`, grava os dados de
+    teste nesse banco, então aponte para um banco vazio.
+
+    Retorna uma tupla (trabalhadores, transações, segundos, transações/s, falhas) por rodada.
+    """
+    pasta = None
+    if url is None:
+        pasta = tempfile.mkdtemp(prefix="estresse-")
+        url = "sqlite:///" + os.path.join(pasta, "estresse.db")
+
+    engine = _engine(url, wal)
+    cliente_id, emprestimo_id, parcelas_ids = _preparar_dados(engine, max(trabalhadores) * pagamentos)
+    engine.dispose()
+
+    # spawn: cada processo abre o próprio engine, sem herdar conexões do pai
+    contexto = multiprocessing.get_context("spawn")
+    rodadas = []
+    for quantidade in trabalhadores:
+        # os processos e o pai passam juntos pela largada: o tempo não inclui a subida
+        largada = contexto.Barrier(quantidade + 1)
+        fila = contexto.Queue()
+        processos = [
+            contexto.Process(target=_trabalhador, args=(
+                url, wal, cliente_id, emprestimo_id,
+                parcelas_ids[i * pagamentos:(i + 1) * pagamentos], largada, fila,
+            ))
+            for i in range(quantidade)
+        ]
+        for processo in processos:
+            processo.start()
+
+        largada.wait()
+        inicio = time.perf_counter()
+        resultados = [fila.get() for _ in processos]
+        segundos = time.perf_counter() - inicio
+        for processo in processos:
+            processo.join()
+
+        feitas = sum(r[0] for r in resultados)
+        falhas = sum(r[1] for r in resultados)
+        rodadas.append((quantidade, feitas, segundos, feitas / segundos, falhas))
+
+    if pasta:
+        _remover_pasta(pasta)
+    return rodadas
+
+
+def martelar_parcela(threads=8, pagamentos=25, url=None):
+    """
+    Várias threads recebem R$ 1,00 na mesma parcela ao mesmo tempo, cada recebimento
+    na própria transação e pelo mesmo caminho de /receber_pagamento (alocar_pagamento
+    dentro de com_retentativas). A parcela vale exatamente threads * pagamentos.
+
+    No fim confere se nenhum recebimento se perdeu: valor pago e status da parcela,
+    soma dos pagamentos e totais do empréstimo e do cliente têm de bater com os
+    recebimentos confirmados. Retorna (contagens, divergências); sem divergências, passou.
+    """
+    pasta = None
+    if url is None:
+        pasta = tempfile.mkdtemp(prefix="martelo-")
+        url = "sqlite:///" + os.path.join(pasta, "martelo.db")
+
+    app = Flask("estresse")
+    configurar_banco(app, url)
+    with app.app_context():
+        cliente_id, emprestimo_id, (parcela_id,) = _preparar_dados(db.engine, 1, valor=float(threads * pagamentos))
+
+    contagens = {"confirmados": 0, "retentativas": 0, "desistencias": 0}
+    trava = threading.Lock()
+    largada = threading.Barrier(threads)
+
+    def trabalhar():
+        confirmados = retentativas = desistencias = 0
+        with app.app_context():
+            largada.wait()
+            for _ in range(pagamentos):
+                chamadas = []
+
+                def receber():
+                    chamadas.append(1)
+                    parcela = db.session.get(Parcela, parcela_id)
+                    return parcela.emprestimo.alocar_pagamento(1.0, primeira=parcela)
+
+                try:
+                    pagamentos_feitos, _ = com_retentativas(receber)
+                    confirmados += len(pagamentos_feitos)
+                except (StaleDataError, OperationalError):
+                    db.session.rollback()
+                    desistencias += 1
+                retentativas += len(chamadas) - 1
+        with trava:
+            contagens["confirmados"] += confirmados
+            contagens["retentativas"] += retentativas
+            contagens["desistencias"] += desistencias
+
+    trabalhadores = [threading.Thread(target=trabalhar) for _ in range(threads)]
+    inicio = time.perf_counter()
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    contagens["segundos"] = time.perf_counter() - inicio
+
+    esperado = dinheiro(contagens["confirmados"])
+    with app.app_context():
+        parcela = db.session.get(Parcela, parcela_id)
+        emprestimo = db.session.get(Emprestimo, emprestimo_id)
+        cliente = db.session.get(Cliente, cliente_id)
+        soma_pagamentos = db.session.scalar(
+            select(func.coalesce(func.sum(Pagamento.valor), ZERO_SQL)).where(Pagamento.parcela_id == parcela_id)
+        )
+        conferencias = [
+            ("parcela.valor_pago", parcela.valor_pago, esperado),
+            ("parcela.status", parcela.status, "pago" if esperado == parcela.valor else "parcialmente_paga"),
+            ("soma dos pagamentos", soma_pagamentos, esperado),
+            ("emprestimo.total_pago", emprestimo.total_pago, esperado),
+            ("emprestimo.total_pendente", emprestimo.total_pendente, parcela.valor - esperado),
+            ("cliente.total_pago", cliente.total_pago, esperado),
+            ("cliente.total_pendente", cliente.total_pendente, parcela.valor - esperado),
+        ]
+        db.engine.dispose()
+
+    if pasta:
+        _remover_pasta(pasta)
+    divergencias = [(nome, obtido, esperado) for nome, obtido, esperado in conferencias if obtido != esperado]
+    return contagens, divergencias
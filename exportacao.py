@@ -0,0 +1,133 @@
+import io
+import csv
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from dinheiro import valor_json
+from models import db, Cliente, Usuario, Regiao, Emprestimo, Parcela, Pagamento
+
+# linhas lidas do banco por vez e escritas por pedaço da resposta
+TAMANHO_BLOCO = 1000
+
+FORMATOS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def _colunas(entidade):
+    if entidade == "clientes":
+        return [
+            Cliente.id, Cliente.nome, Cliente.telefone, Cliente.endereco,
+            Cliente.regiao_id, Regiao.nome.label("regiao"),
+            Cliente.cobrador_id, Usuario.usuario.label("cobrador"),
+            Cliente.latitude, Cliente.longitude,
+            Cliente.total_pago, Cliente.total_pendente,
+        ]
+    if entidade == "emprestimos":
+        return [
+            Emprestimo.id, Emprestimo.cliente_id, Cliente.nome.label("cliente"),
+            Emprestimo.valor, Emprestimo.porcentagem, Emprestimo.frequencia, Emprestimo.data_emprestimo,
+            Emprestimo.valor_total, Emprestimo.saldo, Emprestimo.total_pago, Emprestimo.total_pendente,
+            Emprestimo.status,
+        ]
+    if entidade == "parcelas":
+        return [
+            Parcela.id, Parcela.emprestimo_id, Emprestimo.cliente_id, Cliente.nome.label("cliente"),
+            Parcela.numero_parcela, Parcela.valor, Parcela.valor_pago, Parcela.data_vencimento, Parcela.status,
+        ]
+    return [
+        Pagamento.id, Pagamento.emprestimo_id, Pagamento.parcela_id, Emprestimo.cliente_id,
+        Cliente.nome.label("cliente"), Pagamento.valor, Pagamento.data_pagamento,
+    ]
+
+
+# coluna usada pelo filtro de período de cada entidade (clientes não têm data)
+_COLUNA_DATA = {
+    "emprestimos": Emprestimo.data_emprestimo,
+    "parcelas": Parcela.data_vencimento,
+    "pagamentos": Pagamento.data_pagamento,
+}
+
+ENTIDADES = ("clientes", "emprestimos", "parcelas", "pagamentos")
+
+
+def consulta_exportacao(entidade, regiao_id=None, cobrador_id=None, inicio=None, fim=None):
+    stmt = select(*_colunas(entidade))
+
+    if entidade == "clientes":
+        stmt = (
+            stmt.select_from(Cliente)
+            .outerjoin(Regiao, Cliente.regiao_id == Regiao.id)
+            .outerjoin(Usuario, Cliente.cobrador_id == Usuario.id)
+        )
+        ordem = Cliente.id
+    elif entidade == "emprestimos":
+        stmt = stmt.select_from(Emprestimo).join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        ordem = Emprestimo.id
+    elif entidade == "parcelas":
+        stmt = (
+            stmt.select_from(Parcela)
+            .join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+            .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        )
+        ordem = Parcela.id
+    else:
+        stmt = (
+            stmt.select_from(Pagamento)
+            .join(Emprestimo, Pagamento.emprestimo_id == Emprestimo.id)
+            .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        )
+        ordem = Pagamento.id
+
+    if regiao_id:
+        stmt = stmt.where(Cliente.regiao_id == regiao_id)
+    if cobrador_id:
+        stmt = stmt.where(Cliente.cobrador_id == cobrador_id)
+
+    coluna_data = _COLUNA_DATA.get(entidade)
+    if coluna_data is not None:
+        if entidade == "pagamentos":
+            # data_pagamento tem hora: o fim do período vai até o final do dia
+            inicio = datetime.combine(inicio, datetime.min.time()) if inicio else None
+            fim = datetime.combine(fim + timedelta(days=1), datetime.min.time()) if fim else None
+            if fim:
+                stmt = stmt.where(coluna_data < fim)
+        elif fim:
+            stmt = stmt.where(coluna_data <= fim)
+        if inicio:
+            stmt = stmt.where(coluna_data >= inicio)
+
+    return stmt.order_by(ordem)
+
+
+def exportar(entidade, formato="csv", **filtros):
+    """
+    Gera o arquivo exportado em pedaços de texto, lendo o banco em blocos
+    (yield_per), para que a memória fique estável e o envio comece logo.
+    """
+    stmt = consulta_exportacao(entidade, **filtros)
+    resultado = db.session.execute(stmt.execution_options(yield_per=TAMANHO_BLOCO))
+    campos = list(resultado.keys())
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer) if formato == "csv" else None
+    if escritor:
+        escritor.writerow(campos)
+
+    for bloco in resultado.partitions():
+        if escritor:
+            escritor.writerows(bloco)
+        else:
+            for linha in bloco:
+                buffer.write(json.dumps(
+                    {campo: valor_json(valor) for campo, valor in zip(campos, linha)}, ensure_ascii=False
+                ))
+                buffer.write("\n")
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
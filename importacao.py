@@ -0,0 +1,219 @@
+import csv
+from itertools import chain
+from sqlalchemy import insert
+from models import db, Cliente, Usuario, Regiao, regiao_cobrador
+from referencias import invalidar_referencias
+from rotas import ler_coordenadas
+
+# linhas gravadas por INSERT/commit
+TAMANHO_BLOCO = 1000
+
+# quantos erros guardar no resumo (a contagem continua completa)
+MAX_ERROS_RESUMO = 200
+
+
+class ErroLinha(ValueError):
+    pass
+
+
+def _chave(nome):
+    return (nome or "").strip().lower()
+
+
+def _ler_csv(arquivo):
+    """
+    Lê o CSV linha a linha, sem carregar o arquivo na memória.
+    Aceita separador "," ou ";" (detectado pelo cabeçalho). Gera (número da linha, dict).
+    """
+    cabecalho = arquivo.readline()
+    separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    leitor = csv.DictReader(chain([cabecalho], arquivo), delimiter=separador)
+    leitor.fieldnames = [_chave(campo) for campo in leitor.fieldnames or []]
+
+    for linha in leitor:
+        yield leitor.line_num, {campo: (valor or "").strip() for campo, valor in linha.items() if campo}
+
+
+def _texto(linha, campo, tamanho, obrigatorio=False):
+    valor = linha.get(campo, "")
+    if obrigatorio and not valor:
+        raise ErroLinha(f"campo obrigatório vazio: {campo}")
+    if len(valor) > tamanho:
+        raise ErroLinha(f"{campo} com mais de {tamanho} caracteres")
+    return valor or None
+
+
+def _nomes(valor):
+    return [nome.strip() for nome in valor.replace("|", ";").split(";") if nome.strip()] if valor else []
+
+
+class Importador:
+    """
+    Importa regiões, cobradores ou clientes de um CSV em blocos.
+
+    Os nomes de região e de cobrador são resolvidos por um cache montado uma vez
+    no início (e alimentado com o que for sendo importado), então nenhuma linha
+    faz consulta ao banco. Cada bloco de TAMANHO_BLOCO linhas vira um INSERT e um commit.
+    """
+
+    def __init__(self, ao_erro=None, tamanho_bloco=TAMANHO_BLOCO):
+        self.ao_erro = ao_erro
+        self.tamanho_bloco = tamanho_bloco
+        self.importados = 0
+        self.qtd_erros = 0
+        self.erros = []
+
+        self.regioes = {_chave(nome): regiao_id for regiao_id, nome in db.session.query(Regiao.id, Regiao.nome)}
+        self.usuarios = {
+            _chave(usuario): (usuario_id, tipo)
+            for usuario_id, usuario, tipo in db.session.query(Usuario.id, Usuario.usuario, Usuario.tipo)
+        }
+
+    def _erro(self, numero_linha, mensagem):
+        self.qtd_erros += 1
+        if len(self.erros) < MAX_ERROS_RESUMO:
+            self.erros.append((numero_linha, mensagem))
+        if self.ao_erro:
+            self.ao_erro(numero_linha, mensagem)
+
+    def _regiao_id(self, nome):
+        regiao_id = self.regioes.get(_chave(nome))
+        if regiao_id is None:
+            raise ErroLinha(f"região não encontrada: {nome}")
+        return regiao_id
+
+    def _cobrador_id(self, nome):
+        usuario = self.usuarios.get(_chave(nome))
+        if usuario is None or usuario[1] != "cobrador":
+            raise ErroLinha(f"cobrador não encontrado: {nome}")
+        return usuario[0]
+
+    def resumo(self):
+        return {"importados": self.importados, "erros": self.qtd_erros, "amostra_erros": self.erros}
+
+    def _processar(self, arquivo, converter, gravar):
+        bloco = []
+        for numero_linha, linha in _ler_csv(arquivo):
+            try:
+                bloco.append(converter(linha))
+            except ErroLinha as e:
+                self._erro(numero_linha, str(e))
+                continue
+
+            if len(bloco) >= self.tamanho_bloco:
+                gravar(bloco)
+                bloco = []
+
+        if bloco:
+            gravar(bloco)
+        return self.resumo()
+
+    def _gravar(self, tabela, linhas):
+        db.session.execute(insert(tabela), linhas)
+        db.session.commit()
+        self.importados += len(linhas)
+
+    # --- Clientes: nome, telefone, endereco, regiao, cobrador, latitude e longitude (opcionais) ---
+    def importar_clientes(self, arquivo):
+        def converter(linha):
+            cobrador = linha.get("cobrador")
+            try:
+                latitude, longitude = ler_coordenadas(linha.get("latitude"), linha.get("longitude"))
+            except ValueError as e:
+                raise ErroLinha(str(e))
+            return {
+                "nome": _texto(linha, "nome", 100, obrigatorio=True),
+                "telefone": _texto(linha, "telefone", 30),
+                "endereco": _texto(linha, "endereco", 120, obrigatorio=True),
+                "regiao_id": self._regiao_id(_texto(linha, "regiao", 100, obrigatorio=True)),
+                "cobrador_id": self._cobrador_id(cobrador) if cobrador else None,
+                "latitude": latitude,
+                "longitude": longitude,
+            }
+
+        return self._processar(arquivo, converter, lambda bloco: self._gravar(Cliente.__table__, bloco))
+
+    # --- Regiões: nome, cobradores (separados por ";") ---
+    def importar_regioes(self, arquivo):
+        novas = set()
+
+        def converter(linha):
+            nome = _texto(linha, "nome", 100, obrigatorio=True)
+            if _chave(nome) in self.regioes or _chave(nome) in novas:
+                raise ErroLinha(f"região já existe: {nome}")
+            cobradores = [self._cobrador_id(c) for c in _nomes(linha.get("cobradores"))]
+            novas.add(_chave(nome))
+            return {"nome": nome}, cobradores
+
+        def gravar(bloco):
+            ids = db.session.scalars(
+                insert(Regiao).returning(Regiao.id, sort_by_parameter_order=True),
+                [regiao for regiao, _ in bloco]
+            ).all()
+            vinculos = [
+                {"regiao_id": regiao_id, "cobrador_id": cobrador_id}
+                for regiao_id, (_, cobradores) in zip(ids, bloco)
+                for cobrador_id in set(cobradores)
+            ]
+            if vinculos:
+                db.session.execute(insert(regiao_cobrador), vinculos)
+            invalidar_referencias()
+            db.session.commit()
+
+            for regiao_id, (regiao, _) in zip(ids, bloco):
+                self.regioes[_chave(regiao["nome"])] = regiao_id
+            novas.clear()
+            self.importados += len(bloco)
+
+        return self._processar(arquivo, converter, gravar)
+
+    # --- Cobradores: usuario, senha, regioes (separadas por ";") ---
+    def importar_cobradores(self, arquivo):
+        novos = set()
+
+        def converter(linha):
+            usuario = _texto(linha, "usuario", 50, obrigatorio=True)
+            if _chave(usuario) in self.usuarios or _chave(usuario) in novos:
+                raise ErroLinha(f"usuário já existe: {usuario}")
+            senha = _texto(linha, "senha", 50, obrigatorio=True)
+            regioes = [self._regiao_id(r) for r in _nomes(linha.get("regioes"))]
+            novos.add(_chave(usuario))
+            return {"usuario": usuario, "senha": senha, "tipo": "cobrador"}, regioes
+
+        def gravar(bloco):
+            ids = db.session.scalars(
+                insert(Usuario).returning(Usuario.id, sort_by_parameter_order=True),
+                [usuario for usuario, _ in bloco]
+            ).all()
+            vinculos = [
+                {"regiao_id": regiao_id, "cobrador_id": cobrador_id}
+                for cobrador_id, (_, regioes) in zip(ids, bloco)
+                for regiao_id in set(regioes)
+            ]
+            if vinculos:
+                db.session.execute(insert(regiao_cobrador), vinculos)
+            invalidar_referencias()
+            db.session.commit()
+
+            for cobrador_id, (usuario, _) in zip(ids, bloco):
+                self.usuarios[_chave(usuario["usuario"])] = (cobrador_id, "cobrador")
+            novos.clear()
+            self.importados += len(bloco)
+
+        return self._processar(arquivo, converter, gravar)
+
+
+TIPOS_IMPORTACAO = {
+    "clientes": Importador.importar_clientes,
+    "regioes": Importador.importar_regioes,
+    "cobradores": Importador.importar_cobradores,
+}
+
+
+def importar_csv(tipo, arquivo, ao_erro=None):
+    """
+    Importa um CSV já aberto em modo texto (de preferência com encoding "utf-8-sig").
+    `tipo` é clientes, regioes ou cobradores.
+    """
+    importador = Importador(ao_erro=ao_erro)
+    return TIPOS_IMPORTACAO[tipo](importador, arquivo)
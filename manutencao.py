@@ -0,0 +1,69 @@
+from datetime import date, datetime
+from sqlalchemy import select, update, case, func, or_
+from models import db, Emprestimo, Parcela, AgendaParcela, marcar_vencimentos
+from agregacoes import ZERO_SQL
+
+
+def status_correto_da_parcela(hoje):
+    """A regra de Parcela.atualizar_status em SQL. Parcela paga continua paga."""
+    valor_pago = func.coalesce(Parcela.valor_pago, 0)
+    return case(
+        (or_(Parcela.status == "pago", valor_pago >= Parcela.valor), "pago"),
+        (Parcela.data_vencimento < hoje, "atrasado"),
+        (valor_pago > 0, "parcialmente_paga"),
+        else_="pendente",
+    )
+
+
+def atualizar_status(hoje=None):
+    """
+    Manutenção noturna, em poucos UPDATEs em massa dentro da transação corrente
+    (o commit fica por conta de quem chama):
+
+    1. parcelas vencidas e não pagas passam a "atrasado" e qualquer status fora da
+       regra de Parcela.atualizar_status é corrigido;
+    2. a agenda já montada recebe o status novo das parcelas;
+    3. saldo e status dos empréstimos são recalculados a partir de total_pago
+       (o que também troca o antigo "em aberto" por "em_aberto").
+
+    Só as linhas que mudam são gravadas, com a versão incrementada, para que um
+    pagamento concorrente refaça a conta. Retorna quantas linhas mudaram em cada passo.
+    """
+    hoje = hoje or date.today()
+    agora = datetime.utcnow()
+
+    status_parcela = status_correto_da_parcela(hoje)
+    parcela_divergente = or_(Parcela.status.is_(None), Parcela.status != status_parcela)
+    # o resumo da previsão de recebimentos depende do status das parcelas de cada dia
+    vencimentos = db.session.scalars(
+        select(Parcela.data_vencimento).where(parcela_divergente).distinct()
+    ).all()
+    parcelas = db.session.execute(
+        update(Parcela)
+        .where(parcela_divergente)
+        .values(status=status_parcela, versao=Parcela.versao + 1, atualizado_em=agora)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    marcar_vencimentos(vencimentos)
+
+    status_na_parcela = (
+        select(Parcela.status).where(Parcela.id == AgendaParcela.parcela_id).scalar_subquery()
+    )
+    agenda = db.session.execute(
+        update(AgendaParcela)
+        .where(AgendaParcela.status != status_na_parcela)
+        .values(status=status_na_parcela)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    restante = Emprestimo.valor_total - Emprestimo.total_pago
+    saldo = case((restante > 0, restante), else_=ZERO_SQL)
+    status_emprestimo = case((restante > 0, "em_aberto"), else_="quitado")
+    emprestimos = db.session.execute(
+        update(Emprestimo)
+        .where(or_(Emprestimo.saldo != saldo, Emprestimo.status != status_emprestimo))
+        .values(saldo=saldo, status=status_emprestimo, versao=Emprestimo.versao + 1, atualizado_em=agora)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    return {"parcelas": parcelas, "agenda": agenda, "emprestimos": emprestimos}
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import threading
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+# limites dos buckets (le) de cada histograma
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# tamanho máximo dos parâmetros mostrados no log de consultas lentas
+LIMITE_PARAMETROS = 500
+
+log_sql_lento = logging.getLogger("credpix.sql_lento")
+
+
+class Histograma:
+    """Histograma no formato do Prometheus, com um rótulo `endpoint`. Contado por processo."""
+
+    def __init__(self, nome, ajuda, buckets):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = buckets
+        self._series = {}
+        self._trava = threading.Lock()
+
+    def observar(self, endpoint, valor):
+        with self._trava:
+            serie = self._series.get(endpoint)
+            if serie is None:
+                # contagem por bucket, soma e total de observações
+                serie = self._series[endpoint] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def texto(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._trava:
+            series = sorted((endpoint, (list(c), s, n)) for endpoint, (c, s, n) in self._series.items())
+        for endpoint, (contagens, soma, total) in series:
+            for limite, contagem in zip(self.buckets, contagens):
+                linhas.append(f'{self.nome}_bucket{{endpoint="{endpoint}",le="{limite}"}} {contagem}')
+            linhas.append(f'{self.nome}_bucket{{endpoint="{endpoint}",le="+Inf"}} {total}')
+            linhas.append(f'{self.nome}_sum{{endpoint="{endpoint}"}} {soma}')
+            linhas.append(f'{self.nome}_count{{endpoint="{endpoint}"}} {total}')
+        return "\n".join(linhas)
+
+
+DURACAO = Histograma(
+    "credpix_requisicao_segundos", "Tempo total da requisição, por endpoint.", BUCKETS_SEGUNDOS)
+CONSULTAS = Histograma(
+    "credpix_sql_consultas", "Consultas SQL executadas por requisição, por endpoint.", BUCKETS_CONSULTAS)
+TEMPO_SQL = Histograma(
+    "credpix_sql_segundos", "Tempo somado das consultas SQL da requisição, por endpoint.", BUCKETS_SEGUNDOS)
+TEMPO_RENDER = Histograma(
+    "credpix_render_segundos", "Tempo de renderização dos templates da requisição, por endpoint.", BUCKETS_SEGUNDOS)
+HISTOGRAMAS = (DURACAO, CONSULTAS, TEMPO_SQL, TEMPO_RENDER)
+
+
+def texto_metricas():
+    """Todas as métricas no formato texto do Prometheus (text/plain; version=0.0.4)."""
+    return "\n".join(h.texto() for h in HISTOGRAMAS) + "\n"
+
+
+def _parametros(parametros, varias):
+    if varias:
+        texto = f"{len(parametros)} linhas, a primeira: {parametros[0]!r}" if parametros else "[]"
+    else:
+        texto = repr(parametros)
+    return texto if len(texto) <= LIMITE_PARAMETROS else texto[:LIMITE_PARAMETROS] + "..."
+
+
+def instrumentar_engine(engine, lenta_ms=None):
+    """
+    Conta as consultas e soma o tempo de SQL da requisição em andamento. Com
+    `lenta_ms`, toda consulta que passar desse tempo vai para o log
+    credpix.sql_lento com o comando e os parâmetros.
+    """
+    # o início fica no contexto da execução, que morre com ela: uma consulta que
+    # falha não chega ao after_cursor_execute e não deixa nada para trás na conexão
+    @event.listens_for(engine, "before_cursor_execute")
+    def _inicio(conexao, cursor, comando, parametros, contexto, varias):
+        if contexto is not None:
+            contexto.metricas_inicio = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _fim(conexao, cursor, comando, parametros, contexto, varias):
+        inicio = getattr(contexto, "metricas_inicio", None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+
+        if has_request_context() and "metricas_inicio" in g:
+            g.metricas_consultas += 1
+            g.metricas_sql += duracao
+
+        if lenta_ms is not None and duracao * 1000 >= lenta_ms:
+            log_sql_lento.warning(
+                "%.1f ms%s\n%s\nparâmetros: %s",
+                duracao * 1000,
+                f" em {request.endpoint}" if has_request_context() else "",
+                comando,
+                _parametros(parametros, varias),
+            )
+
+
+def _inicio_render(app, template, context, **extra):
+    if has_request_context() and "metricas_inicio" in g:
+        g.metricas_inicio_render = time.perf_counter()
+
+
+def _fim_render(app, template, context, **extra):
+    if has_request_context() and "metricas_inicio_render" in g:
+        g.metricas_render += time.perf_counter() - g.pop("metricas_inicio_render")
+
+
+def instalar_metricas(app, engine):
+    """
+    Liga os ganchos da requisição (tempo total e de renderização) e do engine
+    (quantidade e tempo das consultas). A variável SLOW_QUERY_MS liga o log de
+    consultas lentas.
+    """
+    lenta_ms = os.environ.get("SLOW_QUERY_MS")
+    instrumentar_engine(engine, float(lenta_ms) if lenta_ms else None)
+
+    @app.before_request
+    def _iniciar_medicao():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_consultas = 0
+        g.metricas_sql = 0.0
+        g.metricas_render = 0.0
+
+    @app.teardown_request
+    def _registrar_medicao(erro=None):
+        if "metricas_inicio" not in g:
+            return
+        # rotas inexistentes ficam juntas, para não criar uma série por URL
+        endpoint = request.endpoint or "sem_rota"
+        DURACAO.observar(endpoint, time.perf_counter() - g.pop("metricas_inicio"))
+        CONSULTAS.observar(endpoint, g.metricas_consultas)
+        TEMPO_SQL.observar(endpoint, g.metricas_sql)
+        TEMPO_RENDER.observar(endpoint, g.metricas_render)
+
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
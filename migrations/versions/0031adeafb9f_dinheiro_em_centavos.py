@@ -0,0 +1,54 @@
+"""dinheiro em centavos
+
+Revision ID: 0031adeafb9f
+Revises: 3be11a59df47
+Create Date: 2026-10-18 11:24:24.575427
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0031adeafb9f'
+down_revision = '3be11a59df47'
+branch_labels = None
+depends_on = None
+
+# colunas de dinheiro: REAL em reais -> INTEGER em centavos
+COLUNAS = {
+    'cliente': ['total_pago', 'total_pendente'],
+    'emprestimo': ['valor', 'valor_total', 'saldo', 'total_pago', 'total_pendente'],
+    'parcela': ['valor', 'valor_pago'],
+    'pagamento': ['valor'],
+    'agenda_parcela': ['valor', 'valor_pago'],
+}
+
+
+def upgrade():
+    for tabela, colunas in COLUNAS.items():
+        # converte os dados ainda na coluna antiga; ROUND corrige resíduos como 99.99999999
+        op.execute(
+            f"UPDATE {tabela} SET "
+            + ", ".join(f"{coluna} = ROUND({coluna} * 100)" for coluna in colunas)
+        )
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            for coluna in colunas:
+                batch_op.alter_column(coluna,
+                       existing_type=sa.FLOAT(),
+                       type_=sa.Integer(),
+                       postgresql_using=f"{coluna}::integer")
+
+
+def downgrade():
+    for tabela, colunas in COLUNAS.items():
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            for coluna in colunas:
+                batch_op.alter_column(coluna,
+                       existing_type=sa.Integer(),
+                       type_=sa.FLOAT(),
+                       postgresql_using=f"{coluna}::double precision")
+        op.execute(
+            f"UPDATE {tabela} SET "
+            + ", ".join(f"{coluna} = {coluna} / 100.0" for coluna in colunas)
+        )
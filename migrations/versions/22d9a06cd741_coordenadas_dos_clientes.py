@@ -0,0 +1,31 @@
+"""coordenadas dos clientes
+
+Revision ID: 22d9a06cd741
+Revises: 72489d2f0e8a
+Create Date: 2026-10-18 12:07:25.595151
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '22d9a06cd741'
+down_revision = '72489d2f0e8a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # colunas novas e anuláveis: no SQLite vira ALTER TABLE ... ADD COLUMN, sem
+    # recriar a tabela (o que apagaria os triggers da busca de clientes)
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    # sem batch: o batch recriaria a tabela no SQLite e apagaria os triggers da
+    # busca; ALTER TABLE ... DROP COLUMN existe no SQLite desde a 3.35
+    op.drop_column('cliente', 'longitude')
+    op.drop_column('cliente', 'latitude')
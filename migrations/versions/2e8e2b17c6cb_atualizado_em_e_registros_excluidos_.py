@@ -0,0 +1,75 @@
+"""atualizado_em e registros excluidos para sincronizacao
+
+Revision ID: 2e8e2b17c6cb
+Revises: c344427e6fad
+Create Date: 2026-10-18 11:10:51.928806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8e2b17c6cb'
+down_revision = 'c344427e6fad'
+branch_labels = None
+depends_on = None
+
+
+# o SQLite não aceita default não constante em ADD COLUMN: a coluna entra com
+# uma data fixa e logo em seguida recebe o horário da migração
+SEM_DATA = "1970-01-01 00:00:00"
+
+
+def upgrade():
+    op.create_table('registro_excluido',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tabela', sa.String(length=20), nullable=False),
+    sa.Column('registro_id', sa.Integer(), nullable=False),
+    sa.Column('excluido_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('registro_excluido', schema=None) as batch_op:
+        batch_op.create_index('ix_registro_excluido_excluido_em', ['excluido_em'], unique=False)
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(), server_default=SEM_DATA, nullable=False))
+        batch_op.create_index('ix_cliente_atualizado_em', ['atualizado_em'], unique=False)
+
+    with op.batch_alter_table('emprestimo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(), server_default=SEM_DATA, nullable=False))
+        batch_op.create_index('ix_emprestimo_atualizado_em', ['atualizado_em'], unique=False)
+
+    with op.batch_alter_table('pagamento', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(), server_default=SEM_DATA, nullable=False))
+        batch_op.create_index('ix_pagamento_atualizado_em', ['atualizado_em'], unique=False)
+
+    with op.batch_alter_table('parcela', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('atualizado_em', sa.DateTime(), server_default=SEM_DATA, nullable=False))
+        batch_op.create_index('ix_parcela_atualizado_em', ['atualizado_em'], unique=False)
+
+    for tabela in ("cliente", "emprestimo", "parcela", "pagamento"):
+        op.execute(f"UPDATE {tabela} SET atualizado_em = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    with op.batch_alter_table('parcela', schema=None) as batch_op:
+        batch_op.drop_index('ix_parcela_atualizado_em')
+        batch_op.drop_column('atualizado_em')
+
+    with op.batch_alter_table('pagamento', schema=None) as batch_op:
+        batch_op.drop_index('ix_pagamento_atualizado_em')
+        batch_op.drop_column('atualizado_em')
+
+    with op.batch_alter_table('emprestimo', schema=None) as batch_op:
+        batch_op.drop_index('ix_emprestimo_atualizado_em')
+        batch_op.drop_column('atualizado_em')
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_index('ix_cliente_atualizado_em')
+        batch_op.drop_column('atualizado_em')
+
+    with op.batch_alter_table('registro_excluido', schema=None) as batch_op:
+        batch_op.drop_index('ix_registro_excluido_excluido_em')
+
+    op.drop_table('registro_excluido')
@@ -0,0 +1,62 @@
+"""busca de clientes fts5
+
+Revision ID: 72489d2f0e8a
+Revises: a6709f097de9
+Create Date: 2026-10-18 11:57:00.195423
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '72489d2f0e8a'
+down_revision = 'a6709f097de9'
+branch_labels = None
+depends_on = None
+
+
+# cópia de busca.COMANDOS_INDICE de quando esta migração foi escrita
+COMANDOS = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cliente_busca USING fts5(
+        nome, telefone, endereco,
+        content='cliente', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_ai AFTER INSERT ON cliente BEGIN
+        INSERT INTO cliente_busca(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_ad AFTER DELETE ON cliente BEGIN
+        INSERT INTO cliente_busca(cliente_busca, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cliente_busca_au AFTER UPDATE OF nome, telefone, endereco ON cliente BEGIN
+        INSERT INTO cliente_busca(cliente_busca, rowid, nome, telefone, endereco)
+        VALUES ('delete', old.id, old.nome, old.telefone, old.endereco);
+        INSERT INTO cliente_busca(rowid, nome, telefone, endereco)
+        VALUES (new.id, new.nome, new.telefone, new.endereco);
+    END""",
+    # relevância: o nome pesa mais que o telefone, que pesa mais que o endereço
+    "INSERT INTO cliente_busca(cliente_busca, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    "INSERT INTO cliente_busca(cliente_busca) VALUES ('rebuild')",
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    # sem o módulo fts5 no SQLite a busca usa LIKE
+    if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+        return
+    for comando in COMANDOS:
+        op.execute(comando)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS cliente_busca_au")
+    op.execute("DROP TRIGGER IF EXISTS cliente_busca_ad")
+    op.execute("DROP TRIGGER IF EXISTS cliente_busca_ai")
+    op.execute("DROP TABLE IF EXISTS cliente_busca")
@@ -0,0 +1,57 @@
+"""totais acumulados em emprestimo e cliente
+
+Revision ID: 91cb62ce877f
+Revises: fc8230ff599d
+Create Date: 2026-10-18 11:20:41.512093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '91cb62ce877f'
+down_revision = 'fc8230ff599d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emprestimo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_pago', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('total_pendente', sa.Float(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_pago', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('total_pendente', sa.Float(), server_default='0', nullable=False))
+
+    # preenche os totais com os dados já existentes
+    op.execute("""
+        UPDATE emprestimo SET
+            total_pago = ROUND(COALESCE((
+                SELECT SUM(COALESCE(p.valor_pago, 0)) FROM parcela p WHERE p.emprestimo_id = emprestimo.id
+            ), 0), 2),
+            total_pendente = ROUND(COALESCE((
+                SELECT SUM(p.valor - COALESCE(p.valor_pago, 0)) FROM parcela p
+                WHERE p.emprestimo_id = emprestimo.id AND (p.status IS NULL OR p.status != 'pago')
+            ), 0), 2)
+    """)
+    op.execute("""
+        UPDATE emprestimo SET
+            saldo = CASE WHEN valor_total - total_pago > 0 THEN ROUND(valor_total - total_pago, 2) ELSE 0 END
+    """)
+    op.execute("""
+        UPDATE cliente SET
+            total_pago = ROUND(COALESCE((SELECT SUM(e.total_pago) FROM emprestimo e WHERE e.cliente_id = cliente.id), 0), 2),
+            total_pendente = ROUND(COALESCE((SELECT SUM(e.total_pendente) FROM emprestimo e WHERE e.cliente_id = cliente.id), 0), 2)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('cliente', schema=None) as batch_op:
+        batch_op.drop_column('total_pendente')
+        batch_op.drop_column('total_pago')
+
+    with op.batch_alter_table('emprestimo', schema=None) as batch_op:
+        batch_op.drop_column('total_pendente')
+        batch_op.drop_column('total_pago')
@@ -0,0 +1,53 @@
+"""status atrasado e em_aberto
+
+Revision ID: a6709f097de9
+Revises: 65b50099c25d
+Create Date: 2026-10-18 11:39:34.378610
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6709f097de9'
+down_revision = '65b50099c25d'
+branch_labels = None
+depends_on = None
+
+
+def _hoje():
+    return sa.bindparam('hoje', date.today(), type_=sa.Date)
+
+
+def _agora():
+    return sa.bindparam('agora', datetime.utcnow(), type_=sa.DateTime)
+
+
+def upgrade():
+    # o mesmo que a primeira execução de `flask atualizar-status`: as telas passam a
+    # mostrar o atraso pelo status e não devem esperar o job para isso. Como no job,
+    # o corte é date.today() (o CURRENT_DATE do SQLite é a data em UTC) e as linhas
+    # alteradas ganham versão e atualizado_em novos (concorrência e sincronização)
+    op.execute(sa.text(
+        "UPDATE parcela SET status = 'atrasado', versao = versao + 1, atualizado_em = :agora "
+        "WHERE status IN ('pendente', 'parcialmente_paga') AND data_vencimento < :hoje"
+    ).bindparams(_hoje(), _agora()))
+    op.execute(sa.text(
+        "UPDATE agenda_parcela SET status = 'atrasado' "
+        "WHERE status IN ('pendente', 'parcialmente_paga') AND data < :hoje"
+    ).bindparams(_hoje()))
+    op.execute(sa.text(
+        "UPDATE emprestimo SET status = 'em_aberto', versao = versao + 1, atualizado_em = :agora "
+        "WHERE status = 'em aberto'"
+    ).bindparams(_agora()))
+
+
+def downgrade():
+    # antes desta versão a parcela vencida continuava pendente ou parcialmente paga
+    op.execute(sa.text(
+        "UPDATE parcela SET status = CASE WHEN valor_pago > 0 THEN 'parcialmente_paga' ELSE 'pendente' END, "
+        "versao = versao + 1, atualizado_em = :agora "
+        "WHERE status = 'atrasado'"
+    ).bindparams(_agora()))
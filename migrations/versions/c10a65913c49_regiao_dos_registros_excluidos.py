@@ -0,0 +1,28 @@
+"""regiao dos registros excluidos
+
+Revision ID: c10a65913c49
+Revises: 22d9a06cd741
+Create Date: 2026-10-18 12:20:43.048656
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c10a65913c49'
+down_revision = '22d9a06cd741'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # os registros já existentes ficam sem região e continuam indo para todos os
+    # aparelhos até saírem do horizonte da sincronização
+    with op.batch_alter_table('registro_excluido', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('regiao_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('registro_excluido', schema=None) as batch_op:
+        batch_op.drop_column('regiao_id')
@@ -1,205 +1,593 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-
-db = SQLAlchemy()
-
-#
-#Tabela associativa (muitas-para-muitos) cobradores <-> regioes
-#
-regiao_cobrador = db.Table(
-    "regiao_cobrador",
-    db.Column("regiao_id", db.Integer, db.ForeignKey("regiao.id"), primary_key=True),
-    db.Column("cobrador_id", db.Integer, db.ForeignKey("usuario.id"), primary_key=True))
-
-# ==========================
-# Usuário (Admin ou Cobrador)
-# ==========================
-class Usuario(db.Model):
-    __tablename__ = "usuario"
-
-    id = db.Column(db.Integer, primary_key=True)
-    usuario = db.Column(db.String(50), unique=True, nullable=False)
-    senha = db.Column(db.String(50), nullable=False)
-    tipo = db.Column(db.String(20), nullable=False)  # "admin" ou "cobrador"
-
-    clientes = db.relationship("Cliente", back_populates="cobrador", lazy=True)
-
-    regiao_id = db.Column(db.Integer, db.ForeignKey("regiao.id"), nullable=True)
-
-    regioes = db.relationship("Regiao", secondary="regiao_cobrador", back_populates="cobradores")
-
-    def __repr__(self):
-        return f"<Usuario: {self.usuario} ({self.tipo})>"
-
-
-# ==========================
-# Região
-# ==========================
-class Regiao(db.Model):
-    __tablename__ = "regiao"
-
-    id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False, unique=True)
-
-    cobradores = db.relationship("Usuario", secondary="regiao_cobrador", back_populates="regioes")
-    clientes = db.relationship("Cliente", back_populates="regiao", cascade="all, delete-orphan")
-
-    def __repr__(self):
-        return f"<Regiao {self.nome}>"
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nome": self.nome,
-            "cobradores": [{"id": c.id, "usuario": c.usuario} for c in self.cobradores]
-    }
-
-
-# ==========================
-# Cliente
-# ==========================
-class Cliente(db.Model):
-    __tablename__ = "cliente"
-
-    id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), nullable=False)
-    telefone = db.Column(db.String(30), nullable=True)
-    endereco = db.Column(db.String(120), nullable=False)
-
-    cobrador_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
-
-    regiao_id = db.Column(db.Integer, db.ForeignKey("regiao.id"), nullable=True)
-    regiao = db.relationship("Regiao", back_populates="clientes", lazy=True)
-
-    cobrador = db.relationship("Usuario", back_populates="clientes")
-
-    emprestimos = db.relationship(
-        "Emprestimo",
-        back_populates="cliente",
-        cascade="all, delete-orphan",
-        lazy=True
-    )
-
-    def __repr__(self):
-        return f"<Cliente {self.nome}>"
-
-# ==========================
-# Empréstimo
-# ==========================
-class Emprestimo(db.Model):
-    __tablename__ = "emprestimo"
-
-    id = db.Column(db.Integer, primary_key=True)
-    cliente_id = db.Column(db.Integer, db.ForeignKey("cliente.id"), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
-    porcentagem = db.Column(db.Float, nullable=False, default=0.0)
-    frequencia = db.Column(db.String(20), nullable=False)
-    data_emprestimo = db.Column(db.Date, nullable=False, default=datetime.utcnow)
-    valor_total = db.Column(db.Float, nullable=False)
-    saldo = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), nullable=False, default="em_aberto")
-
-    cliente = db.relationship("Cliente", back_populates="emprestimos")
-    parcelas = db.relationship("Parcela", backref="emprestimo", cascade="all, delete-orphan")
-    pagamentos = db.relationship("Pagamento", backref="emprestimo", cascade="all, delete-orphan")
-
-    def __init__(self, cliente_id, valor, porcentagem, frequencia, data_emprestimo=None):
-        self.cliente_id = cliente_id
-        self.valor = float(valor)
-        self.porcentagem = float(porcentagem)
-        self.frequencia = frequencia
-        self.data_emprestimo = data_emprestimo or datetime.utcnow().date()
-        self.valor_total = round(self.valor * (1 + self.porcentagem / 100), 2)
-        self.saldo = self.valor_total
-        self.status = "em_aberto"
-
-    def gerar_parcelas(self, qtd_parcelas=None):
-        total_com_juros = self.valor_total
-
-        if self.frequencia == "diaria":
-            intervalo = timedelta(days=1)
-            qtd_parcelas = int(qtd_parcelas) if qtd_parcelas else 20
-        elif self.frequencia == "semanal":
-            intervalo = timedelta(weeks=1)
-            qtd_parcelas = 4
-        else:
-            intervalo = timedelta(days=30)
-            qtd_parcelas = 1
-
-        # valor base arredondado
-        valor_parcela = round(total_com_juros / qtd_parcelas, 2)
-        # ajuste final para que a soma das parcelas sejam igual ao total
-        ultima_parcela = valor_parcela + round(total_com_juros - (valor_parcela * qtd_parcelas), 2)
-
-        parcelas = []
-        data_vencimento = self.data_emprestimo
-
-        for i in range(qtd_parcelas):
-            if self.frequencia == "diaria":
-                while True:
-                    data_vencimento += timedelta(days=1)
-                    if data_vencimento.weekday() != 6:
-                        break
-            else:
-                data_vencimento = self.data_emprestimo + (intervalo * (i + 1))
-                if data_vencimento.weekday() == 6:
-                    data_vencimento += timedelta(days=1)
-
-            numero = f"{i+1}/{qtd_parcelas}"
-            valor = valor_parcela if i < qtd_parcelas - 1 else ultima_parcela
-
-            parcela = Parcela(
-                emprestimo_id=self.id,
-                numero_parcela=numero,
-                valor=valor,
-                data_vencimento=data_vencimento,
-                status="pendente"
-            )
-            parcelas.append(parcela)
-
-        return parcelas
-
-
-    def aplicar_pagamentos(self, valor_pago):
-        self.saldo = round(max(0.0, self.saldo - float(valor_pago)), 2)
-        if self.saldo <= 0:
-            self.status = "quitado"
-
-    def __repr__(self):
-        return f"<Emprestimo {self.id} cliente={self.cliente_id} saldo={self.saldo}>"
-
-    @property
-    def valor_pendente(self):
-        return sum(p.valor for p in self.parcelas if p.status != "pago")
-
-# ==========================
-# Parcela
-# ==========================
-class Parcela(db.Model):
-    __tablename__ = "parcela"
-
-    id = db.Column(db.Integer, primary_key=True)
-    emprestimo_id = db.Column(db.Integer, db.ForeignKey("emprestimo.id"), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
-    valor_pago = db.Column(db.Float, default=0.0)
-    numero_parcela = db.Column(db.String(10), nullable=False)
-    data_vencimento = db.Column(db.Date, nullable=False)
-    status = db.Column(db.String(20), default="pendente")
-
-    def __repr__(self):
-        return f"<Parcela {self.numero_parcela} valor={self.valor} Emprestimo={self.emprestimo_id} Status={self.status}>"
-
-# ==========================
-# Pagamento
-# ==========================
-class Pagamento(db.Model):
-    __tablename__ = "pagamento"
-
-    id = db.Column(db.Integer, primary_key=True)
-    emprestimo_id = db.Column(db.Integer, db.ForeignKey("emprestimo.id"), nullable=False)
-    parcela_id = db.Column(db.Integer, db.ForeignKey("parcela.id"), nullable=True)
-    valor = db.Column(db.Float, nullable=False)
-    data_pagamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-
-    def __repr__(self):
-        return f"<Pagamento {self.id} emprestimo={self.emprestimo_id} valor={self.valor}>"
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, bindparam, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, date
+from decimal import Decimal
+from functools import lru_cache
+from dinheiro import Centavos, dinheiro, ZERO
+
+db = SQLAlchemy()
+
+#
+#Tabela associativa (muitas-para-muitos) cobradores <-> regioes
+#
+regiao_cobrador = db.Table(
+    "regiao_cobrador",
+    db.Column("regiao_id", db.Integer, db.ForeignKey("regiao.id"), primary_key=True),
+    db.Column("cobrador_id", db.Integer, db.ForeignKey("usuario.id"), primary_key=True),
+    # a chave primária já cobre a busca por regiao_id; este índice cobre usuario.regioes
+    db.Index("ix_regiao_cobrador_cobrador", "cobrador_id"))
+
+# ==========================
+# Usuário (Admin ou Cobrador)
+# ==========================
+class Usuario(db.Model):
+    __tablename__ = "usuario"
+    __table_args__ = (
+        db.Index("ix_usuario_tipo", "tipo"),
+        db.Index("ix_usuario_regiao", "regiao_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario = db.Column(db.String(50), unique=True, nullable=False)
+    senha = db.Column(db.String(50), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # "admin" ou "cobrador"
+
+    clientes = db.relationship("Cliente", back_populates="cobrador", lazy=True)
+
+    regiao_id = db.Column(db.Integer, db.ForeignKey("regiao.id"), nullable=True)
+
+    regioes = db.relationship("Regiao", secondary="regiao_cobrador", back_populates="cobradores")
+
+    def __repr__(self):
+        return f"<Usuario: {self.usuario} ({self.tipo})>"
+
+
+# ==========================
+# Região
+# ==========================
+class Regiao(db.Model):
+    __tablename__ = "regiao"
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False, unique=True)
+
+    cobradores = db.relationship("Usuario", secondary="regiao_cobrador", back_populates="regioes")
+    clientes = db.relationship("Cliente", back_populates="regiao", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<Regiao {self.nome}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "nome": self.nome,
+            "cobradores": [{"id": c.id, "usuario": c.usuario} for c in self.cobradores]
+    }
+
+
+# ==========================
+# Cliente
+# ==========================
+class Cliente(db.Model):
+    __tablename__ = "cliente"
+    __table_args__ = (
+        # listagens ordenadas por nome, com ou sem filtro de região/cobrador
+        db.Index("ix_cliente_nome", "nome", "id"),
+        db.Index("ix_cliente_regiao_nome", "regiao_id", "nome"),
+        db.Index("ix_cliente_cobrador_nome", "cobrador_id", "nome"),
+        db.Index("ix_cliente_atualizado_em", "atualizado_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    telefone = db.Column(db.String(30), nullable=True)
+    endereco = db.Column(db.String(120), nullable=False)
+
+    cobrador_id = db.Column(db.Integer, db.ForeignKey("usuario.id"), nullable=True)
+
+    regiao_id = db.Column(db.Integer, db.ForeignKey("regiao.id"), nullable=True)
+    regiao = db.relationship("Regiao", back_populates="clientes", lazy=True)
+
+    cobrador = db.relationship("Usuario", back_populates="clientes")
+
+    # localização digitada ou importada (sem geocodificação), usada na rota do dia
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
+    # totais acumulados de todos os empréstimos do cliente (mantidos a cada pagamento)
+    total_pago = db.Column(Centavos, nullable=False, default=ZERO, server_default="0")
+    total_pendente = db.Column(Centavos, nullable=False, default=ZERO, server_default="0")
+
+    # última alteração, usada na sincronização incremental (api/sincronizar)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # controle de concorrência otimista: todo UPDATE confere e incrementa a versão;
+    # se outra transação gravou antes, o flush levanta StaleDataError (ver banco.com_retentativas)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": versao}
+
+    emprestimos = db.relationship(
+        "Emprestimo",
+        back_populates="cliente",
+        cascade="all, delete-orphan",
+        lazy=True
+    )
+
+    def __repr__(self):
+        return f"<Cliente {self.nome}>"
+
+# ==========================
+# Cálculo do cronograma de parcelas
+# ==========================
+def valor_total_com_juros(valor, porcentagem):
+    return dinheiro(dinheiro(valor) * (1 + Decimal(str(porcentagem)) / 100))
+
+
+def quantidade_parcelas(frequencia, qtd_parcelas=None):
+    if frequencia == "diaria":
+        return int(qtd_parcelas) if qtd_parcelas else 20
+    elif frequencia == "semanal":
+        return 4
+    return 1
+
+
+def valores_parcelas(total_com_juros, qtd_parcelas):
+    """Retorna (valor das parcelas, valor da última parcela)."""
+    total_com_juros = dinheiro(total_com_juros)
+    # valor base arredondado
+    valor_parcela = dinheiro(total_com_juros / qtd_parcelas)
+    # ajuste final para que a soma das parcelas sejam igual ao total
+    ultima_parcela = total_com_juros - valor_parcela * (qtd_parcelas - 1)
+    return valor_parcela, ultima_parcela
+
+
+@lru_cache(maxsize=4096)
+def datas_vencimento(frequencia, data_emprestimo, qtd_parcelas):
+    """
+    Datas de vencimento das parcelas. Diárias pulam domingos; semanais e mensais
+    que caem no domingo vão para segunda. O resultado é guardado em cache, pois
+    empréstimos da mesma data e frequência têm o mesmo cronograma.
+    """
+    if frequencia == "semanal":
+        intervalo = timedelta(weeks=1)
+    else:
+        intervalo = timedelta(days=30)
+
+    datas = []
+    data_vencimento = data_emprestimo
+
+    for i in range(qtd_parcelas):
+        if frequencia == "diaria":
+            while True:
+                data_vencimento += timedelta(days=1)
+                if data_vencimento.weekday() != 6:
+                    break
+        else:
+            data_vencimento = data_emprestimo + (intervalo * (i + 1))
+            if data_vencimento.weekday() == 6:
+                data_vencimento += timedelta(days=1)
+        datas.append(data_vencimento)
+
+    return tuple(datas)
+
+
+# ==========================
+# Empréstimo
+# ==========================
+class ParcelaJaPaga(ValueError):
+    """A parcela escolhida para receber um pagamento já estava paga."""
+
+
+class Emprestimo(db.Model):
+    __tablename__ = "emprestimo"
+    __table_args__ = (
+        db.Index("ix_emprestimo_cliente", "cliente_id"),
+        db.Index("ix_emprestimo_atualizado_em", "atualizado_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey("cliente.id"), nullable=False)
+    valor = db.Column(Centavos, nullable=False)
+    porcentagem = db.Column(db.Float, nullable=False, default=0.0)
+    frequencia = db.Column(db.String(20), nullable=False)
+    data_emprestimo = db.Column(db.Date, nullable=False, default=datetime.utcnow)
+    valor_total = db.Column(Centavos, nullable=False)
+    saldo = db.Column(Centavos, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="em_aberto")
+
+    # totais acumulados, atualizados na mesma transação de cada pagamento
+    total_pago = db.Column(Centavos, nullable=False, default=ZERO, server_default="0")
+    total_pendente = db.Column(Centavos, nullable=False, default=ZERO, server_default="0")
+
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": versao}
+
+    cliente = db.relationship("Cliente", back_populates="emprestimos")
+    # sem ordem explícita o SQLite devolve na ordem do índice (emprestimo_id, status),
+    # e a tabela de parcelas mudaria de ordem quando o status muda
+    parcelas = db.relationship(
+        "Parcela", backref="emprestimo", cascade="all, delete-orphan",
+        order_by="[Parcela.data_vencimento, Parcela.id]"
+    )
+    pagamentos = db.relationship("Pagamento", backref="emprestimo", cascade="all, delete-orphan")
+
+    def __init__(self, cliente_id, valor, porcentagem, frequencia, data_emprestimo=None):
+        self.cliente_id = cliente_id
+        self.valor = dinheiro(valor)
+        self.porcentagem = float(porcentagem)
+        self.frequencia = frequencia
+        self.data_emprestimo = data_emprestimo or datetime.utcnow().date()
+        self.valor_total = valor_total_com_juros(self.valor, self.porcentagem)
+        self.saldo = self.valor_total
+        self.status = "em_aberto"
+        self.total_pago = ZERO
+        self.total_pendente = ZERO
+
+    def gerar_parcelas(self, qtd_parcelas=None):
+        qtd_parcelas = quantidade_parcelas(self.frequencia, qtd_parcelas)
+        valor_parcela, ultima_parcela = valores_parcelas(self.valor_total, qtd_parcelas)
+        datas = datas_vencimento(self.frequencia, self.data_emprestimo, qtd_parcelas)
+
+        hoje = date.today()
+        parcelas = []
+        for i, data_vencimento in enumerate(datas):
+            numero = f"{i+1}/{qtd_parcelas}"
+            valor = valor_parcela if i < qtd_parcelas - 1 else ultima_parcela
+
+            parcela = Parcela(
+                emprestimo_id=self.id,
+                numero_parcela=numero,
+                valor=valor,
+                data_vencimento=data_vencimento,
+                # empréstimo lançado com data passada já nasce com parcelas atrasadas
+                status="atrasado" if data_vencimento < hoje else "pendente"
+            )
+            parcelas.append(parcela)
+
+        return parcelas
+
+
+    def aplicar_variacao(self, variacao_pago, variacao_pendente):
+        """Aplica a variação de um pagamento nos totais do empréstimo e do cliente."""
+        self.total_pago = (self.total_pago or ZERO) + variacao_pago
+        self.total_pendente = (self.total_pendente or ZERO) + variacao_pendente
+        self.saldo = max(ZERO, self.valor_total - self.total_pago)
+        self.status = "quitado" if self.saldo <= 0 else "em_aberto"
+
+        cliente = self.cliente or Cliente.query.get(self.cliente_id)
+        cliente.total_pago = (cliente.total_pago or ZERO) + variacao_pago
+        cliente.total_pendente = (cliente.total_pendente or ZERO) + variacao_pendente
+
+    def registrar_alteracao(self, parcela, antes, com_agenda=True):
+        """
+        Atualiza os totais a partir da mudança de uma parcela.
+        `antes` é o retorno de `parcela.situacao()` tirado antes da alteração.
+        Quem altera várias parcelas de uma vez passa com_agenda=False e chama
+        `atualizar_agenda` uma vez no final.
+        """
+        pago_antes, pendente_antes = antes
+        pago_depois, pendente_depois = parcela.situacao()
+        self.aplicar_variacao(pago_depois - pago_antes, pendente_depois - pendente_antes)
+
+        if com_agenda:
+            atualizar_agenda([parcela])
+
+    def alocar_pagamento(self, valor, data_pagamento=None, primeira=None, chave_idempotencia=None, com_agenda=True):
+        """
+        Distribui um valor recebido nas parcelas em aberto, da que vence primeiro
+        para a última (cascata), com um Pagamento por parcela atingida. `primeira`
+        recebe antes das demais (a parcela escolhida na tela); se ela já estiver
+        paga, levanta ParcelaJaPaga sem registrar nada. A chave de idempotência
+        fica no primeiro pagamento.
+
+        As parcelas são alteradas em memória e gravadas juntas no flush; a agenda
+        é atualizada num único UPDATE (ou por quem chama, com com_agenda=False).
+        Retorna (pagamentos, sobra), onde sobra é o que passou do total em aberto
+        e não foi registrado.
+        """
+        if primeira is not None and primeira.status == "pago":
+            raise ParcelaJaPaga(f"Parcela {primeira.numero_parcela} já paga")
+
+        data_pagamento = data_pagamento or datetime.now()
+        em_aberto = sorted(
+            (p for p in self.parcelas if p.status != "pago"),
+            key=lambda p: (p is not primeira, p.data_vencimento, p.id or 0)
+        )
+
+        restante = dinheiro(valor)
+        pagamentos = []
+        alteradas = []
+        for parcela in em_aberto:
+            if restante <= 0:
+                break
+            aplicado = min(restante, parcela.valor - (parcela.valor_pago or ZERO))
+            if aplicado <= 0:
+                continue
+            chave = chave_idempotencia if not pagamentos else None
+            pagamentos.append(parcela.receber(aplicado, data_pagamento, chave_idempotencia=chave, com_agenda=False))
+            alteradas.append(parcela)
+            restante -= aplicado
+
+        if com_agenda:
+            atualizar_agenda(alteradas)
+        return pagamentos, max(restante, ZERO)
+
+    def recalcular_totais(self, parcelas=None):
+        """Recalcula os totais do empréstimo a partir das parcelas (usado ao criar ou regerar parcelas)."""
+        parcelas = self.parcelas if parcelas is None else parcelas
+        total_pago = sum((p.situacao()[0] for p in parcelas), ZERO)
+        total_pendente = sum((p.situacao()[1] for p in parcelas), ZERO)
+        self.aplicar_variacao(total_pago - (self.total_pago or ZERO), total_pendente - (self.total_pendente or ZERO))
+
+    def remover_dos_totais(self):
+        """Retira o empréstimo dos totais do cliente (usado antes de excluir)."""
+        cliente = self.cliente or Cliente.query.get(self.cliente_id)
+        cliente.total_pago = (cliente.total_pago or ZERO) - (self.total_pago or ZERO)
+        cliente.total_pendente = (cliente.total_pendente or ZERO) - (self.total_pendente or ZERO)
+
+    def __repr__(self):
+        return f"<Emprestimo {self.id} cliente={self.cliente_id} saldo={self.saldo}>"
+
+    @property
+    def valor_pendente(self):
+        return sum((p.valor for p in self.parcelas if p.status != "pago"), ZERO)
+
+# ==========================
+# Parcela
+# ==========================
+class Parcela(db.Model):
+    __tablename__ = "parcela"
+    __table_args__ = (
+        # parcelas do dia
+        db.Index("ix_parcela_vencimento_emprestimo", "data_vencimento", "emprestimo_id"),
+        # parcelas de um empréstimo e totais por status
+        db.Index("ix_parcela_emprestimo_status", "emprestimo_id", "status"),
+        # parcelas em atraso
+        db.Index("ix_parcela_status_vencimento", "status", "data_vencimento"),
+        db.Index("ix_parcela_atualizado_em", "atualizado_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    emprestimo_id = db.Column(db.Integer, db.ForeignKey("emprestimo.id"), nullable=False)
+    valor = db.Column(Centavos, nullable=False)
+    valor_pago = db.Column(Centavos, default=ZERO)
+    numero_parcela = db.Column(db.String(10), nullable=False)
+    data_vencimento = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default="pendente")
+
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": versao}
+
+    def receber(self, valor, data_pagamento=None, chave_idempotencia=None, com_agenda=True):
+        """
+        Registra um recebimento na parcela e atualiza os totais do empréstimo e do
+        cliente. Se o valor cobrir o restante, a parcela fica paga. O Pagamento
+        retornado guarda só o que foi aplicado: o que passar do restante fica de
+        fora (alocar_pagamento leva esse excesso para as próximas parcelas).
+        """
+        antes = self.situacao()
+        valor_restante = self.valor - (self.valor_pago or ZERO)
+        valor = min(dinheiro(valor), max(valor_restante, ZERO))
+
+        self.valor_pago = (self.valor_pago or ZERO) + valor
+        self.atualizar_status()
+
+        pagamento = Pagamento(
+            emprestimo_id=self.emprestimo_id,
+            parcela_id=self.id,
+            valor=valor,
+            data_pagamento=data_pagamento or datetime.now(),
+            chave_idempotencia=chave_idempotencia,
+        )
+        db.session.add(pagamento)
+
+        self.emprestimo.registrar_alteracao(self, antes, com_agenda=com_agenda)
+        return pagamento
+
+    def atualizar_status(self, hoje=None):
+        """
+        Status a partir do valor pago e do vencimento: pago, atrasado (venceu sem
+        ser paga por inteiro, mesmo com pagamento parcial), parcialmente_paga ou
+        pendente. O job `atualizar-status` aplica a mesma regra em massa toda noite.
+        """
+        hoje = hoje or date.today()
+        valor_pago = self.valor_pago or ZERO
+        if valor_pago >= self.valor:
+            self.status = "pago"
+        elif self.data_vencimento < hoje:
+            self.status = "atrasado"
+        elif valor_pago > 0:
+            self.status = "parcialmente_paga"
+        else:
+            self.status = "pendente"
+
+    def situacao(self):
+        """Retorna (valor pago, valor pendente) da parcela, como entram nos totais."""
+        valor_pago = self.valor_pago or ZERO
+        if self.status == "pago":
+            return valor_pago, ZERO
+        return valor_pago, (self.valor or ZERO) - valor_pago
+
+    def __repr__(self):
+        return f"<Parcela {self.numero_parcela} valor={self.valor} Emprestimo={self.emprestimo_id} Status={self.status}>"
+
+# ==========================
+# Pagamento
+# ==========================
+class Pagamento(db.Model):
+    __tablename__ = "pagamento"
+    __table_args__ = (
+        db.Index("ix_pagamento_parcela", "parcela_id"),
+        db.Index("ix_pagamento_emprestimo", "emprestimo_id"),
+        db.Index("ix_pagamento_atualizado_em", "atualizado_em"),
+        db.Index("ix_pagamento_chave_idempotencia", "chave_idempotencia", unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    emprestimo_id = db.Column(db.Integer, db.ForeignKey("emprestimo.id"), nullable=False)
+    parcela_id = db.Column(db.Integer, db.ForeignKey("parcela.id"), nullable=True)
+    valor = db.Column(Centavos, nullable=False)
+    data_pagamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # chave enviada pelo aparelho no envio em lote; repetir a chave não duplica o pagamento
+    chave_idempotencia = db.Column(db.String(64), nullable=True)
+
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Pagamento {self.id} emprestimo={self.emprestimo_id} valor={self.valor}>"
+
+# ==========================
+# Agenda de cobrança (parcelas do dia pré-calculadas)
+# ==========================
+class AgendaDia(db.Model):
+    """Marca os dias cuja agenda já foi montada."""
+    __tablename__ = "agenda_dia"
+
+    data = db.Column(db.Date, primary_key=True)
+    gerada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AgendaDia {self.data}>"
+
+
+class AgendaParcela(db.Model):
+    """Parcela que vence no dia, já com a região, o cobrador e o nome do cliente."""
+    __tablename__ = "agenda_parcela"
+    __table_args__ = (
+        db.Index("ix_agenda_parcela_data_regiao", "data", "regiao_id"),
+        db.Index("ix_agenda_parcela_parcela", "parcela_id"),
+    )
+
+    # cópia desnormalizada, sem chaves estrangeiras: as rotas que criam, regeram
+    # ou excluem parcelas e clientes ajustam só as linhas afetadas (agenda.py)
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    parcela_id = db.Column(db.Integer, nullable=False)
+    cliente_id = db.Column(db.Integer, nullable=False)
+    regiao_id = db.Column(db.Integer, nullable=True)
+    cobrador_id = db.Column(db.Integer, nullable=True)
+    cliente_nome = db.Column(db.String(100), nullable=False)
+    numero_parcela = db.Column(db.String(10), nullable=False)
+    valor = db.Column(Centavos, nullable=False)
+    valor_pago = db.Column(Centavos, default=ZERO)
+    status = db.Column(db.String(20), default="pendente")
+
+    def __repr__(self):
+        return f"<AgendaParcela {self.data} parcela={self.parcela_id} status={self.status}>"
+
+
+def atualizar_agenda(parcelas):
+    """Copia valor pago e status das parcelas para a agenda já montada, num único UPDATE em lote."""
+    if not parcelas:
+        return
+    tabela = AgendaParcela.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.parcela_id == bindparam("b_parcela_id"))
+        .values(valor_pago=bindparam("b_valor_pago"), status=bindparam("b_status")),
+        [{"b_parcela_id": p.id, "b_valor_pago": p.valor_pago, "b_status": p.status} for p in parcelas]
+    )
+
+
+# ==========================
+# Versão dos dados de referência (compartilhada entre os workers)
+# ==========================
+class VersaoDados(db.Model):
+    __tablename__ = "versao_dados"
+
+    chave = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VersaoDados {self.chave}={self.versao}>"
+
+
+# ==========================
+# Versão de cada dia de vencimento (invalida a previsão de recebimentos em cache)
+# ==========================
+class AlteracaoVencimento(db.Model):
+    __tablename__ = "alteracao_vencimento"
+
+    data = db.Column(db.Date, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AlteracaoVencimento {self.data}={self.versao}>"
+
+
+def marcar_vencimentos(datas):
+    """
+    Incrementa, na transação corrente, a versão de cada dia de vencimento cujas
+    parcelas mudaram (um único upsert em lote). Gravações do ORM passam por
+    registrar_vencimentos_alterados; INSERTs/UPDATEs em massa chamam direto.
+    """
+    datas = sorted({d for d in datas if d})
+    if not datas:
+        return
+    dialeto = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+    tabela = AlteracaoVencimento.__table__
+    comando = dialeto.insert(tabela)
+    db.session.execute(
+        comando.on_conflict_do_update(index_elements=[tabela.c.data], set_={"versao": tabela.c.versao + 1}),
+        [{"data": d, "versao": 1} for d in datas]
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_vencimentos_alterados(session, flush_context, instances):
+    """Marca os dias de vencimento das parcelas criadas, alteradas (ex.: pagamento) ou excluídas."""
+    datas = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Parcela):
+            datas.add(obj.data_vencimento)
+            # vencimento alterado: o dia antigo também perde a parcela
+            datas.update(inspect(obj).attrs.data_vencimento.history.deleted or ())
+    if datas:
+        marcar_vencimentos(datas)
+
+
+# ==========================
+# Registros excluídos (para a sincronização incremental saber o que apagar)
+# ==========================
+TABELAS_SINCRONIZADAS = ("cliente", "emprestimo", "parcela", "pagamento")
+
+
+class RegistroExcluido(db.Model):
+    __tablename__ = "registro_excluido"
+    __table_args__ = (
+        db.Index("ix_registro_excluido_excluido_em", "excluido_em"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(20), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    # região do cliente dono do registro, para cada aparelho receber só as suas
+    # exclusões (sem chave estrangeira: a região também pode ser excluída)
+    regiao_id = db.Column(db.Integer)
+    excluido_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RegistroExcluido {self.tabela} {self.registro_id}>"
+
+
+def _regiao_do_registro(obj):
+    if isinstance(obj, Cliente):
+        return obj.regiao_id
+    emprestimo = obj if isinstance(obj, Emprestimo) else obj.emprestimo
+    cliente = emprestimo.cliente if emprestimo is not None else None
+    return cliente.regiao_id if cliente is not None else None
+
+
+@event.listens_for(Session, "before_flush")
+def registrar_exclusoes(session, flush_context, instances):
+    """Guarda cada cliente, empréstimo, parcela ou pagamento excluído pelo ORM."""
+    for obj in session.deleted:
+        tabela = getattr(obj, "__tablename__", None)
+        if tabela in TABELAS_SINCRONIZADAS and obj.id is not None:
+            session.add(RegistroExcluido(tabela=tabela, registro_id=obj.id, regiao_id=_regiao_do_registro(obj)))
@@ -0,0 +1,135 @@
+from datetime import datetime
+from sqlalchemy.orm import selectinload
+from dinheiro import dinheiro, valor_json
+from models import db, Emprestimo, Parcela, Pagamento, atualizar_agenda
+
+# pagamentos aceitos por envio
+MAX_ITENS_LOTE = 500
+
+
+class ErroItem(ValueError):
+    pass
+
+
+def _data_pagamento(valor):
+    if not valor:
+        return datetime.now()
+    data = datetime.fromisoformat(str(valor))
+    if data.tzinfo:
+        # horário com fuso vindo do aparelho: converte para o horário local do servidor
+        data = data.astimezone().replace(tzinfo=None)
+    return data
+
+
+def _normalizar(item):
+    if not isinstance(item, dict):
+        raise ErroItem("item deve ser um objeto")
+
+    chave = str(item.get("chave") or "").strip()
+    if not chave or len(chave) > 64:
+        raise ErroItem("chave de idempotência obrigatória (até 64 caracteres)")
+
+    try:
+        parcela_id = int(item["parcela_id"])
+        valor = dinheiro(item["valor"])
+    except KeyError as e:
+        raise ErroItem(f"campo obrigatório ausente: {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ErroItem("parcela_id e valor devem ser numéricos")
+    if valor <= 0:
+        raise ErroItem("valor deve ser maior que zero")
+
+    try:
+        data_pagamento = _data_pagamento(item.get("data_pagamento"))
+    except ValueError:
+        raise ErroItem("data_pagamento deve estar no formato ISO 8601")
+
+    return {"chave": chave, "parcela_id": parcela_id, "valor": valor, "data_pagamento": data_pagamento}
+
+
+def registrar_pagamentos_em_lote(itens):
+    """
+    Aplica recebimentos coletados offline, na ordem enviada e dentro da transação
+    corrente (o commit fica por conta de quem chama). Cada item traz parcela_id,
+    valor, data_pagamento (horário do aparelho) e uma chave de idempotência.
+
+    Chaves já gravadas (ou repetidas no próprio lote) são puladas, então reenviar
+    o lote inteiro depois de uma falha de rede é seguro. Como em receber_pagamento,
+    o que passar do restante da parcela vai para as próximas parcelas em aberto do
+    empréstimo, e o que passar do total em aberto volta em `sobra`. Parcelas,
+    empréstimos e clientes envolvidos são carregados de uma vez. Retorna um
+    resultado por item.
+    """
+    resultados = []
+    validos = []
+    for posicao, item in enumerate(itens):
+        try:
+            validos.append((posicao, _normalizar(item)))
+            resultados.append(None)
+        except ErroItem as e:
+            chave = item.get("chave") if isinstance(item, dict) else None
+            resultados.append({"chave": chave, "status": "erro", "mensagem": str(e)})
+
+    chaves = {item["chave"] for _, item in validos}
+    ja_gravadas = {}
+    if chaves:
+        ja_gravadas = dict(
+            db.session.query(Pagamento.chave_idempotencia, Pagamento.id)
+            .filter(Pagamento.chave_idempotencia.in_(chaves))
+        )
+
+    parcelas_ids = {item["parcela_id"] for _, item in validos}
+    parcelas = {}
+    if parcelas_ids:
+        parcelas = {
+            parcela.id: parcela for parcela in
+            Parcela.query.options(
+                selectinload(Parcela.emprestimo).selectinload(Emprestimo.cliente),
+                selectinload(Parcela.emprestimo).selectinload(Emprestimo.parcelas),
+            )
+            .filter(Parcela.id.in_(parcelas_ids))
+        }
+
+    novos = {}
+    alteradas = set()
+    for posicao, item in validos:
+        chave = item["chave"]
+
+        if chave in ja_gravadas:
+            resultados[posicao] = {"chave": chave, "status": "duplicado", "pagamento_id": ja_gravadas[chave]}
+            continue
+        if chave in novos:
+            resultados[posicao] = {"chave": chave, "status": "duplicado", "pagamento": novos[chave]}
+            continue
+
+        parcela = parcelas.get(item["parcela_id"])
+        if parcela is None:
+            resultados[posicao] = {"chave": chave, "status": "erro", "mensagem": "parcela não encontrada"}
+            continue
+        if parcela.status == "pago":
+            resultados[posicao] = {"chave": chave, "status": "erro", "mensagem": "parcela já está paga"}
+            continue
+
+        # a agenda é atualizada uma vez no final, para as parcelas alteradas
+        pagamentos, sobra = parcela.emprestimo.alocar_pagamento(
+            item["valor"], item["data_pagamento"], primeira=parcela, chave_idempotencia=chave, com_agenda=False
+        )
+        alteradas.update(pagamento.parcela_id for pagamento in pagamentos)
+        novos[chave] = pagamentos[0]
+        # o aparelho vê quanto do recebimento entrou e quanto ficou de fora
+        resultados[posicao] = {
+            "chave": chave, "status": "aplicado", "pagamento": pagamentos[0],
+            "valor_aplicado": valor_json(item["valor"] - sobra), "sobra": valor_json(sobra),
+        }
+
+    # os ids dos pagamentos novos só existem depois do flush
+    db.session.flush()
+    atualizar_agenda([db.session.get(Parcela, parcela_id) for parcela_id in alteradas])
+    for resultado in resultados:
+        pagamento = resultado.pop("pagamento", None)
+        if pagamento is not None:
+            resultado["pagamento_id"] = pagamento.id
+            if resultado["status"] == "aplicado":
+                resultado["status_parcela"] = parcelas[pagamento.parcela_id].status
+
+    return resultados
@@ -0,0 +1,97 @@
+import json
+import time
+import base64
+from sqlalchemy import tuple_
+
+# por quantos segundos o total aproximado de uma listagem fica em cache
+TEMPO_CACHE_TOTAL = 60
+
+_cache_totais = {}
+
+
+def codificar_cursor(nome, id):
+    return base64.urlsafe_b64encode(json.dumps([nome, id]).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """Retorna (nome, id) ou None se o cursor for inválido."""
+    if not cursor:
+        return None
+    try:
+        nome, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(nome), int(id)
+    except (ValueError, TypeError):
+        return None
+
+
+def total_aproximado(query, chave):
+    """COUNT(*) da listagem, refeito no máximo a cada TEMPO_CACHE_TOTAL segundos por filtro."""
+    agora = time.monotonic()
+    em_cache = _cache_totais.get(chave)
+    if em_cache and agora - em_cache[1] < TEMPO_CACHE_TOTAL:
+        return em_cache[0]
+
+    total = query.order_by(None).count()
+    _cache_totais[chave] = (total, agora)
+    return total
+
+
+class PaginaCursor:
+    """
+    Paginação por cursor (keyset) ordenada por (nome, id).
+
+    Em vez de OFFSET, cada página busca as linhas depois (ou antes) do último
+    (nome, id) visto, usando o índice de nome: a página 1000 custa o mesmo que a
+    primeira. `coluna_nome` e `coluna_id` são as colunas de ordenação do modelo.
+
+    O total é opcional: passe `query_total` (a mesma listagem, sem opções de
+    carregamento) e uma `chave_total` que identifique os filtros para o cache.
+    """
+
+    def __init__(self, query, coluna_nome, coluna_id, por_pagina=10, apos=None, antes=None,
+                 query_total=None, chave_total=None):
+        self.por_pagina = por_pagina
+        chave = tuple_(coluna_nome, coluna_id)
+
+        cursor_apos = decodificar_cursor(apos)
+        cursor_antes = decodificar_cursor(antes) if not cursor_apos else None
+
+        if cursor_antes:
+            # página anterior: busca de trás para frente e inverte
+            linhas = (
+                query.filter(chave < cursor_antes)
+                .order_by(coluna_nome.desc(), coluna_id.desc())
+                .limit(por_pagina + 1)
+                .all()
+            )
+            self.has_prev = len(linhas) > por_pagina
+            self.items = list(reversed(linhas[:por_pagina]))
+            self.has_next = True
+        else:
+            linhas = self.consulta_seguinte(query, coluna_nome, coluna_id, cursor_apos, por_pagina + 1).all()
+            self.has_next = len(linhas) > por_pagina
+            self.items = linhas[:por_pagina]
+            self.has_prev = cursor_apos is not None
+
+        nome_attr, id_attr = coluna_nome.key, coluna_id.key
+        primeiro, ultimo = (self.items[0], self.items[-1]) if self.items else (None, None)
+        self.prev_cursor = (
+            codificar_cursor(getattr(primeiro, nome_attr), getattr(primeiro, id_attr))
+            if self.has_prev and primeiro else None
+        )
+        self.next_cursor = (
+            codificar_cursor(getattr(ultimo, nome_attr), getattr(ultimo, id_attr))
+            if self.has_next and ultimo else None
+        )
+
+        self.total = total_aproximado(query_total, chave_total) if query_total is not None else None
+
+    @staticmethod
+    def consulta_seguinte(query, coluna_nome, coluna_id, cursor, limite):
+        """Linhas depois de `cursor` (ou desde o início, se None), na ordem (nome, id)."""
+        if cursor:
+            query = query.filter(tuple_(coluna_nome, coluna_id) > tuple(cursor))
+        return query.order_by(coluna_nome.asc(), coluna_id.asc()).limit(limite)
+
+    def __iter__(self):
+        return iter(self.items)
@@ -0,0 +1,79 @@
+from datetime import date
+from models import db, Cliente, Usuario, Regiao, Emprestimo, Parcela, Pagamento, AgendaParcela, RegistroExcluido
+from agregacoes import consulta_parcelas_do_dia, consulta_totais_por_cliente, em_atraso
+from paginacao import PaginaCursor
+
+
+def _consultas(hoje, regioes_ids, cobrador_id):
+    """Consultas dos dashboards, montadas do mesmo jeito que nas rotas."""
+    return {
+        "parcelas do dia": consulta_parcelas_do_dia(hoje, regioes_ids),
+        "parcelas do dia por cobrador": consulta_parcelas_do_dia(hoje, regioes_ids, cobrador_id=cobrador_id),
+        "totais por cliente": consulta_totais_por_cliente(regioes_ids, hoje),
+        "totais por cliente por cobrador": consulta_totais_por_cliente(regioes_ids, hoje, cobrador_id=cobrador_id),
+        "clientes das regioes": Cliente.query.filter(Cliente.regiao_id.in_(regioes_ids)).order_by(Cliente.nome.asc()),
+        "clientes das regioes por cobrador": Cliente.query.filter(
+            Cliente.regiao_id.in_(regioes_ids), Cliente.cobrador_id == cobrador_id
+        ),
+        "emprestimos dos clientes": Emprestimo.query.filter(Emprestimo.cliente_id.in_([1, 2, 3])),
+        "parcelas dos emprestimos": Parcela.query.filter(Parcela.emprestimo_id.in_([1, 2, 3])),
+        "pagamentos da parcela": Pagamento.query.filter(Pagamento.parcela_id == 1),
+        "admin: clientes da regiao": Cliente.query.filter_by(regiao_id=regioes_ids[0]).order_by(Cliente.nome.asc()).limit(10),
+        "admin: clientes do cobrador": Cliente.query.filter_by(cobrador_id=cobrador_id).order_by(Cliente.nome.asc()).limit(10),
+        "admin: todos os clientes": Cliente.query.order_by(Cliente.nome.asc()).limit(10),
+        "admin: pagina seguinte": PaginaCursor.consulta_seguinte(Cliente.query, Cliente.nome, Cliente.id, ("M", 1), 10),
+        "admin: pagina seguinte da regiao": PaginaCursor.consulta_seguinte(
+            Cliente.query.filter_by(regiao_id=regioes_ids[0]), Cliente.nome, Cliente.id, ("M", 1), 10
+        ),
+        "cobradores": Usuario.query.filter_by(tipo="cobrador"),
+        "cobradores da regiao": Usuario.query.filter_by(regiao_id=regioes_ids[0]),
+        "regioes do cobrador": Regiao.query.join(Regiao.cobradores).filter(Usuario.id == cobrador_id),
+        "agenda do dia": AgendaParcela.query.filter(
+            AgendaParcela.data == hoje, AgendaParcela.regiao_id.in_(regioes_ids)
+        ).order_by(AgendaParcela.parcela_id),
+        "agenda da parcela": AgendaParcela.query.filter(AgendaParcela.parcela_id == 1),
+        "sincronizar: parcelas alteradas": Parcela.query.filter(Parcela.atualizado_em > hoje),
+        "sincronizar: excluidos": RegistroExcluido.query.filter(RegistroExcluido.excluido_em > hoje),
+        "parcelas em atraso": Parcela.query.filter(em_atraso(hoje)),
+    }
+
+
+def _plano(query):
+    compilado = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    parametros = []
+    for nome in compilado.positiontup:
+        valor = compilado.params[nome]
+        # aplica a conversão do tipo da coluna (datas em texto, dinheiro em centavos)
+        bind = compilado.binds.get(nome)
+        processar = bind.type.bind_processor(db.engine.dialect) if bind is not None else None
+        if processar:
+            valor = processar(valor)
+        parametros.append(valor.isoformat() if isinstance(valor, date) else valor)
+
+    linhas = db.session.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(compilado), tuple(parametros)
+    ).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def varredura_de_tabela(detalhe):
+    """Uma linha do plano é varredura completa quando faz SCAN sem usar índice."""
+    return detalhe.startswith("SCAN ") and "USING" not in detalhe and "CONSTANT ROW" not in detalhe
+
+
+def verificar_planos(hoje=None, regioes_ids=(1, 2), cobrador_id=1):
+    """
+    Roda EXPLAIN QUERY PLAN em cada consulta dos dashboards (somente SQLite).
+    Retorna uma lista de (nome, linhas do plano, linhas com varredura de tabela).
+    """
+    if db.engine.dialect.name != "sqlite":
+        raise RuntimeError("A verificação de planos só está disponível no SQLite.")
+
+    hoje = hoje or date.today()
+    resultado = []
+    for nome, query in _consultas(hoje, list(regioes_ids), cobrador_id).items():
+        plano = _plano(query)
+        resultado.append((nome, plano, [d for d in plano if varredura_de_tabela(d)]))
+    return resultado
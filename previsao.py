@@ -0,0 +1,183 @@
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func, case
+from dinheiro import dinheiro, valor_json, ZERO
+from models import db, Cliente, Emprestimo, Parcela, Pagamento, AlteracaoVencimento
+from agregacoes import ZERO_SQL
+from referencias import referencias
+
+HORIZONTE_PADRAO = 30
+HORIZONTE_MAXIMO = 180
+# dias anteriores à data usados na taxa de recebimento
+HISTORICO_DIAS = 90
+
+UM = Decimal(1)
+CASAS_TAXA = Decimal("0.0001")
+
+# resumo de cada dia de vencimento por worker: (filtros, dia) -> (versão do dia, linhas)
+_cache = {}
+_trava = threading.Lock()
+LIMITE_CACHE = 20000
+
+
+def _versoes(inicio, fim):
+    """Versão de cada dia de vencimento entre inicio e fim; dias nunca alterados não aparecem (versão 0)."""
+    return dict(db.session.execute(
+        select(AlteracaoVencimento.data, AlteracaoVencimento.versao)
+        .where(AlteracaoVencimento.data.between(inicio, fim))
+    ).all())
+
+
+def _por_dia_e_grupo(query, regiao_id, cobrador_id):
+    grupo = (Parcela.data_vencimento, Cliente.regiao_id, Cliente.cobrador_id)
+    query = query.add_columns(*grupo).join(
+        Emprestimo, Parcela.emprestimo_id == Emprestimo.id
+    ).join(
+        Cliente, Emprestimo.cliente_id == Cliente.id
+    )
+    if regiao_id:
+        query = query.where(Cliente.regiao_id == regiao_id)
+    if cobrador_id:
+        query = query.where(Cliente.cobrador_id == cobrador_id)
+    return db.session.execute(query.group_by(*grupo))
+
+
+def _resumo_dos_dias(datas, regiao_id=None, cobrador_id=None):
+    """
+    Para cada dia de vencimento, por região e cobrador: valor das parcelas, saldo
+    em aberto, parcelas em aberto e quanto já foi recebido delas (Pagamento).
+    Duas consultas agrupadas, uma em Parcela e outra em Pagamento.
+    """
+    aberto = case((Parcela.status != "pago", Parcela.valor - func.coalesce(Parcela.valor_pago, 0)), else_=ZERO_SQL)
+    somas = {}
+    for valor, em_aberto, parcelas, dia, regiao, cobrador in _por_dia_e_grupo(
+        select(func.sum(Parcela.valor), func.sum(aberto), func.count(case((Parcela.status != "pago", 1))))
+        .where(Parcela.data_vencimento.in_(datas)),
+        regiao_id, cobrador_id,
+    ):
+        somas[dia, regiao, cobrador] = [valor, em_aberto, parcelas, ZERO]
+
+    for recebido, dia, regiao, cobrador in _por_dia_e_grupo(
+        select(func.sum(Pagamento.valor)).select_from(Pagamento)
+        .join(Parcela, Pagamento.parcela_id == Parcela.id)
+        .where(Parcela.data_vencimento.in_(datas)),
+        regiao_id, cobrador_id,
+    ):
+        somas[dia, regiao, cobrador][3] = recebido
+
+    por_dia = {dia: [] for dia in datas}
+    for (dia, regiao, cobrador), (valor, em_aberto, parcelas, recebido) in somas.items():
+        por_dia[dia].append((regiao, cobrador, valor, em_aberto, parcelas, recebido))
+    return por_dia
+
+
+def _taxas_de_recebimento(historico):
+    """
+    Quanto do valor que venceu no histórico já foi recebido, por região e cobrador.
+    Retorna ({(regiao, cobrador): taxa}, taxa geral).
+    """
+    vencido, recebido = {}, {}
+    for linhas in historico:
+        for regiao, cobrador, valor, _, _, valor_recebido in linhas:
+            vencido[regiao, cobrador] = vencido.get((regiao, cobrador), ZERO) + valor
+            recebido[regiao, cobrador] = recebido.get((regiao, cobrador), ZERO) + valor_recebido
+
+    def taxa(valor_recebido, valor_vencido):
+        return min(UM, valor_recebido / valor_vencido).quantize(CASAS_TAXA)
+
+    taxas = {chave: taxa(recebido[chave], valor) for chave, valor in vencido.items() if valor > 0}
+    total_vencido = sum(vencido.values(), ZERO)
+    geral = taxa(sum(recebido.values(), ZERO), total_vencido) if total_vencido > 0 else UM
+    return taxas, geral
+
+
+def _dias_com_cache(datas, regiao_id, cobrador_id):
+    filtros = (regiao_id, cobrador_id)
+    # lidas antes dos dados: no pior caso guardamos dados novos com a versão antiga
+    versoes = _versoes(datas[0], datas[-1])
+    with _trava:
+        guardados = {dia: _cache.get((filtros, dia)) for dia in datas}
+
+    por_dia = {
+        dia: guardado[1] for dia, guardado in guardados.items()
+        if guardado and guardado[0] == versoes.get(dia, 0)
+    }
+    faltando = [dia for dia in datas if dia not in por_dia]
+    if faltando:
+        calculados = _resumo_dos_dias(faltando, regiao_id, cobrador_id)
+        with _trava:
+            if len(_cache) + len(calculados) > LIMITE_CACHE:
+                _cache.clear()
+            for dia, linhas in calculados.items():
+                _cache[filtros, dia] = (versoes.get(dia, 0), linhas)
+        por_dia.update(calculados)
+    return por_dia
+
+
+def previsao_recebimentos(hoje=None, dias=HORIZONTE_PADRAO, regiao_id=None, cobrador_id=None):
+    """
+    Recebimentos esperados para cada um dos próximos `dias` dias a partir de hoje,
+    por região e cobrador: o saldo em aberto das parcelas que vencem no dia vezes a
+    taxa de recebimento do grupo nos HISTORICO_DIAS dias anteriores (ou a geral, se
+    o grupo não tem histórico).
+
+    O resumo de cada dia de vencimento fica em cache junto com a versão do dia
+    (AlteracaoVencimento), que muda quando uma parcela do dia é criada, paga ou
+    excluída. A cada chamada só as versões são lidas e apenas os dias alterados
+    voltam a consultar parcelas e pagamentos. Retorna (dias, total).
+    """
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=HISTORICO_DIAS)
+    datas = [inicio + timedelta(days=i) for i in range(HISTORICO_DIAS + dias)]
+    por_dia = _dias_com_cache(datas, regiao_id, cobrador_id)
+    taxas, geral = _taxas_de_recebimento(por_dia[dia] for dia in datas if dia < hoje)
+
+    ref = referencias()
+    regioes = {r.id: r.nome for r in ref.regioes}
+    cobradores = {c.id: c.usuario for c in ref.cobradores}
+
+    resultado = []
+    total = {"em_aberto": ZERO, "esperado": ZERO, "parcelas": 0}
+    for dia in datas[HISTORICO_DIAS:]:
+        linhas = []
+        for regiao, cobrador, _, em_aberto, parcelas, _ in por_dia[dia]:
+            if not parcelas:
+                continue
+            taxa = taxas.get((regiao, cobrador), geral)
+            linhas.append({
+                "regiao_id": regiao,
+                "regiao": regioes.get(regiao, "Sem região"),
+                "cobrador_id": cobrador,
+                "cobrador": cobradores.get(cobrador, "Sem cobrador"),
+                "parcelas": parcelas,
+                "em_aberto": em_aberto,
+                "taxa": taxa,
+                "esperado": dinheiro(em_aberto * taxa),
+            })
+        linhas.sort(key=lambda l: (l["regiao"], l["cobrador"]))
+        dia_total = {
+            "data": dia,
+            "linhas": linhas,
+            "em_aberto": sum((l["em_aberto"] for l in linhas), ZERO),
+            "esperado": sum((l["esperado"] for l in linhas), ZERO),
+            "parcelas": sum(l["parcelas"] for l in linhas),
+        }
+        resultado.append(dia_total)
+        for chave in total:
+            total[chave] += dia_total[chave]
+    return resultado, total
+
+
+def previsao_json(dias, total):
+    """A previsão pronta para jsonify (datas em ISO e valores como números)."""
+    return {
+        "dias": [
+            {
+                **{chave: valor_json(valor) for chave, valor in dia.items() if chave != "linhas"},
+                "linhas": [{chave: valor_json(valor) for chave, valor in linha.items()} for linha in dia["linhas"]],
+            }
+            for dia in dias
+        ],
+        "total": {chave: valor_json(valor) for chave, valor in total.items()},
+    }
@@ -0,0 +1,101 @@
+import threading
+from collections import namedtuple
+from flask import g
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+from models import db, Usuario, Regiao, VersaoDados
+
+CHAVE_VERSAO = "referencias"
+
+RegiaoResumo = namedtuple("RegiaoResumo", "id nome")
+CobradorResumo = namedtuple("CobradorResumo", "id usuario")
+RegiaoRef = namedtuple("RegiaoRef", "id nome cobradores")
+CobradorRef = namedtuple("CobradorRef", "id usuario regiao_id regioes")
+
+
+class Referencias:
+    """Retrato somente leitura das regiões e cobradores (com os vínculos entre eles)."""
+
+    def __init__(self, regioes, cobradores, versao=0):
+        self.regioes = regioes
+        self.cobradores = cobradores
+        # versão gravada no banco quando o retrato foi montado
+        self.versao = versao
+
+    def cobradores_da_regiao(self, regiao_id):
+        """Cobradores cuja região principal (usuario.regiao_id) é a informada."""
+        return [c for c in self.cobradores if c.regiao_id == regiao_id]
+
+
+# um retrato por worker; trocado inteiro quando a versão no banco muda
+_cache = {"versao": None, "dados": None}
+_trava = threading.Lock()
+
+
+def _versao_no_banco():
+    versao = db.session.scalar(select(VersaoDados.versao).where(VersaoDados.chave == CHAVE_VERSAO))
+    return versao or 0
+
+
+def _carregar(versao):
+    regioes = Regiao.query.options(selectinload(Regiao.cobradores)).order_by(Regiao.id).all()
+    cobradores = (
+        Usuario.query.options(selectinload(Usuario.regioes))
+        .filter_by(tipo="cobrador").order_by(Usuario.id).all()
+    )
+    return Referencias(
+        regioes=tuple(
+            RegiaoRef(r.id, r.nome, tuple(
+                CobradorResumo(c.id, c.usuario) for c in sorted(r.cobradores, key=lambda c: c.id)
+            ))
+            for r in regioes
+        ),
+        cobradores=tuple(
+            CobradorRef(c.id, c.usuario, c.regiao_id, tuple(
+                RegiaoResumo(r.id, r.nome) for r in sorted(c.regioes, key=lambda r: r.id)
+            ))
+            for c in cobradores
+        ),
+        versao=versao,
+    )
+
+
+def referencias():
+    """
+    Regiões e cobradores em cache no processo. A cada requisição só a versão
+    gravada no banco é consultada (uma vez); se outro worker alterou os dados,
+    a versão mudou e o retrato é recarregado.
+    """
+    if "referencias" in g:
+        return g.referencias
+
+    # a versão é lida antes dos dados: no pior caso guardamos dados novos com a versão antiga
+    versao = _versao_no_banco()
+    with _trava:
+        if _cache["dados"] is None or _cache["versao"] != versao:
+            _cache["dados"] = _carregar(versao)
+            _cache["versao"] = versao
+        dados = _cache["dados"]
+
+    g.referencias = dados
+    return dados
+
+
+def invalidar_referencias():
+    """
+    Chamado na mesma transação de quem altera regiões ou cobradores: incrementa a
+    versão no banco (vale para todos os workers após o commit) e descarta o cache local.
+    """
+    # upsert (como em marcar_vencimentos): com UPDATE e depois INSERT, duas
+    # transações que criam a linha ao mesmo tempo davam IntegrityError
+    dialeto = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+    tabela = VersaoDados.__table__
+    db.session.execute(
+        dialeto.insert(tabela).values(chave=CHAVE_VERSAO, versao=1)
+        .on_conflict_do_update(index_elements=[tabela.c.chave], set_={"versao": tabela.c.versao + 1})
+    )
+
+    with _trava:
+        _cache["dados"] = None
+    g.pop("referencias", None)
@@ -0,0 +1,122 @@
+import io
+import csv
+from datetime import date, timedelta
+from sqlalchemy import select, func, case, and_
+from dinheiro import ZERO
+from models import db, Cliente, Emprestimo, Parcela
+from agregacoes import ZERO_SQL
+from referencias import referencias
+
+# (chave, título, dias de atraso de, até); None deixa a faixa aberta
+FAIXAS_ATRASO = [
+    ("a_vencer", "A vencer", None, 0),
+    ("atraso_1_7", "1 a 7 dias", 1, 7),
+    ("atraso_8_30", "8 a 30 dias", 8, 30),
+    ("atraso_31_60", "31 a 60 dias", 31, 60),
+    ("atraso_60_mais", "Mais de 60 dias", 61, None),
+]
+
+AGRUPAMENTOS = ("regiao", "cobrador")
+
+
+def _na_faixa(hoje, de, ate):
+    # "atraso entre de e até dias" vira um intervalo de vencimentos: a comparação é
+    # direto na coluna, igual em qualquer banco, sem calcular diferença de datas por linha
+    condicoes = []
+    if de is not None:
+        condicoes.append(Parcela.data_vencimento <= hoje - timedelta(days=de))
+    if ate is not None:
+        condicoes.append(Parcela.data_vencimento >= hoje - timedelta(days=ate))
+    return and_(*condicoes)
+
+
+def consulta_atraso(hoje, por="regiao", regiao_id=None, cobrador_id=None):
+    """
+    Saldo em aberto das parcelas não pagas, por faixa de atraso, agrupado por região
+    ou cobrador. Uma única consulta: as parcelas são somadas por empréstimo (varrendo
+    o índice de emprestimo_id, sem buscar empréstimo e cliente de cada parcela) e só
+    essas somas são juntadas a Cliente para o agrupamento final.
+    """
+    grupo = Cliente.regiao_id if por == "regiao" else Cliente.cobrador_id
+    aberto = Parcela.valor - func.coalesce(Parcela.valor_pago, 0)
+
+    por_emprestimo = (
+        select(
+            Parcela.emprestimo_id,
+            *[
+                func.sum(case((_na_faixa(hoje, de, ate), aberto), else_=ZERO_SQL)).label(chave)
+                for chave, _, de, ate in FAIXAS_ATRASO
+            ],
+            func.sum(aberto).label("total"),
+            func.count(Parcela.id).label("parcelas"),
+        )
+        .where(Parcela.status != "pago")
+        .group_by(Parcela.emprestimo_id)
+    )
+
+    filtros = []
+    if regiao_id:
+        filtros.append(Cliente.regiao_id == regiao_id)
+    if cobrador_id:
+        filtros.append(Cliente.cobrador_id == cobrador_id)
+    if filtros:
+        # com filtro, só os empréstimos dos clientes filtrados entram na soma
+        por_emprestimo = por_emprestimo.where(Parcela.emprestimo_id.in_(
+            select(Emprestimo.id).join(Cliente, Emprestimo.cliente_id == Cliente.id).where(*filtros)
+        ))
+    por_emprestimo = por_emprestimo.subquery()
+
+    return (
+        db.session.query(
+            grupo.label("grupo_id"),
+            *[func.sum(por_emprestimo.c[chave]).label(chave) for chave, _, _, _ in FAIXAS_ATRASO],
+            func.sum(por_emprestimo.c.total).label("total"),
+            func.sum(por_emprestimo.c.parcelas).label("parcelas"),
+        )
+        .select_from(por_emprestimo)
+        .join(Emprestimo, por_emprestimo.c.emprestimo_id == Emprestimo.id)
+        .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        .group_by(grupo)
+        .order_by(grupo)
+    )
+
+
+def relatorio_atraso(hoje=None, por="regiao", regiao_id=None, cobrador_id=None):
+    """
+    Aging da carteira: quanto falta receber em cada faixa de atraso (a vencer,
+    1-7, 8-30, 31-60 e mais de 60 dias), por região ou por cobrador, numa única
+    consulta agrupada. Retorna (linhas, total geral); cada linha tem grupo_id,
+    nome, uma chave por faixa, total e parcelas.
+    """
+    hoje = hoje or date.today()
+    ref = referencias()
+    if por == "regiao":
+        nomes = {r.id: r.nome for r in ref.regioes}
+        sem_grupo = "Sem região"
+    else:
+        nomes = {c.id: c.usuario for c in ref.cobradores}
+        sem_grupo = "Sem cobrador"
+
+    linhas = []
+    for resultado in consulta_atraso(hoje, por, regiao_id, cobrador_id):
+        linha = resultado._asdict()
+        linha["nome"] = nomes.get(linha["grupo_id"], sem_grupo)
+        linhas.append(linha)
+
+    geral = {chave: sum((linha[chave] for linha in linhas), ZERO) for chave, _, _, _ in FAIXAS_ATRASO}
+    geral["total"] = sum((linha["total"] for linha in linhas), ZERO)
+    geral["parcelas"] = sum(linha["parcelas"] for linha in linhas)
+    geral["nome"] = "Total"
+    return linhas, geral
+
+
+def atraso_csv(linhas, geral, por="regiao"):
+    """O relatório de atraso em CSV, com a linha de total no final."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([por, *[chave for chave, _, _, _ in FAIXAS_ATRASO], "total", "parcelas"])
+    for linha in [*linhas, geral]:
+        escritor.writerow([
+            linha["nome"], *[linha[chave] for chave, _, _, _ in FAIXAS_ATRASO], linha["total"], linha["parcelas"]
+        ])
+    return buffer.getvalue()
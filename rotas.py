@@ -0,0 +1,286 @@
+import math
+import time
+from collections import namedtuple
+from sqlalchemy import select
+from dinheiro import valor_json
+from models import db, Cliente
+
+# km por grau de latitude; o de longitude encolhe com o cosseno da latitude
+KM_POR_GRAU = 111.32
+# vizinhos de cada parada considerados pelo 2-opt
+VIZINHOS = 10
+# o 2-opt para aqui mesmo sem ter convergido (o caminho do vizinho mais próximo já é válido)
+TEMPO_MAXIMO_2OPT = 0.5
+
+Parada = namedtuple("Parada", "cliente_id latitude longitude itens")
+
+
+def ler_coordenadas(latitude, longitude):
+    """
+    Converte latitude e longitude digitadas ou importadas ("-23,55" ou "-23.55").
+    As duas em branco: (None, None). Só uma, fora da faixa ou inválida: ValueError.
+    """
+    latitude = (latitude or "").strip().replace(",", ".")
+    longitude = (longitude or "").strip().replace(",", ".")
+    if not latitude and not longitude:
+        return None, None
+    if not latitude or not longitude:
+        raise ValueError("informe latitude e longitude juntas")
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except ValueError:
+        raise ValueError(f"coordenadas inválidas: {latitude}, {longitude}")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat, lon) == (0, 0):
+        raise ValueError(f"coordenadas fora da faixa: {latitude}, {longitude}")
+    return lat, lon
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância em linha reta (haversine)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(min(1.0, a)))
+
+
+class GradeEspacial:
+    """
+    Índice espacial em grade: cada ponto (x, y em km) cai numa célula, e a busca
+    dos mais próximos olha as células em anéis a partir da do ponto, parando
+    quando o anel seguinte já está mais longe que o k-ésimo encontrado.
+    Pontos podem ser retirados (visitados) durante o uso.
+    """
+
+    def __init__(self, pontos):
+        self.pontos = pontos
+        xs = [x for x, _ in pontos]
+        ys = [y for _, y in pontos]
+        self.x0, self.y0 = min(xs), min(ys)
+        largura, altura = max(xs) - self.x0, max(ys) - self.y0
+        # em média uns 2 pontos por célula; com os pontos alinhados (área quase
+        # zero), umas n células ao longo da linha
+        self.lado = max(math.sqrt(2 * largura * altura / len(pontos)), max(largura, altura) / len(pontos), 1e-3)
+        self.celulas = {}
+        for i, ponto in enumerate(pontos):
+            self.celulas.setdefault(self._celula(ponto), set()).add(i)
+
+    def _celula(self, ponto):
+        return int((ponto[0] - self.x0) // self.lado), int((ponto[1] - self.y0) // self.lado)
+
+    def retirar(self, i):
+        celula = self._celula(self.pontos[i])
+        self.celulas[celula].discard(i)
+        if not self.celulas[celula]:
+            del self.celulas[celula]
+
+    def mais_proximos(self, ponto, k, excluir=None):
+        """Até k índices dos pontos mais próximos de `ponto`, do mais perto ao mais longe."""
+        cx, cy = self._celula(ponto)
+        achados = []
+        anel = 0
+        # anéis grandes demais perto de poucas células ocupadas (ponto longe de
+        # todos, ou quase todos já retirados): mais barato olhar todos os pontos
+        while (2 * anel + 1) ** 2 <= 4 * len(self.celulas):
+            for celula in self._anel(cx, cy, anel):
+                for i in self.celulas.get(celula, ()):
+                    if i != excluir:
+                        achados.append((math.dist(ponto, self.pontos[i]), i))
+            achados.sort()
+            # qualquer ponto fora dos anéis vistos está a pelo menos anel * lado
+            if len(achados) >= k and achados[k - 1][0] <= anel * self.lado:
+                return [i for _, i in achados[:k]]
+            anel += 1
+
+        achados = sorted(
+            (math.dist(ponto, self.pontos[i]), i)
+            for indices in self.celulas.values() for i in indices if i != excluir
+        )
+        return [i for _, i in achados[:k]]
+
+    @staticmethod
+    def _anel(cx, cy, anel):
+        if anel == 0:
+            yield cx, cy
+            return
+        for d in range(-anel, anel + 1):
+            yield cx + d, cy - anel
+            yield cx + d, cy + anel
+        for d in range(-anel + 1, anel):
+            yield cx - anel, cy + d
+            yield cx + anel, cy + d
+
+
+def _projetar(coordenadas):
+    # plano local em km (equirretangular): na escala de uma cidade o erro é desprezível
+    lat_media = math.radians(sum(lat for lat, _ in coordenadas) / len(coordenadas))
+    fator = math.cos(lat_media)
+    return [(lon * KM_POR_GRAU * fator, lat * KM_POR_GRAU) for lat, lon in coordenadas]
+
+
+def _vizinho_mais_proximo(pontos, grade, inicio):
+    caminho = []
+    atual = inicio
+    while grade.celulas:
+        proximo = grade.mais_proximos(atual, 1)[0]
+        grade.retirar(proximo)
+        caminho.append(proximo)
+        atual = pontos[proximo]
+    return caminho
+
+
+def _dois_opt(caminho, pontos, vizinhos, origem, prazo):
+    """
+    Melhora o caminho desfazendo cruzamentos: troca as arestas (a, b) e (c, d) por
+    (a, c) e (b, d), invertendo o trecho entre elas, só com c entre os vizinhos de a.
+    O caminho é aberto: começa na origem (ou em qualquer parada, sem origem) e
+    termina na última parada, sem voltar.
+    """
+    # posições 0 e n+1 são marcadores: a origem (ou um ponto a distância zero de
+    # todos) e o fim do caminho, a distância zero de todos
+    INICIO, FIM = -1, -2
+    rota = [INICIO] + caminho + [FIM]
+    posicao = {no: p for p, no in enumerate(rota)}
+
+    def d(a, b):
+        if a == FIM or b == FIM:
+            return 0.0
+        if a == INICIO or b == INICIO:
+            return 0.0 if origem is None else math.dist(origem, pontos[b if a == INICIO else a])
+        return math.dist(pontos[a], pontos[b])
+
+    def inverter(i, j):
+        # inverte rota[i+1..j]
+        rota[i + 1:j + 1] = rota[i + 1:j + 1][::-1]
+        for p in range(i + 1, j + 1):
+            posicao[rota[p]] = p
+
+    melhorou = True
+    while melhorou and time.perf_counter() < prazo:
+        melhorou = False
+        for a in caminho:
+            for sentido in (1, -1):
+                pa = posicao[a]
+                b = rota[pa + sentido]
+                d_ab = d(a, b)
+                for c in vizinhos[a]:
+                    d_ac = d(a, c)
+                    if d_ac >= d_ab:
+                        break
+                    pc = posicao[c]
+                    vizinho_c = rota[pc + sentido]
+                    ganho = d_ab + d(c, vizinho_c) - d_ac - d(b, vizinho_c)
+                    if ganho <= 1e-9:
+                        continue
+                    # arestas (rota[i], rota[i+1]) e (rota[j], rota[j+1])
+                    if sentido == 1:
+                        i, j = min(pa, pc), max(pa, pc)
+                    else:
+                        i, j = min(pa, pc) - 1, max(pa, pc) - 1
+                    inverter(i, j)
+                    melhorou = True
+                    break
+    return rota[1:-1]
+
+
+def ordenar_paradas(paradas, origem=None):
+    """
+    Ordena as paradas (com latitude e longitude) numa rota curta: vizinho mais
+    próximo a partir da origem (lat, lon), ou do extremo da região sem origem,
+    usando a grade espacial, e depois 2-opt com os VIZINHOS mais próximos de
+    cada parada. Heurística: não garante a menor rota, mas fica perto dela em
+    bem menos de um segundo para algumas centenas de paradas.
+    """
+    if len(paradas) < 2:
+        return list(paradas)
+
+    coordenadas = [(p.latitude, p.longitude) for p in paradas]
+    if origem is not None:
+        coordenadas.append(origem)
+    pontos = _projetar(coordenadas)
+    inicio = pontos.pop() if origem is not None else None
+
+    if inicio is None:
+        # sem origem, começa pela parada mais longe do centro: rotas abertas
+        # costumam ir de uma ponta à outra
+        cx = sum(x for x, _ in pontos) / len(pontos)
+        cy = sum(y for _, y in pontos) / len(pontos)
+        inicio = max(pontos, key=lambda p: math.dist(p, (cx, cy)))
+
+    grade = GradeEspacial(pontos)
+    vizinhos = {i: grade.mais_proximos(pontos[i], VIZINHOS, excluir=i) for i in range(len(pontos))}
+    caminho = _vizinho_mais_proximo(pontos, grade, inicio)
+    caminho = _dois_opt(caminho, pontos, vizinhos, inicio if origem is not None else None,
+                        time.perf_counter() + TEMPO_MAXIMO_2OPT)
+    return [paradas[i] for i in caminho]
+
+
+def montar_rota(itens, coordenadas, origem=None):
+    """
+    Rota do dia a partir dos itens da agenda (AgendaParcela): uma parada por
+    cliente, com as parcelas dele, na ordem de ordenar_paradas. Clientes sem
+    coordenadas (`coordenadas`: {cliente_id: (lat, lon)}) ficam no fim, na ordem
+    da agenda. Retorna (paradas, distancia_km, quantidade sem coordenadas).
+    """
+    por_cliente = {}
+    for item in itens:
+        por_cliente.setdefault(item.cliente_id, []).append(item)
+
+    com_local = []
+    sem_local = []
+    for cliente_id, itens_cliente in por_cliente.items():
+        lat, lon = coordenadas.get(cliente_id, (None, None))
+        if lat is None or lon is None:
+            sem_local.append(Parada(cliente_id, None, None, itens_cliente))
+        else:
+            com_local.append(Parada(cliente_id, lat, lon, itens_cliente))
+
+    ordenadas = ordenar_paradas(com_local, origem)
+
+    distancia = 0.0
+    anterior = origem
+    for parada in ordenadas:
+        if anterior is not None:
+            distancia += distancia_km(anterior[0], anterior[1], parada.latitude, parada.longitude)
+        anterior = (parada.latitude, parada.longitude)
+    return ordenadas + sem_local, distancia, len(sem_local)
+
+
+def rota_da_agenda(itens, origem=None):
+    """montar_rota com as coordenadas dos clientes dos itens, lidas numa consulta."""
+    ids = {item.cliente_id for item in itens}
+    coordenadas = {
+        cliente_id: (lat, lon)
+        for cliente_id, lat, lon in db.session.execute(
+            select(Cliente.id, Cliente.latitude, Cliente.longitude).where(Cliente.id.in_(ids))
+        )
+    } if ids else {}
+    return montar_rota(itens, coordenadas, origem)
+
+
+def rota_json(dia, paradas, distancia, sem_coordenadas, origem=None):
+    """Resposta da API da rota: paradas em ordem de visita, cada uma com as parcelas do dia."""
+    return {
+        "data": dia.isoformat(),
+        "origem": {"latitude": origem[0], "longitude": origem[1]} if origem else None,
+        "distancia_km": round(distancia, 2),
+        "sem_coordenadas": sem_coordenadas,
+        "paradas": [
+            {
+                "ordem": ordem,
+                "cliente_id": parada.cliente_id,
+                "cliente_nome": parada.itens[0].cliente_nome,
+                "latitude": parada.latitude,
+                "longitude": parada.longitude,
+                "parcelas": [
+                    {
+                        "parcela_id": item.parcela_id,
+                        "numero_parcela": item.numero_parcela,
+                        "valor": valor_json(item.valor),
+                        "valor_pago": valor_json(item.valor_pago),
+                        "status": item.status,
+                    }
+                    for item in parada.itens
+                ],
+            }
+            for ordem, parada in enumerate(paradas, start=1)
+        ],
+    }
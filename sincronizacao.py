@@ -0,0 +1,141 @@
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, or_
+from dinheiro import valor_json
+from models import db, Cliente, Emprestimo, Parcela, Pagamento, RegistroExcluido
+
+# o "proximo_since" volta alguns segundos para não perder alterações de
+# transações que gravaram atualizado_em antes de a consulta começar, mas
+# só fizeram commit depois; registros repetidos são inofensivos no aparelho
+MARGEM_SINCRONIZACAO = timedelta(seconds=5)
+# por quanto tempo os registros excluídos são guardados; um aparelho que não
+# sincroniza há mais tempo que isso recebe tudo de novo (resposta completa)
+HORIZONTE_SINCRONIZACAO = timedelta(days=30)
+
+_CAMPOS = {
+    "clientes": [
+        Cliente.id, Cliente.nome, Cliente.telefone, Cliente.endereco, Cliente.regiao_id, Cliente.cobrador_id,
+        Cliente.latitude, Cliente.longitude, Cliente.total_pago, Cliente.total_pendente,
+    ],
+    "emprestimos": [
+        Emprestimo.id, Emprestimo.cliente_id, Emprestimo.valor, Emprestimo.porcentagem, Emprestimo.frequencia,
+        Emprestimo.data_emprestimo, Emprestimo.valor_total, Emprestimo.saldo, Emprestimo.status,
+        Emprestimo.total_pago, Emprestimo.total_pendente,
+    ],
+    "parcelas": [
+        Parcela.id, Parcela.emprestimo_id, Parcela.numero_parcela, Parcela.valor, Parcela.valor_pago,
+        Parcela.data_vencimento, Parcela.status,
+    ],
+    "pagamentos": [
+        Pagamento.id, Pagamento.emprestimo_id, Pagamento.parcela_id, Pagamento.valor, Pagamento.data_pagamento,
+    ],
+}
+
+_TABELA_DA_ENTIDADE = {
+    "cliente": "clientes",
+    "emprestimo": "emprestimos",
+    "parcela": "parcelas",
+    "pagamento": "pagamentos",
+}
+
+
+def versao_dos_dados():
+    """
+    Maior atualizado_em de cada tabela e o último registro excluído. Cada valor vem
+    de um índice, então a consulta custa o mesmo com qualquer volume de dados.
+    """
+    return db.session.execute(select(
+        select(func.max(Cliente.atualizado_em)).scalar_subquery(),
+        select(func.max(Emprestimo.atualizado_em)).scalar_subquery(),
+        select(func.max(Parcela.atualizado_em)).scalar_subquery(),
+        select(func.max(Pagamento.atualizado_em)).scalar_subquery(),
+        select(func.max(RegistroExcluido.id)).scalar_subquery(),
+    )).one()
+
+
+def calcular_etag(regioes_ids, since):
+    """
+    ETag da resposta: muda quando qualquer registro sincronizado muda. Uma alteração
+    em outra região também troca a ETag, mas a resposta nesse caso vem quase vazia.
+    """
+    chave = f"{versao_dos_dados()}|{sorted(regioes_ids)}|{since.isoformat() if since else ''}"
+    return hashlib.sha1(chave.encode()).hexdigest()
+
+
+def _consulta(entidade, regioes_ids, since):
+    stmt = select(*_CAMPOS[entidade])
+
+    if entidade == "clientes":
+        atualizado_em = Cliente.atualizado_em
+    elif entidade == "emprestimos":
+        stmt = stmt.join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        atualizado_em = Emprestimo.atualizado_em
+    elif entidade == "parcelas":
+        stmt = (
+            stmt.join(Emprestimo, Parcela.emprestimo_id == Emprestimo.id)
+            .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        )
+        atualizado_em = Parcela.atualizado_em
+    else:
+        stmt = (
+            stmt.join(Emprestimo, Pagamento.emprestimo_id == Emprestimo.id)
+            .join(Cliente, Emprestimo.cliente_id == Cliente.id)
+        )
+        atualizado_em = Pagamento.atualizado_em
+
+    stmt = stmt.where(Cliente.regiao_id.in_(regioes_ids))
+    if since:
+        stmt = stmt.where(atualizado_em > since)
+    return stmt.order_by(_CAMPOS[entidade][0])
+
+
+def dados_para_sincronizar(regioes_ids, since=None):
+    """
+    Clientes, empréstimos, parcelas e pagamentos das regiões informadas. Com `since`,
+    só o que mudou depois dele, mais os ids excluídos desde então em `excluidos`.
+    O aparelho deve aplicar `excluidos` antes dos registros: o SQLite pode reaproveitar
+    o id de uma linha excluída, e a linha nova vem sempre junto com a exclusão.
+    Um `since` mais antigo que HORIZONTE_SINCRONIZACAO vira uma resposta completa.
+    """
+    agora = datetime.utcnow()
+    proximo_since = agora - MARGEM_SINCRONIZACAO
+    if since and since < agora - HORIZONTE_SINCRONIZACAO:
+        # as exclusões desse período podem já ter sido limpas
+        since = None
+
+    resposta = {"completo": since is None}
+    for entidade in _CAMPOS:
+        resultado = db.session.execute(_consulta(entidade, regioes_ids, since))
+        campos = list(resultado.keys())
+        resposta[entidade] = [
+            {campo: valor_json(valor) for campo, valor in zip(campos, linha)} for linha in resultado
+        ]
+
+    excluidos = {entidade: [] for entidade in _CAMPOS}
+    if since:
+        linhas = db.session.execute(
+            select(RegistroExcluido.tabela, RegistroExcluido.registro_id)
+            .where(
+                RegistroExcluido.excluido_em > since,
+                # sem região: registros excluídos antes de ela ser guardada
+                or_(RegistroExcluido.regiao_id.in_(regioes_ids), RegistroExcluido.regiao_id.is_(None)),
+            )
+            .order_by(RegistroExcluido.id)
+        )
+        for tabela, registro_id in linhas:
+            excluidos[_TABELA_DA_ENTIDADE[tabela]].append(registro_id)
+    resposta["excluidos"] = excluidos
+
+    resposta["proximo_since"] = proximo_since.isoformat()
+    return resposta
+
+
+def limpar_registros_excluidos(agora=None):
+    """
+    Apaga os registros excluídos mais antigos que HORIZONTE_SINCRONIZACAO, dentro
+    da transação corrente. Retorna quantos foram apagados.
+    """
+    limite = (agora or datetime.utcnow()) - HORIZONTE_SINCRONIZACAO
+    return db.session.execute(
+        delete(RegistroExcluido).where(RegistroExcluido.excluido_em < limite)
+    ).rowcount